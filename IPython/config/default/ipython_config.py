@@ -59,6 +59,11 @@ c = get_config()
 
 # c.InteractiveShell.cache_size = 1000
 
+# Memory budget of the output cache (Out), and whether the results evicted
+# from it are saved to disk and reloaded on access.
+# c.DisplayHook.cache_bytes = 1 << 30
+# c.DisplayHook.cache_spill = False
+
 # c.InteractiveShell.colors = 'LightBG'
 
 # c.InteractiveShell.color_info = True
@@ -134,6 +139,12 @@ c = get_config()
 
 # c.PrefilterManager.multi_line_specials = True
 
+# Send plain Python lines straight through, without running the checkers.
+# c.PrefilterManager.fast_path = True
+
+# Time the checkers, see get_ipython().prefilter_manager.checker_timing_report()
+# c.PrefilterManager.checker_timing = False
+
 #-----------------------------------------------------------------------------
 # AliasManager options
 #-----------------------------------------------------------------------------
@@ -147,6 +147,7 @@ class AliasManager(Configurable):
 
     def clear_aliases(self):
         self.alias_table.clear()
+        self._changed()
 
     def soft_define_alias(self, name, cmd):
         """Define an alias, but don't raise on an AliasError."""
@@ -163,10 +164,17 @@ class AliasManager(Configurable):
         """
         nargs = self.validate_alias(name, cmd)
         self.alias_table[name] = (nargs, cmd)
+        self._changed()
 
     def undefine_alias(self, name):
         if self.alias_table.has_key(name):
             del self.alias_table[name]
+            self._changed()
+
+    def _changed(self):
+        """Invalidate the object lookups of the shell, which find aliases."""
+        if self.shell is not None:
+            self.shell.ns_version += 1
 
     def validate_alias(self, name, cmd):
         """Validate an alias and return the its number of arguments."""
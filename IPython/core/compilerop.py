@@ -30,50 +30,146 @@ from __future__ import print_function
 import codeop
 import hashlib
 import linecache
+import re
 import time
+import types
+import weakref
+
+# Our own imports
+from IPython.utils.data import OrderedDict
+from IPython.core.inputsplitter import split_blocks
 
 #-----------------------------------------------------------------------------
 # Local utilities
 #-----------------------------------------------------------------------------
 
-def code_name(code, number=0):
+def code_digest(code):
+    """Return the md5 hex digest of some source code."""
+    if isinstance(code, unicode):
+        code = code.encode('utf-8')
+    return hashlib.md5(code).hexdigest()
+
+
+def code_name(code, number=0, hash_digest=None):
     """ Compute a (probably) unique name for code for caching.
     """
-    hash_digest = hashlib.md5(code).hexdigest()
+    if hash_digest is None:
+        hash_digest = code_digest(code)
     # Include the number and 12 characters of the hash in the name.  It's
     # pretty much impossible that in a single session we'll have collisions
     # even with truncated hashes, and the full one makes tracebacks too long
     return '<ipython-input-{0}-{1}>'.format(number, hash_digest[:12])
 
+
+# Parse the names made by code_name.
+code_name_re = re.compile(r'^<ipython-input-(\d+)-[0-9a-f]+>$')
+
+
+def _code_objects(code):
+    """Yield a code object and all those nested in it (functions, methods,
+    class bodies, ...)."""
+    yield code
+    for const in code.co_consts:
+        if isinstance(const, types.CodeType):
+            for c in _code_objects(const):
+                yield c
+
+
+def _rename_code(code, name):
+    """Return a copy of a code object, and of those nested in it, with name as
+    their file name."""
+    consts = tuple([_rename_code(c, name) if isinstance(c, types.CodeType)
+                    else c for c in code.co_consts])
+    return types.CodeType(code.co_argcount, code.co_nlocals,
+                          code.co_stacksize, code.co_flags, code.co_code,
+                          consts, code.co_names, code.co_varnames, name,
+                          code.co_name, code.co_firstlineno, code.co_lnotab,
+                          code.co_freevars, code.co_cellvars)
+
+
+def _code_died(name, ref):
+    """Weakref callback, called when a code object compiled from the input
+    with the given name is garbage collected."""
+    refs = linecache._ipython_refs.get(name)
+    if refs is None:
+        return
+    try:
+        refs.remove(ref)
+    except ValueError:
+        pass
+    if not refs:
+        del linecache._ipython_refs[name]
+        # If the entry was only kept because of its code, drop it now.
+        if linecache._ipython_pinned.pop(name, None) is not None:
+            linecache.cache.pop(name, None)
+
 #-----------------------------------------------------------------------------
 # Classes and functions
 #-----------------------------------------------------------------------------
 
 class CachingCompiler(object):
     """A compiler that caches code compiled from interactive statements.
+
+    The sources are registered in the linecache, so that tracebacks and the
+    inspect module can find them.  The registry is bounded: once it holds
+    more than max_entries sources, or sources older than max_age seconds,
+    the oldest ones are dropped, except those whose code objects are still
+    alive (e.g. the functions and classes defined by an input), which are
+    kept until these are garbage collected.  A source dropped from the
+    registry can still be found if it is in input_hist.
+
+    The code objects are also kept in a cache of at most code_cache_size
+    entries, keyed by the hash of their source, the compilation mode and the
+    active compiler flags, so that inputs that are run again (by %rep,
+    macros, loops of %run -i, ...) are not recompiled.  The code taken from
+    the cache for another input is copied under the name of that input, so
+    that its tracebacks show the right source.  The hits and misses
+    attributes count the lookups in that cache.
     """
 
-    def __init__(self):
+    def __init__(self, max_entries=1000, max_age=0, code_cache_size=500):
         self._compiler = codeop.CommandCompiler()
+
+        # The compiled code, least recently used first.
+        self.code_cache_size = code_cache_size
+        self._code_cache = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+        # The bounds of the registry, 0 meaning unbounded.
+        self.max_entries = max_entries
+        self.max_age = max_age
+
+        # A list with the sources of the inputs, indexed by number.  The
+        # shell sets this to its (parsed) input history.
+        self.input_hist = None
         
         # This is ugly, but it must be done this way to allow multiple
         # simultaneous ipython instances to coexist.  Since Python itself
         # directly accesses the data structures in the linecache module, and
         # the cache therein is global, we must work with that data structure.
-        # We must hold a reference to the original checkcache routine and call
-        # that in our own check_cache() below, but the special IPython cache
-        # must also be shared by all IPython instances.  If we were to hold
-        # separate caches (one in each CachingCompiler instance), any call made
-        # by Python itself to linecache.checkcache() would obliterate the
-        # cached data from the other IPython instances.
+        # We must hold a reference to the original checkcache and getlines
+        # routines and call them in our own check_cache() and get_lines()
+        # below, but the special IPython cache must also be shared by all
+        # IPython instances.
+        #
+        # _ipython_cache maps the names of the registered inputs to their
+        # linecache entry and registration time, oldest first.
+        # _ipython_pinned holds the entries dropped from it while their code
+        # was alive, and _ipython_refs the weak references to that code.
         if not hasattr(linecache, '_ipython_cache'):
-            linecache._ipython_cache = {}
+            linecache._ipython_cache = OrderedDict()
+            linecache._ipython_pinned = {}
+            linecache._ipython_refs = {}
         if not hasattr(linecache, '_checkcache_ori'):
             linecache._checkcache_ori = linecache.checkcache
+        if not hasattr(linecache, '_getlines_ori'):
+            linecache._getlines_ori = linecache.getlines
         # Now, we must monkeypatch the linecache directly so that parts of the
         # stdlib that call it outside our control go through our codepath
         # (otherwise we'd lose our tracebacks).
         linecache.checkcache = self.check_cache
+        linecache.getlines = self.get_lines
 
     @property
     def compiler_flags(self):
@@ -99,21 +195,116 @@ class CachingCompiler(object):
           purposes in tracebacks (typically it will be the IPython prompt
           number).
         """
-        name = code_name(code, number)
-        code_obj = self._compiler(code, name, symbol)
-        entry = (len(code), time.time(),
+        hash_digest = code_digest(code)
+        name = code_name(code, number, hash_digest)
+        key = (hash_digest, symbol, self.compiler_flags)
+        code_obj = self._code_cache.pop(key, None)
+        if code_obj is not None:
+            self.hits += 1
+            self._code_cache[key] = code_obj
+            if code_obj.co_filename != name:
+                code_obj = _rename_code(code_obj, name)
+        else:
+            self.misses += 1
+            code_obj = self._compiler(code, name, symbol)
+            if code_obj is not None and self.code_cache_size:
+                self._code_cache[key] = code_obj
+                while len(self._code_cache) > self.code_cache_size:
+                    self._code_cache.popitem(last=False)
+        self._register(name, code)
+        if code_obj is not None:
+            refs = linecache._ipython_refs.setdefault(name, [])
+            callback = lambda ref, name=name: _code_died(name, ref)
+            for c in _code_objects(code_obj):
+                refs.append(weakref.ref(c, callback))
+        self._prune()
+        return code_obj
+
+    def clear_code_cache(self):
+        """Empty the cache of compiled code and reset its counters."""
+        self._code_cache.clear()
+        self.hits = self.misses = 0
+
+    def _register(self, name, code):
+        """Add the source of an input to the linecache and to our registry."""
+        # A None mtime marks the entry as not coming from a file, so that
+        # linecache.checkcache leaves it alone.
+        entry = (len(code), None,
                  [line+'\n' for line in code.splitlines()], name)
-        # Cache the info both in the linecache (a global cache used internally
-        # by most of Python's inspect/traceback machinery), and in our cache
+        ipython_cache = linecache._ipython_cache
+        ipython_cache.pop(name, None)
+        ipython_cache[name] = (entry, time.time())
+        linecache._ipython_pinned.pop(name, None)
         linecache.cache[name] = entry
-        linecache._ipython_cache[name] = entry
-        return code_obj
+        return entry
+
+    def _prune(self):
+        """Drop the oldest entries until the registry is within its bounds."""
+        ipython_cache = linecache._ipython_cache
+        refs = linecache._ipython_refs
+        oldest = time.time() - self.max_age
+        while ipython_cache:
+            name, (entry, stamp) = next(ipython_cache.iteritems())
+            if not ((self.max_entries and
+                     len(ipython_cache) > self.max_entries) or
+                    (self.max_age and stamp < oldest)):
+                break
+            del ipython_cache[name]
+            if refs.get(name):
+                linecache._ipython_pinned[name] = entry
+            else:
+                refs.pop(name, None)
+                linecache.cache.pop(name, None)
+
+    def _lookup(self, name):
+        """Find the linecache entry for an input that isn't in the linecache,
+        either in our registry or by finding its source in input_hist."""
+        item = linecache._ipython_cache.get(name)
+        if item is not None:
+            return item[0]
+        entry = linecache._ipython_pinned.get(name)
+        if entry is not None:
+            return entry
+        m = code_name_re.match(name)
+        if m is None or self.input_hist is None:
+            return None
+        number = int(m.group(1))
+        try:
+            source = self.input_hist[number]
+        except IndexError:
+            return None
+        # The input may have been compiled whole, or split in blocks (see
+        # InteractiveShell.run_cell): its first lines, the blocks found by
+        # the input splitter, or each line alone.
+        lines = source.splitlines(True)
+        candidates = [''.join(lines[:i]) for i in range(len(lines), 0, -1)]
+        candidates += split_blocks(source)
+        candidates += [line.rstrip('\n') for line in lines]
+        for code in candidates:
+            try:
+                if code_name(code, number) == name:
+                    entry = self._register(name, code)
+                    self._prune()
+                    return entry
+            except UnicodeError:
+                pass
+        return None
+
+    def get_lines(self, filename, module_globals=None):
+        """Call linecache.getlines(), finding the sources of the inputs that
+        are not in the linecache anymore.
+        """
+        cache = linecache.cache
+        if filename not in cache and filename.startswith('<ipython-input-'):
+            entry = self._lookup(filename)
+            if entry is not None:
+                cache[filename] = entry
+        return linecache._getlines_ori(filename, module_globals)
 
     def check_cache(self, *args):
         """Call linecache.checkcache() safely protecting our cached values.
         """
-        # First call the orignal checkcache as intended
+        # Our entries have no mtime, so checkcache doesn't discard them.  If
+        # they are removed some other way (e.g. linecache.clearcache), they
+        # are put back by get_lines.
         linecache._checkcache_ori(*args)
-        # Then, update back the cache with our data, so that tracebacks related
-        # to our compiled codes can be produced.
-        linecache.cache.update(linecache._ipython_cache)
@@ -69,6 +69,7 @@ from __future__ import print_function
 
 import __builtin__
 import __main__
+import bisect
 import glob
 import inspect
 import itertools
@@ -82,7 +83,7 @@ from IPython.core.error import TryNext
 from IPython.core.prefilter import ESC_MAGIC
 from IPython.utils import generics
 from IPython.utils import io
-from IPython.utils.dir2 import dir2
+from IPython.utils.dir2 import cached_dir2
 from IPython.utils.process import arg_split
 
 #-----------------------------------------------------------------------------
@@ -90,7 +91,7 @@ from IPython.utils.process import arg_split
 #-----------------------------------------------------------------------------
 
 # Public API
-__all__ = ['Completer','IPCompleter']
+__all__ = ['Completer','IPCompleter','NameIndex']
 
 if sys.platform == 'win32':
     PROTECTABLES = ' '
@@ -208,6 +209,93 @@ def single_dir_expand(matches):
         return matches
 
 
+def limit_matches(matches, limit):
+    """Truncate a sorted list of matches to at most limit entries.
+
+    The last match is always kept, so that the common prefix of the matches
+    (which readline inserts) is the same as that of the full list.  A limit
+    of 0 means no limit.
+    """
+    if limit and len(matches) > limit:
+        return matches[:max(limit-1, 0)] + matches[-1:]
+    return matches
+
+
+def prefix_matches(index, prefix, limit=0):
+    """Return the names of the sorted list index that start with prefix.
+
+    If there are more than limit of them, the list is truncated as by
+    :func:`limit_matches`.
+    """
+    try:
+        lo = bisect.bisect_left(index, prefix)
+        hi = len(index)
+        if prefix:
+            char = unichr if isinstance(prefix, unicode) else chr
+            try:
+                end = prefix[:-1] + char(ord(prefix[-1])+1)
+            except ValueError:
+                # The last character is the largest one.
+                pass
+            else:
+                hi = bisect.bisect_left(index, end, lo)
+    except UnicodeDecodeError:
+        # Unicode prefix and non-ascii byte names can't be ordered.
+        n = len(prefix)
+        return limit_matches([w for w in index if w[:n] == prefix],
+                             limit)
+    if limit and hi - lo > limit:
+        return index[lo:lo+max(limit-1, 0)] + [index[hi-1]]
+    return index[lo:hi]
+
+
+class NameIndex(object):
+    """A sorted index of names, for fast prefix lookups.
+
+    :meth:`update` brings the index in sync with the current names of a
+    namespace, inserting and removing only those that changed since the last
+    update.
+    """
+
+    # Above this many changes, the index is sorted again from scratch.
+    rebuild_threshold = 1000
+
+    def __init__(self, names=()):
+        self._names = set(names)
+        self._sorted = sorted(self._names)
+
+    def __len__(self):
+        return len(self._sorted)
+
+    def update(self, names):
+        """Make the index hold the given names."""
+        names = set(names)
+        old = self._names
+        added = names - old
+        removed = old - names
+        if len(added) + len(removed) > self.rebuild_threshold:
+            self._sorted = sorted(names)
+        else:
+            index = self._sorted
+            for name in removed:
+                del index[bisect.bisect_left(index, name)]
+            for name in added:
+                bisect.insort(index, name)
+        self._names = names
+
+    def matches(self, prefix, limit=0):
+        """Return the sorted names that start with prefix.
+
+        If there are more than limit of them, the list is truncated as by
+        :func:`limit_matches`.
+        """
+        return prefix_matches(self._sorted, prefix, limit)
+
+
+# Keywords don't change.
+_keyword_index = NameIndex(keyword.kwlist)
+
+
 class Bunch(object): pass
 
 
@@ -295,6 +383,13 @@ class Completer(object):
         else:
             self.global_namespace = global_namespace
 
+        # The maximum number of matches returned, 0 for no limit.
+        self.limit = 0
+
+        # The indexes of the names of the builtins and namespaces, with the
+        # namespace they were built for and the stamp of their last update.
+        self._indexes = {}
+
     def complete(self, text, state):
         """Return the next possible completion for 'text'.
 
@@ -323,17 +418,42 @@ class Completer(object):
 
         """
         #print 'Completer->global_matches, txt=%r' % text # dbg
+        indexes = [_keyword_index,
+                   self._name_index('builtin', __builtin__.__dict__),
+                   self._name_index('namespace', self.namespace),
+                   self._name_index('global', self.global_namespace)]
+        # One more than the limit, in case __builtins__ is dropped.
+        limit = self.limit and self.limit+1
         matches = []
-        match_append = matches.append
-        n = len(text)
-        for lst in [keyword.kwlist,
-                    __builtin__.__dict__.keys(),
-                    self.namespace.keys(),
-                    self.global_namespace.keys()]:
-            for word in lst:
-                if word[:n] == text and word != "__builtins__":
-                    match_append(word)
-        return matches
+        for index in indexes:
+            matches.extend(index.matches(text, limit))
+        return [word for word in matches if word != "__builtins__"]
+
+    def _ns_version(self):
+        """Return the version of the namespaces, see :meth:`_name_index`.
+
+        None means that the namespaces may have changed at any time.
+        """
+        return None
+
+    def _name_index(self, name, ns):
+        """Return the index of the names of a namespace, updated if needed.
+
+        The index is updated when the namespace is a different one, or when
+        its size or the version of the namespaces changed since the last
+        update.
+        """
+        version = self._ns_version()
+        stamp = (id(ns), len(ns), version)
+        try:
+            index, old_stamp = self._indexes[name]
+        except KeyError:
+            index = NameIndex(ns)
+        else:
+            if version is None or stamp != old_stamp:
+                index.update(ns)
+        self._indexes[name] = index, stamp
+        return index
 
     def attr_matches(self, text):
         """Compute matches when text contains a dot.
@@ -365,23 +485,26 @@ class Completer(object):
             except:
                 return []
 
-        words = dir2(obj)
-        
+        # A sorted list, cached for classes and modules.
+        words = cached_dir2(obj)
+
         try:
-            words = generics.complete_object(obj, words)
+            words = generics.complete_object(obj, list(words))
         except TryNext:
-            pass
+            words = prefix_matches(words, attr)
+        else:
+            n = len(attr)
+            words = [w for w in words if w[:n] == attr]
         # Build match list to return
-        n = len(attr)
-        res = ["%s.%s" % (expr, w) for w in words if w[:n] == attr ]
-        return res
+        return ["%s.%s" % (expr, w) for w in words]
 
 
 class IPCompleter(Completer):
     """Extension of the completer class with IPython-specific features"""
 
     def __init__(self, shell, namespace=None, global_namespace=None,
-                 omit__names=True, alias_table=None, use_readline=True):
+                 omit__names=True, alias_table=None, use_readline=True,
+                 limit=0):
         """IPCompleter() -> completer
 
         Return a completer object suitable for use by the readline library
@@ -406,12 +529,17 @@ class IPCompleter(Completer):
         - If alias_table is supplied, it should be a dictionary of aliases
         to complete.
 
+        - limit: the maximum number of matches to return, 0 for no limit.
+        When there are more, the matches returned are the first ones, and
+        the last one so that readline inserts the right common prefix.
+
         use_readline : bool, optional
           If true, use the readline library.  This completer can still function
           without readline, though in that case callers must provide some extra
           information on each call about the current line."""
 
         Completer.__init__(self, namespace, global_namespace)
+        self.limit = limit
 
         self.magic_escape = ESC_MAGIC
         self.splitter = CompletionSplitter()
@@ -455,7 +583,11 @@ class IPCompleter(Completer):
                          self.alias_matches,
                          self.python_func_kw_matches,
                          ]
-    
+
+    def _ns_version(self):
+        """The shell bumps its ns_version whenever code is run."""
+        return getattr(self.shell, 'ns_version', None)
+
     # Code contributed by Alex Schmolck, for ipython/emacs integration
     def all_completions(self, text):
         """Return all possible completions for the benefit of emacs."""
@@ -733,7 +865,8 @@ class IPCompleter(Completer):
             
         return None
                
-    def complete(self, text=None, line_buffer=None, cursor_pos=None):
+    def complete(self, text=None, line_buffer=None, cursor_pos=None,
+                 matches=None, cancelled=None):
         """Find completions for the given text and line context.
 
         This is called successively with state == 0, 1, 2, ... until it
@@ -758,6 +891,15 @@ class IPCompleter(Completer):
             Index of the cursor in the full line buffer.  Should be provided by
             remote frontends where kernel has no access to frontend state.
 
+          matches : list, optional
+            A list to collect the matches into as each matcher returns, so
+            that a caller running the completion in another thread can use
+            the ones found so far when it stops waiting.
+
+          cancelled : threading.Event, optional
+            When set, no further matchers are run and the matches found so
+            far are returned, without being stored on the completer.
+
         Returns
         -------
         text : str
@@ -786,36 +928,49 @@ class IPCompleter(Completer):
         #io.rprint('\nCOMP2 %r %r %r' % (text, line_buffer, cursor_pos))  # dbg
 
         # Start with a clean slate of completions
-        self.matches[:] = []
+        if matches is None:
+            matches = []
+        if cancelled is not None:
+            is_cancelled = cancelled.is_set
+        else:
+            is_cancelled = lambda: False
         custom_res = self.dispatch_custom_completer(text)
         if custom_res is not None:
             # did custom completers produce something?
-            self.matches = custom_res
+            matches.extend(custom_res)
         else:
             # Extend the list of completions with the results of each
             # matcher, so we return results to the user from all
             # namespaces.
             if self.merge_completions:
-                self.matches = []
                 for matcher in self.matchers:
+                    if is_cancelled():
+                        break
                     try:
-                        self.matches.extend(matcher(text))
+                        matches.extend(matcher(text))
                     except:
                         # Show the ugly traceback if the matcher causes an
                         # exception, but do NOT crash the kernel!
                         sys.excepthook(*sys.exc_info())
             else:
                 for matcher in self.matchers:
-                    self.matches = matcher(text)
-                    if self.matches:
+                    if is_cancelled():
+                        break
+                    found = matcher(text)
+                    if found:
+                        matches.extend(found)
                         break
         # FIXME: we should extend our api to return a dict with completions for
         # different types of objects.  The rlcomplete() method could then
         # simply collapse the dict into a list for readline, but we'd have
         # richer completion semantics in other evironments.
-        self.matches = sorted(set(self.matches))
-        #io.rprint('COMP TEXT, MATCHES: %r, %r' % (text, self.matches)) # dbg
-        return text, self.matches
+        matches = limit_matches(sorted(set(matches)), self.limit)
+        # A cancelled completion may still be running in a worker thread after
+        # a newer one started, so it must not touch the shared state.
+        if not is_cancelled():
+            self.matches = matches
+        #io.rprint('COMP TEXT, MATCHES: %r, %r' % (text, matches)) # dbg
+        return text, matches
 
     def rlcomplete(self, text, state):
         """Return the state-th possible completion for 'text'.
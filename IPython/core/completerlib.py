@@ -22,9 +22,9 @@ import os
 import re
 import shlex
 import sys
+import threading
 
 # Third-party imports
-from time import time
 from zipimport import zipimporter
 
 # Our own imports
@@ -38,13 +38,6 @@ from IPython.core.ipapi import get as get_ipython
 # Globals and constants
 #-----------------------------------------------------------------------------
 
-# Time in seconds after which the rootmodules will be stored permanently in the
-# ipython ip.db database (kept in the user's .ipython dir).
-TIMEOUT_STORAGE = 2
-
-# Time in seconds after which we give up
-TIMEOUT_GIVEUP = 20
-
 # Regular expression for the python import statement
 import_re = re.compile(r'.*(\.so|\.py[cod]?)$')
 
@@ -115,39 +108,125 @@ def module_list(path):
 
     return [basename(p).split('.')[0] for p in folder_list]
 
+class ModuleIndex(object):
+    """An index of the modules in the folders of sys.path and in packages.
+
+    The modules of each folder (or egg) are listed with :func:`module_list`
+    and kept with the mtime of the folder, so that a folder is only listed
+    again when files were added to it or removed from it.  Adding the
+    __init__.py of an existing subfolder doesn't change the mtime of the
+    folder, so such packages are only found after another change, or
+    :meth:`clear`.
+
+    If a database is given (the shell's ``db``), the index is saved in it
+    and reused in later sessions.  The folders of sys.path are scanned in a
+    background thread (see :meth:`start`), and :meth:`root_modules` returns
+    what is known so far without waiting for it.
+    """
+
+    # The key of the index in the database.
+    db_key = 'module_index'
+
+    def __init__(self, db=None):
+        self.db = db
+        # Maps folders to their mtime and module names.
+        self._dirs = {}
+        self._changed = False
+        self._thread = None
+        if db is not None:
+            try:
+                self._dirs.update(db.get(self.db_key, {}))
+            except Exception:
+                # A corrupt entry is rebuilt from scratch.
+                pass
+
+    def modules_in(self, path):
+        """Return the modules in a folder, listing it only if it changed."""
+        try:
+            mtime = os.stat(path).st_mtime
+        except OSError:
+            return []
+        item = self._dirs.get(path)
+        if item is not None and item[0] == mtime:
+            return item[1]
+        names = module_list(path)
+        self._dirs[path] = (mtime, names)
+        self._changed = True
+        return names
+
+    def refresh(self, paths=None):
+        """Update the index for the folders of paths (sys.path by default)
+        that changed, and save it."""
+        if paths is None:
+            paths = list(sys.path)
+        for path in paths:
+            self.modules_in(path)
+        self.save()
+
+    def start(self):
+        """Refresh the index in a background thread, unless one is running.
+        """
+        if self._thread is not None and self._thread.is_alive():
+            return
+        self._thread = threading.Thread(target=self.refresh,
+                                        name='module-index')
+        self._thread.daemon = True
+        self._thread.start()
+
+    def wait(self, timeout=None):
+        """Wait for the background refresh to finish."""
+        if self._thread is not None:
+            self._thread.join(timeout)
+
+    def save(self):
+        """Save the index in the database, if it changed."""
+        if self.db is not None and self._changed:
+            self._changed = False
+            self.db[self.db_key] = dict(self._dirs)
+
+    def clear(self):
+        """Forget all the folders, so that they are all listed again."""
+        self._dirs.clear()
+        self._changed = True
+
+    def root_modules(self):
+        """Return the names of the builtin modules and of the modules in the
+        folders of sys.path that have been indexed.
+
+        This doesn't wait for the folders to be listed, but starts a refresh
+        in the background, whose results are used by the next calls.
+        """
+        self.start()
+        modules = set(sys.builtin_module_names)
+        dirs = self._dirs
+        for path in sys.path:
+            item = dirs.get(path)
+            if item is not None:
+                modules.update(item[1])
+        modules.discard('__init__')
+        return list(modules)
+
+    def submodules(self, package):
+        """Return the names of the modules of a package, without importing it.
+
+        Returns None if the package isn't found in a folder of sys.path.
+        """
+        parts = package.split('.')
+        for path in sys.path:
+            folder = os.path.join(path, *parts)
+            if os.path.isfile(os.path.join(folder, '__init__.py')):
+                modules = set(self.modules_in(folder))
+                modules.discard('__init__')
+                return list(modules)
+        return None
+
+
 def get_root_modules():
     """
     Returns a list containing the names of all the modules available in the
     folders of the pythonpath.
     """
-    ip = get_ipython()
-
-    if 'rootmodules' in ip.db:
-        return ip.db['rootmodules']
-    
-    t = time()
-    store = False
-    modules = list(sys.builtin_module_names)
-    for path in sys.path:
-        modules += module_list(path)        
-        if time() - t >= TIMEOUT_STORAGE and not store:
-            store = True
-            print("\nCaching the list of root modules, please wait!")
-            print("(This will only be done once - type '%rehashx' to "
-                  "reset cache!)\n")
-            sys.stdout.flush()
-        if time() - t > TIMEOUT_GIVEUP:
-            print("This is taking too long, we give up.\n")
-            ip.db['rootmodules'] = []
-            return []
-    
-    modules = set(modules)
-    if '__init__' in modules:
-        modules.remove('__init__')
-    modules = list(modules)
-    if store:
-        ip.db['rootmodules'] = modules
-    return modules
+    return get_ipython().module_index.root_modules()
 
 
 def is_importable(module, attr, only_modules):
@@ -157,7 +236,12 @@ def is_importable(module, attr, only_modules):
         return not(attr[:2] == '__' and attr[-2:] == '__')
 
 
-def try_import(mod, only_modules=False):
+def try_import(mod, only_modules=False, index=None):
+    """Import a module and return the names that can be imported from it.
+
+    If index is a :class:`ModuleIndex`, it is used to list the modules of
+    packages.
+    """
     try:
         m = __import__(mod)
     except:
@@ -175,7 +259,11 @@ def try_import(mod, only_modules=False):
         
     completions.extend(getattr(m, '__all__', []))
     if m_is_init:
-        completions.extend(module_list(os.path.dirname(m.__file__)))
+        folder = os.path.dirname(m.__file__)
+        if index is None:
+            completions.extend(module_list(folder))
+        else:
+            completions.extend(index.modules_in(folder))
     completions = set(completions)
     if '__init__' in completions:
         completions.remove('__init__')
@@ -221,6 +309,7 @@ def module_completion(line):
 
     words = line.split(' ')
     nwords = len(words)
+    index = get_ipython().module_index
 
     # from whatever <tab> -> 'import '
     if nwords == 3 and words[0] == 'from':
@@ -233,13 +322,18 @@ def module_completion(line):
         mod = words[1].split('.')
         if len(mod) < 2:
             return get_root_modules()
-        completion_list = try_import('.'.join(mod[:-1]), True)
+        package = '.'.join(mod[:-1])
+        # Packages that aren't imported yet are looked up in the index.
+        completion_list = index.submodules(package)
+        if completion_list is None or package in sys.modules:
+            completion_list = set(completion_list or [])
+            completion_list.update(try_import(package, True, index))
         return ['.'.join(mod[:-1] + [el]) for el in completion_list]
     
     # 'from xyz import abc<tab>'
     if nwords >= 3 and words[0] == 'from':
         mod = words[1]
-        return try_import(mod)
+        return try_import(mod, index=index)
 
 #-----------------------------------------------------------------------------
 # Completers
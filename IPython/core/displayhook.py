@@ -20,15 +20,226 @@ Authors:
 #-----------------------------------------------------------------------------
 
 import __builtin__
+import cPickle as pickle
+import os
+import shutil
+import sys
+import tempfile
+from IPython.utils.data import OrderedDict
 
 from IPython.config.configurable import Configurable
 from IPython.core import prompts
 import IPython.utils.generics
 import IPython.utils.io
-from IPython.utils.traitlets import Instance, List
+from IPython.utils.traitlets import Bool, Instance, Int, List
 from IPython.utils.warn import warn
 from IPython.core.formatters import DefaultFormatter
 
+#-----------------------------------------------------------------------------
+# Output cache
+#-----------------------------------------------------------------------------
+
+def _isinstance_of(obj, module, name):
+    """Whether obj is an instance of the class module.name, if that module
+    is already imported."""
+    cls = getattr(sys.modules.get(module), name, None)
+    return isinstance(cls, type) and isinstance(obj, cls)
+
+
+def estimate_size(obj, deep=True):
+    """Estimate the memory used by an object, in bytes.
+
+    The nbytes of numpy arrays and the memory_usage() of pandas objects are
+    used for those.  Otherwise this is sys.getsizeof, plus that of the items
+    for the builtin containers (only one level deep).  No other attribute of
+    the object is looked up, since that could run arbitrary code.
+    """
+    try:
+        if _isinstance_of(obj, 'numpy', 'ndarray'):
+            return int(obj.nbytes)
+        if _isinstance_of(obj, 'pandas', 'DataFrame') or \
+               _isinstance_of(obj, 'pandas', 'Series'):
+            usage = obj.memory_usage()
+            # A Series for DataFrames, a number for Series.
+            if hasattr(usage, 'sum'):
+                usage = usage.sum()
+            return int(usage)
+    except Exception:
+        # Use the generic estimate.
+        pass
+    try:
+        size = sys.getsizeof(obj)
+    except Exception:
+        return 0
+    if deep:
+        if isinstance(obj, dict):
+            size += sum(estimate_size(k, False) + estimate_size(v, False)
+                        for k, v in obj.iteritems())
+        elif isinstance(obj, (list, tuple, set, frozenset)):
+            size += sum(estimate_size(x, False) for x in obj)
+    return size
+
+
+class OutputCache(dict):
+    """The dict of output history, available to the user as Out and _oh.
+
+    The cache is bounded both in number of entries and in (estimated)
+    memory.  When a bound is exceeded, the least recently used entries are
+    evicted: they are dropped, or if a spill directory is used, written to
+    disk and reloaded when accessed again as ``Out[n]``, ``Out.get(n)`` or
+    ``n in Out``.
+
+    Only the entries currently in memory show up when iterating over the
+    cache.
+    """
+
+    def __init__(self, max_entries=0, max_bytes=0, spill=False,
+                 on_evict=None):
+        super(OutputCache, self).__init__()
+        # The bounds, 0 meaning unbounded.
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        # Whether evicted entries are written to disk.
+        self.spill = spill
+        # Called with the key of each entry evicted from memory.
+        self.on_evict = on_evict
+        self.spill_dir = None
+        # Key -> estimated size, least recently used first.
+        self._sizes = OrderedDict()
+        self._nbytes = 0
+        # Key -> file of the entries spilled to disk.
+        self._spilled = {}
+
+    @property
+    def nbytes(self):
+        """The estimated size of the entries in memory."""
+        return self._nbytes
+
+    def __setitem__(self, key, value):
+        self._forget(key)
+        self._discard_spilled(key)
+        dict.__setitem__(self, key, value)
+        size = estimate_size(value)
+        self._sizes[key] = size
+        self._nbytes += size
+        self._shrink(key)
+
+    def __missing__(self, key):
+        if key not in self._spilled:
+            raise KeyError(key)
+        value = self._load(key)
+        self[key] = value
+        return value
+
+    def __getitem__(self, key):
+        value = dict.__getitem__(self, key)
+        # Mark the entry as the most recently used.
+        sizes = self._sizes
+        if key in sizes:
+            sizes[key] = sizes.pop(key)
+        return value
+
+    def get(self, key, default=None):
+        try:
+            return self[key]
+        except KeyError:
+            return default
+
+    def __contains__(self, key):
+        return dict.__contains__(self, key) or key in self._spilled
+
+    has_key = __contains__
+
+    def __delitem__(self, key):
+        if dict.__contains__(self, key):
+            dict.__delitem__(self, key)
+            self._forget(key)
+        elif key in self._spilled:
+            self._discard_spilled(key)
+        else:
+            raise KeyError(key)
+
+    def pop(self, key, *default):
+        try:
+            value = self[key]
+        except KeyError:
+            if default:
+                return default[0]
+            raise
+        del self[key]
+        return value
+
+    def clear(self):
+        dict.clear(self)
+        self._sizes.clear()
+        self._nbytes = 0
+        self._spilled.clear()
+        if self.spill_dir is not None:
+            shutil.rmtree(self.spill_dir, ignore_errors=True)
+            self.spill_dir = None
+
+    def _forget(self, key):
+        size = self._sizes.pop(key, None)
+        if size is not None:
+            self._nbytes -= size
+
+    def _shrink(self, keep):
+        """Evict the least recently used entries, but not keep, until the
+        cache is within its bounds."""
+        sizes = self._sizes
+        while len(sizes) > 1 and (
+                (self.max_entries and len(sizes) > self.max_entries) or
+                (self.max_bytes and self._nbytes > self.max_bytes)):
+            key = next(iter(sizes))
+            if key == keep:
+                # Skip over the newest entry, it stays in memory.
+                sizes[key] = sizes.pop(key)
+                key = next(iter(sizes))
+            value = dict.pop(self, key)
+            self._forget(key)
+            if self.spill:
+                self._dump(key, value)
+            if self.on_evict is not None:
+                self.on_evict(key)
+
+    def _dump(self, key, value):
+        """Write an evicted entry to disk, if it can be."""
+        if self.spill_dir is None:
+            self.spill_dir = tempfile.mkdtemp(prefix='ipython-out-')
+        path = os.path.join(self.spill_dir, 'out-%s' % key)
+        # Check numpy only if it was already imported by the user.
+        numpy = sys.modules.get('numpy')
+        try:
+            if (numpy is not None and type(value) is numpy.ndarray and
+                not value.dtype.hasobject):
+                path += '.npy'
+                numpy.save(path, value)
+            else:
+                path += '.pkl'
+                with open(path, 'wb') as f:
+                    pickle.dump(value, f, pickle.HIGHEST_PROTOCOL)
+        except Exception:
+            # Not picklable: the entry is just dropped.
+            if os.path.exists(path):
+                os.remove(path)
+            return
+        self._spilled[key] = path
+
+    def _load(self, key):
+        path = self._spilled.pop(key)
+        try:
+            if path.endswith('.npy'):
+                return sys.modules['numpy'].load(path)
+            with open(path, 'rb') as f:
+                return pickle.load(f)
+        finally:
+            os.remove(path)
+
+    def _discard_spilled(self, key):
+        path = self._spilled.pop(key, None)
+        if path is not None:
+            os.remove(path)
+
 #-----------------------------------------------------------------------------
 # Main displayhook class
 #-----------------------------------------------------------------------------
@@ -64,6 +275,12 @@ class DisplayHook(Configurable):
     # FIXME: currently unused.
     extra_formatters = List(config=True)
 
+    # The memory budget of the output cache, in bytes (0 for no limit), and
+    # whether the results evicted from it are saved to disk, to be reloaded
+    # when accessed again through Out.  See OutputCache.
+    cache_bytes = Int(1 << 30, config=True)
+    cache_spill = Bool(False, config=True)
+
     # Each call to the In[] prompt raises it by 1, even the first.
     #prompt_count = Int(0)
 
@@ -123,6 +340,12 @@ class DisplayHook(Configurable):
         to_user_ns = {'_':self._,'__':self.__,'___':self.___}
         self.shell.user_ns.update(to_user_ns)
 
+        output_cache = self.shell.history_manager.output_hist
+        output_cache.max_entries = cache_size
+        output_cache.max_bytes = self.cache_bytes
+        output_cache.spill = self.cache_spill
+        output_cache.on_evict = self._result_evicted
+
     @property
     def prompt_count(self):
         return self.shell.execution_count
@@ -234,14 +457,6 @@ class DisplayHook(Configurable):
 
         # Avoid recursive reference when displaying _oh/Out
         if result is not self.shell.user_ns['_oh']:
-            if len(self.shell.user_ns['_oh']) >= self.cache_size and self.do_full_cache:
-                warn('Output cache limit (currently '+
-                      `self.cache_size`+' entries) hit.\n'
-                     'Flushing cache and resetting history counter...\n'
-                     'The only history variables available will be _,__,___ and _1\n'
-                     'with the current result.')
-
-                self.flush()
             # Don't overwrite '_' and friends if '_' is in __builtin__ (otherwise
             # we cause buggy behavior for things like gettext).
             if '_' not in __builtin__.__dict__:
@@ -258,6 +473,12 @@ class DisplayHook(Configurable):
                 self.shell.user_ns.update(to_main)
                 self.shell.user_ns['_oh'][self.prompt_count] = result
 
+    def _result_evicted(self, n):
+        """Called when result n is evicted from the output cache."""
+        # The _<n> variable would keep the result alive, it is only
+        # available through Out now.
+        self.shell.user_ns.pop('_'+`n`, None)
+
     def log_output(self, result):
         """Log the output."""
         if self.shell.logger.log_output:
@@ -13,14 +13,21 @@
 from __future__ import print_function
 
 # Stdlib imports
+import datetime
 import fnmatch
+import itertools
 import json
 import os
+import re
+import sqlite3
+import sre_constants
+import sre_parse
 import sys
 
 # Our own packages
 import IPython.utils.io
 
+from IPython.core.displayhook import OutputCache
 from IPython.utils.pickleshare import PickleShareDB
 from IPython.utils.io import ask_yes_no
 from IPython.utils.warn import warn
@@ -42,11 +49,16 @@ class HistoryManager(object):
     input_hist_raw = None
     # A list of directories visited during session
     dir_hist = None
-    # A dict of output history, keyed with ints from the shell's execution count
+    # A dict of output history, keyed with ints from the shell's execution
+    # count.  This is an OutputCache, bounded by the displayhook.
     output_hist = None
     # String with path to the history file
     hist_file = None
-    # PickleShareDB instance holding the raw data for the shadow history
+    # sqlite3 connection to the history database, see init_db
+    db = None
+    # The number of the current session in the history database
+    session_number = None
+    # PickleShareDB instance, where earlier versions kept the shadow history
     shadow_db = None
     # ShadowHist instance with the actual shadow history
     shadow_hist = None
@@ -61,6 +73,10 @@ class HistoryManager(object):
     # the history (it's annoying to rewind the first entry and land on an exit
     # call).
     _exit_commands = None
+
+    # The number of lines of the input history lists already written to the
+    # history database.
+    _db_len = 0
     
     def __init__(self, shell):
         """Create a new history manager associated with a shell instance.
@@ -82,14 +98,16 @@ class HistoryManager(object):
             self.dir_hist = []
 
         # dict of output history
-        self.output_hist = {}
+        self.output_hist = OutputCache()
 
         # Now the history file
         if shell.profile:
             histfname = 'history-%s' % shell.profile
         else:
             histfname = 'history'
-        self.hist_file = os.path.join(shell.ipython_dir, histfname + '.json')
+        self.hist_file = os.path.join(shell.ipython_dir, histfname + '.sqlite')
+        self.init_db()
+        self.new_session()
 
         # Objects related to shadow history management
         self._init_shadow_hist()
@@ -104,6 +122,80 @@ class HistoryManager(object):
         # Fill the history zero entry, user counter starts at 1
         self.store_inputs('\n', '\n')
 
+    def init_db(self):
+        """Connect to the history database, creating it if needed.
+
+        Each session gets a row in the sessions table, and every input goes
+        into the history table, keyed by session and line number.  If the
+        database is new and the JSON history file of earlier versions exists,
+        its contents are imported as the first session.
+        """
+        is_new = not os.path.exists(self.hist_file)
+        self.db = sqlite3.connect(self.hist_file,
+                        detect_types=sqlite3.PARSE_DECLTYPES)
+        self.db.execute("""CREATE TABLE IF NOT EXISTS sessions (session integer
+                        primary key autoincrement, start timestamp,
+                        end timestamp, num_cmds integer)""")
+        self.db.execute("""CREATE TABLE IF NOT EXISTS history (session integer,
+                        line integer, source text, source_raw text,
+                        PRIMARY KEY (session, line))""")
+        self.db.commit()
+        if is_new:
+            self._import_json_history()
+
+    def _import_json_history(self):
+        """Import the history file written by earlier versions, if any."""
+        json_file = os.path.splitext(self.hist_file)[0] + '.json'
+        try:
+            with open(json_file, 'rt') as hfile:
+                hist = json.load(hfile)
+        except (IOError, ValueError):
+            return
+        parsed, raw = hist.get('parsed', []), hist.get('raw', [])
+        cur = self.db.execute("INSERT INTO sessions VALUES (NULL, ?, ?, ?)",
+                              (None, None, len(raw)))
+        rows = [ (cur.lastrowid, i, source, source_raw) for (i, source,
+                 source_raw) in _zip_longest(parsed, raw) ]
+        self.db.executemany("INSERT INTO history VALUES (?, ?, ?, ?)", rows)
+        self.db.commit()
+
+    def new_session(self):
+        """Start a new session in the history database."""
+        cur = self.db.execute("INSERT INTO sessions VALUES (NULL, ?, NULL, 0)",
+                              (datetime.datetime.now(),))
+        self.db.commit()
+        self.session_number = cur.lastrowid
+        self._db_len = 0
+
+    def end_session(self):
+        """Write any pending input and record the end of the session."""
+        self._write_inputs(complete=True)
+        self.db.execute("UPDATE sessions SET end=?, num_cmds=(SELECT count(*) "
+                        "FROM history WHERE session=?) WHERE session=?",
+                        (datetime.datetime.now(), self.session_number,
+                         self.session_number))
+        self.db.commit()
+
+    def _write_inputs(self, complete=False):
+        """Write the new entries of the input history lists to the database.
+
+        Only lines present in both the raw and parsed lists are written, since
+        frontends may append to one list before the other.  If complete is
+        true, the whole session is written instead, to also catch the entries
+        modified in place since they were written.
+        """
+        parsed, raw = self.input_hist_parsed, self.input_hist_raw
+        if complete:
+            start, n = 0, max(len(parsed), len(raw))
+        else:
+            start, n = self._db_len, min(len(parsed), len(raw))
+        rows = [ (self.session_number, i, source, source_raw) for (i, source,
+                 source_raw) in _zip_longest(parsed, raw, start, n) ]
+        self.db.executemany("INSERT OR REPLACE INTO history VALUES "
+                            "(?, ?, ?, ?)", rows)
+        self.db.commit()
+        self._db_len = n
+
     def _init_shadow_hist(self):
         try:
             self.shadow_db = PickleShareDB(os.path.join(
@@ -114,44 +206,83 @@ class HistoryManager(object):
             print(r"only has ASCII characters, e.g. c:\home")
             print("Now it is", self.ipython_dir)
             sys.exit()
-        self.shadow_hist = ShadowHist(self.shadow_db, self.shell)
+        self.shadow_hist = ShadowHist(self.db, self.shell)
+        self.shadow_hist.import_pickleshare(self.shadow_db)
         
     def populate_readline_history(self):
         """Populate the readline history from the raw history.
 
-        We only store one copy of the raw history, which is persisted to a json
-        file on disk.  The readline history is repopulated from the contents of
-        this file."""
+        The readline history is repopulated from the most recent entries of
+        the history database, across sessions."""
 
         try:
             self.shell.readline.clear_history()
         except AttributeError:
             pass
         else:
-            for h in self.input_hist_raw:
+            cur = self.db.execute("SELECT source_raw FROM history WHERE "
+                                  "source_raw IS NOT NULL ORDER BY session "
+                                  "DESC, line DESC LIMIT ?",
+                                  (self.shell.history_length,))
+            for (h,) in reversed(cur.fetchall()):
                 if not h.isspace():
                     for line in h.splitlines():
                         self.shell.readline.add_history(line)
 
     def save_history(self):
-        """Save input history to a file (via readline library)."""
-        hist = dict(raw=self.input_hist_raw, #[-self.shell.history_length:],
-                    parsed=self.input_hist_parsed) #[-self.shell.history_length:])
-        with open(self.hist_file,'wt') as hfile:
-            json.dump(hist, hfile,
-                      sort_keys=True, indent=4)
+        """Write all pending input history to the history database."""
+        self._write_inputs(complete=True)
         
     def reload_history(self):
-        """Reload the input history from disk file."""
-
-        with open(self.hist_file,'rt') as hfile:
-            hist = json.load(hfile)
-            self.input_hist_parsed = hist['parsed']
-            self.input_hist_raw = hist['raw']
-            if self.shell.has_readline:
-                self.populate_readline_history()
+        """Reload the input history of this session from the database."""
+        parsed, raw = [], []
+        for source, source_raw in self.db.execute("SELECT source, source_raw "
+                "FROM history WHERE session=? ORDER BY line",
+                (self.session_number,)):
+            if source is not None:
+                parsed.append(source)
+            if source_raw is not None:
+                raw.append(source_raw)
+        # Update the lists in place, since the user namespace refers to them.
+        self.input_hist_parsed[:] = parsed
+        self.input_hist_raw[:] = raw
+        if self.shell.has_readline:
+            self.populate_readline_history()
+
+    def get_session_number(self, session):
+        """Return the number in the database of the given session.
+
+        None or 0 is the current session, negative numbers count back from it
+        (-1 is the previous session), positive numbers are returned as is.
+        """
+        if not session:
+            return self.session_number
+        if session > 0:
+            return session
+        cur = self.db.execute("SELECT session FROM sessions WHERE session<? "
+                              "ORDER BY session DESC LIMIT 1 OFFSET ?",
+                              (self.session_number, -session-1))
+        row = cur.fetchone()
+        if row is None:
+            raise IndexError('No session %r in the history' % session)
+        return row[0]
+
+    def get_session_history(self, session, start=0, stop=None, raw=False):
+        """Return the (line, input) pairs of a session from the database.
+
+        The lines in range(start, stop) are returned, or all the lines from
+        start if stop is None.
+        """
+        column = 'source_raw' if raw else 'source'
+        query = ("SELECT line, %s FROM history WHERE session=? AND line>=? "
+                 "AND %s IS NOT NULL" % (column, column))
+        params = [self.get_session_number(session), start]
+        if stop is not None:
+            query += " AND line<?"
+            params.append(stop)
+        return self.db.execute(query + " ORDER BY line", params).fetchall()
         
-    def get_history(self, index=None, raw=False, output=True):
+    def get_history(self, index=None, raw=False, output=True, session=None):
         """Get the history list.
 
         Get the input and output history.
@@ -166,6 +297,10 @@ class HistoryManager(object):
             If True, return the raw input.
         output : bool
             If True, then return the output as well.
+        session : int, optional
+            If given and not the current session, get the input history of
+            that session from the database, see :meth:`get_session_number`.
+            Outputs of past sessions are not kept, so they are None.
 
         Returns
         -------
@@ -174,6 +309,8 @@ class HistoryManager(object):
         a dict, keyed by the prompt number with the values of input. Raises
         IndexError if no history is found.
         """
+        if session and self.get_session_number(session) != self.session_number:
+            return self._get_past_history(index, raw, output, session)
         if raw:
             input_hist = self.input_hist_raw
         else:
@@ -200,6 +337,25 @@ class HistoryManager(object):
             raise IndexError('No history for range of indices: %r' % index)
         return hist
 
+    def _get_past_history(self, index, raw, output, session):
+        """get_history for a past session, answered by the database."""
+        if index is None:
+            rows = self.get_session_history(session, raw=raw)
+        elif isinstance(index, int):
+            rows = self.get_session_history(session, raw=raw)[-index:]
+        elif isinstance(index, tuple) and len(index) == 2:
+            rows = self.get_session_history(session, index[0], index[1], raw)
+        else:
+            raise IndexError('Not a valid index for the input history: %r'
+                             % index)
+        if output:
+            hist = dict((i, (source, None)) for (i, source) in rows)
+        else:
+            hist = dict(rows)
+        if not hist:
+            raise IndexError('No history for range of indices: %r' % index)
+        return hist
+
     def store_inputs(self, source, source_raw=None):
         """Store source and raw input in history and create input cache
         variables _i*.
@@ -223,6 +379,7 @@ class HistoryManager(object):
         self.input_hist_parsed.append(source.rstrip())
         self.input_hist_raw.append(source_raw.rstrip())
         self.shadow_hist.add(source)
+        self._write_inputs()
 
         # update the auto _i variables
         self._iii = self._ii
@@ -243,13 +400,43 @@ class HistoryManager(object):
         if len(self.input_hist_parsed) != len (self.input_hist_raw):
             self.input_hist_raw[:] = self.input_hist_parsed
 
-    def reset(self):
-        """Clear all histories managed by this object."""
+    def reset(self, new_session=True):
+        """Clear all histories managed by this object.
+
+        Since the input history numbering starts over, a new session is
+        started in the history database, unless new_session is False."""
+        if new_session:
+            self.end_session()
         self.input_hist_parsed[:] = []
         self.input_hist_raw[:] = []
         self.output_hist.clear()
         # The directory history can't be completely empty
         self.dir_hist[:] = [os.getcwd()]
+        if new_session:
+            self.new_session()
+
+
+def _to_unicode(s):
+    """Decode a byte string input to unicode for the database.
+
+    sqlite3 refuses non-ASCII byte strings, and the shell passes its inputs
+    as UTF-8 encoded ones.
+    """
+    if isinstance(s, str):
+        return s.decode('utf-8', 'replace')
+    return s
+
+
+def _zip_longest(parsed, raw, start=0, stop=None):
+    """Yield (i, parsed[i], raw[i]) for i in range(start, stop), with None
+    for the entries missing from the shorter list.  The inputs are decoded
+    to unicode."""
+    if stop is None:
+        stop = max(len(parsed), len(raw))
+    for i in xrange(start, stop):
+        source = parsed[i] if i < len(parsed) else None
+        source_raw = raw[i] if i < len(raw) else None
+        yield i, _to_unicode(source), _to_unicode(source_raw)
 
 
 def magic_history(self, parameter_s = ''):
@@ -286,11 +473,21 @@ def magic_history(self, parameter_s = ''):
       instead of the user-entered version: '%cd /' will be seen as
       'get_ipython().magic("%cd /")' instead of '%cd /'.
       
+      -s SESSION: print the history of another session, read from the
+      history database.  -1 is the previous session, -2 the one before, etc.
+      Outputs of past sessions are not kept, so -o has no effect then.
+
       -g: treat the arg as a pattern to grep for in (full) history.
       This includes the "shadow history" (almost all commands ever written).
       Use '%hist -g' to show full shadow history (may be very long).
       In shadow history, every index nuwber starts with 0.
 
+      -e: with -g, the pattern is a regular expression instead of a glob
+      pattern.
+
+      -l LIMIT: with -g, print at most the LIMIT most recent matches from the
+      shadow history.
+
       -f FILENAME: instead of printing the output to the screen, redirect it to
        the given file.  The file is always overwritten, though IPython asks for
        confirmation first if it already exists.
@@ -299,7 +496,7 @@ def magic_history(self, parameter_s = ''):
     if not self.shell.displayhook.do_full_cache:
         print('This feature is only available if numbered prompts are in use.')
         return
-    opts,args = self.parse_options(parameter_s,'gnoptsrf:',mode='list')
+    opts,args = self.parse_options(parameter_s,'egnoptrs:f:l:',mode='list')
 
     # Check if output to specific file was requested.
     try:
@@ -317,26 +514,49 @@ def magic_history(self, parameter_s = ''):
         outfile = open(outfname,'w')
         close_at_end = True
 
-    if 't' in opts:
-        input_hist = self.shell.history_manager.input_hist_parsed
-    elif 'r' in opts:
-        input_hist = self.shell.history_manager.input_hist_raw
+    history_manager = self.shell.history_manager
+    session = int(opts.get('s', 0))
+    try:
+        past_session = session and history_manager.get_session_number(
+            session) != history_manager.session_number
+    except IndexError, e:
+        warn(str(e))
+        return
+    if past_session:
+        # Past sessions are read from the history database, into a list
+        # indexed by input number like the ones of the current session.
+        rows = history_manager.get_session_history(session, raw='t' not in opts)
+        input_hist = [''] * (rows[-1][0]+1 if rows else 0)
+        for in_num, source in rows:
+            input_hist[in_num] = source
+        output_hist = {}
     else:
-        # Raw history is the default
-        input_hist = self.shell.history_manager.input_hist_raw
+        output_hist = history_manager.output_hist
+        if 't' in opts:
+            input_hist = history_manager.input_hist_parsed
+        else:
+            # Raw history is the default
+            input_hist = history_manager.input_hist_raw
             
     default_length = 40
     pattern = None
     if 'g' in opts:
         init = 1
         final = len(input_hist)
-        parts = parameter_s.split(None, 1)
-        if len(parts) == 1:
-            parts += '*'
-        head, pattern = parts
-        pattern = "*" + pattern + "*"
+        if 'e' in opts:
+            pattern = ' '.join(args)
+            try:
+                match = re.compile(pattern).search
+            except re.error, e:
+                warn('Invalid regular expression %r: %s' % (pattern, e))
+                return
+        else:
+            pattern = "*" + (' '.join(args) or '*') + "*"
+            match = lambda s: fnmatch.fnmatch(s, pattern)
     elif len(args) == 0:
-        final = len(input_hist)-1
+        # Leave out the last input of the current session, which is this very
+        # %history call.
+        final = len(input_hist) if past_session else len(input_hist)-1
         init = max(1,final-default_length)
     elif len(args) == 1:
         final = len(input_hist)
@@ -356,11 +576,12 @@ def magic_history(self, parameter_s = ''):
     
     found = False
     if pattern is not None:
-        sh = self.shell.history_manager.shadowhist.all()
-        for idx, s in sh:
-            if fnmatch.fnmatch(s, pattern):
-                print("0%d: %s" %(idx, s.expandtabs(4)), file=outfile)
-                found = True
+        limit = int(opts['l']) if 'l' in opts else None
+        sh = list(history_manager.shadow_hist.search(pattern,
+                            'regex' if 'e' in opts else 'glob', limit))
+        for idx, s in reversed(sh):
+            print("0%d: %s" %(idx, s.expandtabs(4)), file=outfile)
+            found = True
     
     if found:
         print("===", file=outfile)
@@ -374,7 +595,7 @@ def magic_history(self, parameter_s = ''):
         # to produce PEP-8 compliant history for safe pasting into an editor.
         inline = input_hist[in_num].expandtabs(4).rstrip()+'\n'
 
-        if pattern is not None and not fnmatch.fnmatch(inline, pattern):
+        if pattern is not None and not match(inline):
             continue
             
         multiline = int(inline.count('\n') > 1)
@@ -392,7 +613,7 @@ def magic_history(self, parameter_s = ''):
         else:
             print(inline, end='', file=outfile)
         if print_outputs:
-            output = self.shell.history_manager.output_hist.get(in_num)
+            output = output_hist.get(in_num)
             if output is not None:
                 print(repr(output), file=outfile)
 
@@ -433,10 +654,12 @@ def rep_f(self, arg):
     %rep foo
     
     Place the most recent line that has the substring "foo" to next input.
-    (e.g. 'svn ci -m foobar').    
+    (e.g. 'svn ci -m foobar').  If no line of the current session has it,
+    the shadow history of all sessions is searched.
     """
     
     opts,args = self.parse_options(arg,'',mode='list')
+    history_manager = self.shell.history_manager
     if not args:
         self.set_next_input(str(self.shell.user_ns["_"]))
         return
@@ -446,22 +669,27 @@ def rep_f(self, arg):
         if len(arg) > 1 and arg.startswith('0'):
             # get from shadow hist
             num = int(arg[1:])
-            line = self.shell.shadowhist.get(num)
+            line = history_manager.shadow_hist.get(num)
             self.set_next_input(str(line))
             return
         try:
             num = int(args[0])
-            self.set_next_input(str(self.shell.input_hist_raw[num]).rstrip())
+            self.set_next_input(str(history_manager.input_hist_raw[num]).rstrip())
             return
         except ValueError:
             pass
         
-        for h in reversed(self.shell.input_hist_raw):
+        for h in reversed(history_manager.input_hist_raw):
             if 'rep' in h:
                 continue
             if fnmatch.fnmatch(h,'*' + arg + '*'):
                 self.set_next_input(str(h).rstrip())
                 return
+        for idx, h in history_manager.shadow_hist.search('*' + arg + '*'):
+            if 'rep' in h:
+                continue
+            self.set_next_input(str(h).rstrip())
+            return
         
     try:
         lines = self.extract_input_slices(args, True)
@@ -471,48 +699,182 @@ def rep_f(self, arg):
         print("Not found in recent history:", args)
         
 
-_sentinel = object()
+def _glob_escape(s):
+    """Escape the characters of s that are special in SQLite GLOB patterns."""
+    return ''.join('[%s]' % c if c in '*?[' else c for c in s)
+
+
+def _regex_literals(pattern):
+    """Return the literal substrings every match of a regex must contain.
+
+    Only runs of literal characters at the top level of the pattern are
+    considered, and nothing is returned for case insensitive patterns or
+    patterns with a top level alternation.
+    """
+    try:
+        parsed = sre_parse.parse(pattern)
+    except (re.error, TypeError, ValueError):
+        return []
+    if parsed.pattern.flags & re.IGNORECASE:
+        return []
+    runs, run = [], []
+    for op, av in parsed:
+        if op == sre_constants.LITERAL:
+            run.append(unichr(av))
+            continue
+        if op == sre_constants.BRANCH:
+            return []
+        if run:
+            runs.append(u''.join(run))
+            run = []
+    if run:
+        runs.append(u''.join(run))
+    return runs
+
 
 class ShadowHist(object):
+    """Every distinct input ever entered, numbered in order of first entry.
+
+    The entries live in the shadow_history table of the history database.
+    Its integer primary key makes appends and lookups by index cheap, and the
+    unique index on the source is used to skip the inputs already seen.
+    Additions are committed along with the rest of the history by the
+    HistoryManager.
+
+    If SQLite has the FTS5 trigram tokenizer, a full text index of the
+    entries is kept up to date as well, so that :meth:`search` does not have
+    to scan the whole shadow history.
+    """
+    # Name of the table searched: the full text index if there is one,
+    # shadow_history otherwise.
+    _search_table = 'shadow_history'
+
     def __init__(self, db, shell):
-        # cmd => idx mapping
-        self.curidx = 0
         self.db = db
         self.disabled = False
         self.shell = shell
-    
-    def inc_idx(self):
-        idx = self.db.get('shadowhist_idx', 1)
-        self.db['shadowhist_idx'] = idx + 1
-        return idx
-        
+        self.db.execute("""CREATE TABLE IF NOT EXISTS shadow_history (idx
+                        integer primary key, source text unique)""")
+        self._init_index()
+
+    def _init_index(self):
+        """Create the full text index of the shadow history, if possible."""
+        exists = self.db.execute("SELECT count(*) FROM sqlite_master WHERE "
+                    "name='shadow_history_fts'").fetchone()[0]
+        if not exists:
+            try:
+                self.db.execute("""CREATE VIRTUAL TABLE shadow_history_fts
+                        USING fts5(source, content='shadow_history',
+                        content_rowid='idx',
+                        tokenize='trigram case_sensitive 1')""")
+            except sqlite3.OperationalError:
+                # No FTS5, or no trigram tokenizer (SQLite < 3.34): searches
+                # scan the shadow_history table.
+                return
+            self.db.execute("INSERT INTO shadow_history_fts(shadow_history_fts)"
+                            " VALUES ('rebuild')")
+            self.db.commit()
+        self._search_table = 'shadow_history_fts'
+
     def add(self, ent):
+        """Add an input to the shadow history, if it isn't there yet.
+
+        An input that can't be stored is reported and left out, the next ones
+        are still added.
+        """
         if self.disabled:
             return
+        ent = _to_unicode(ent)
         try:
-            old = self.db.hget('shadowhist', ent, _sentinel)
-            if old is not _sentinel:
-                return
-            newidx = self.inc_idx()
-            #print("new", newidx) # dbg
-            self.db.hset('shadowhist',ent, newidx)
+            cur = self.db.execute("INSERT OR IGNORE INTO shadow_history "
+                                  "(source) VALUES (?)", (ent,))
+            if cur.rowcount == 1 and self._search_table != 'shadow_history':
+                self.db.execute("INSERT INTO shadow_history_fts(rowid, source)"
+                                " VALUES (?, ?)", (cur.lastrowid, ent))
         except:
             self.shell.showtraceback()
-            print("WARNING: disabling shadow history")
-            self.disabled = True
+            print("WARNING: input not added to the shadow history")
     
     def all(self):
-        d = self.db.hdict('shadowhist')
-        items = [(i,s) for (s,i) in d.iteritems()]
-        items.sort()
-        return items
+        return self.db.execute("SELECT idx, source FROM shadow_history "
+                               "ORDER BY idx").fetchall()
 
     def get(self, idx):
-        all = self.all()
-        
-        for k, v in all:
-            if k == idx:
-                return v
+        row = self.db.execute("SELECT source FROM shadow_history WHERE idx=?",
+                              (idx,)).fetchone()
+        if row is not None:
+            return row[0]
+
+    def search(self, pattern, kind='glob', limit=None):
+        """Find the entries matching a pattern, most recent first.
+
+        Parameters
+        ----------
+        pattern : str
+            What to look for.
+
+        kind : str, optional (default 'glob')
+            How to interpret the pattern: 'glob' for a shell style wildcard
+            pattern matched against the whole entry, 'substring' for a
+            string contained in the entry, or 'regex' for a regular
+            expression found anywhere in the entry.
+
+        limit : int, optional
+            The maximum number of entries to return.
+
+        Returns
+        -------
+        An iterator over (index, source) pairs.  The rows are fetched from
+        the database as the iterator is consumed.
+        """
+        pattern = _to_unicode(pattern)
+        if kind == 'glob':
+            globs = [pattern.replace('[!', '[^')]
+        elif kind == 'substring':
+            globs = ['*%s*' % _glob_escape(pattern)]
+        elif kind == 'regex':
+            regex = re.compile(pattern)
+            # Use the index to narrow the search to the entries containing
+            # the literal parts of the pattern.  FTS5 needs at least three
+            # characters for that.
+            globs = ['*%s*' % _glob_escape(lit)
+                     for lit in _regex_literals(pattern) if len(lit) >= 3]
+        else:
+            raise ValueError("Unknown search kind: %r" % kind)
+
+        query = "SELECT rowid, source FROM %s" % self._search_table
+        if globs:
+            query += " WHERE " + " AND ".join(["source GLOB ?"] * len(globs))
+        query += " ORDER BY rowid DESC"
+        params = list(globs)
+        if limit is not None and kind != 'regex':
+            query += " LIMIT ?"
+            params.append(limit)
+        rows = self.db.execute(query, params)
+        if kind == 'regex':
+            rows = (row for row in rows if regex.search(row[1]))
+            if limit is not None:
+                rows = itertools.islice(rows, limit)
+        return rows
+
+    def import_pickleshare(self, pdb):
+        """Import the shadow history kept by earlier versions in a
+        PickleShareDB, keeping its numbering.
+
+        This is only done if the shadow history is still empty.
+        """
+        if self.db.execute("SELECT count(*) FROM shadow_history").fetchone()[0]:
+            return
+        d = pdb.hdict('shadowhist')
+        if d:
+            self.db.executemany("INSERT OR IGNORE INTO shadow_history "
+                                "VALUES (?, ?)",
+                                [ (i, _to_unicode(s)) for (s, i) in
+                                  d.iteritems() ])
+            if self._search_table != 'shadow_history':
+                self.db.execute("INSERT INTO shadow_history_fts"
+                        "(shadow_history_fts) VALUES ('rebuild')")
+            self.db.commit()
 
 
 def init_ipython(ip):
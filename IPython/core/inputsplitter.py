@@ -66,9 +66,11 @@ from __future__ import print_function
 # Imports
 #-----------------------------------------------------------------------------
 # stdlib
+import ast
 import codeop
 import re
 import sys
+import tokenize
 
 # IPython modules
 from IPython.utils.text import make_quoted_expr
@@ -109,6 +111,19 @@ ini_spaces_re = re.compile(r'^([ \t\r\f\v]+)')
 # before pure comments
 comment_line_re = re.compile('^\s*\#')
 
+# regexps for the incremental scanning of the input in InputSplitter.push: the
+# tokens that open or close brackets and strings, the end of each kind of
+# string and the clauses that continue a compound statement at flush-left.
+scan_re = re.compile(r'[uUbB]?[rR]?(\'{3}|"{3}|\'|")|#|[(\[{]|[)\]}]')
+string_end_re = {
+    "'" : re.compile(r"(?:[^'\\\n]|\\.)*'", re.DOTALL),
+    '"' : re.compile(r'(?:[^"\\\n]|\\.)*"', re.DOTALL),
+    "'''" : re.compile(r"(?:[^'\\]|\\.|'(?!''))*'''", re.DOTALL),
+    '"""' : re.compile(r'(?:[^"\\]|\\.|"(?!""))*"""', re.DOTALL),
+    }
+clause_keywords = ('else', 'elif', 'except', 'finally')
+clause_re = re.compile(r'(%s)\b' % '|'.join(clause_keywords))
+
 
 def num_ini_spaces(s):
     """Return the number of initial spaces in a string.
@@ -150,6 +165,53 @@ def remove_comments(src):
     return re.sub('#.*', '', src)
 
 
+def scan_line(line, depth=0, quote=None):
+    """Follow the nesting of brackets and strings through one line of input.
+
+    Parameters
+    ----------
+    line : string
+      A single line of Python input.
+
+    depth : int
+      The number of brackets still open before the line.
+
+    quote : str or None
+      The delimiter of the string still open before the line, if any.
+
+    Returns
+    -------
+    (depth, quote, continued) : tuple
+      The brackets and string still open after the line, and whether it ends
+      with a backslash continuation.
+    """
+    pos = 0
+    while True:
+        if quote is not None:
+            m = string_end_re[quote].match(line, pos)
+            if m is None:
+                if len(quote) == 3 or line.rstrip('\r\n').endswith('\\'):
+                    return depth, quote, False
+                # Unterminated string, a syntax error: close it here.
+                return depth, None, False
+            pos = m.end()
+            quote = None
+        m = scan_re.search(line, pos)
+        if m is None:
+            break
+        token = m.group()
+        pos = m.end()
+        if m.group(1):
+            quote = m.group(1)
+        elif token == '#':
+            return depth, None, False
+        elif token in '([{':
+            depth += 1
+        else:
+            depth -= 1
+    return depth, None, line.rstrip('\r\n').endswith('\\')
+
+
 def get_input_encoding():
     """Return the default standard input encoding.
 
@@ -165,11 +227,138 @@ def get_input_encoding():
 # Classes and functions for normal Python syntax handling
 #-----------------------------------------------------------------------------
 
-# HACK!  This implementation, written by Robert K a while ago using the
-# compiler module, is more robust than the other one below, but it expects its
-# input to be pure python (no ipython syntax).  For now we're using it as a
-# second-pass splitter after the first pass transforms the input to pure
-# python.
+class Block(object):
+    """A block of input found by :func:`find_blocks`.
+
+    Attributes
+    ----------
+    source : str
+      The source of the block, newline-terminated.
+
+    lineno, end_lineno : int
+      The first and last lines of the block in the input (1-indexed, after
+      stripping the blank lines around the input).
+
+    col_offset : int
+      The column where the block's first statement starts.
+
+    code : code object or None
+      The block compiled, if a compiler was given to :func:`find_blocks`.
+    """
+    def __init__(self, source, lineno=1, end_lineno=None, col_offset=0,
+                 code=None):
+        self.source = source
+        self.lineno = lineno
+        if end_lineno is None:
+            end_lineno = lineno + len(source.splitlines()) - 1
+        self.end_lineno = end_lineno
+        self.col_offset = col_offset
+        self.code = code
+
+    def __repr__(self):
+        return '<Block lines %d-%d: %r>' % (self.lineno, self.end_lineno,
+                                            self.source)
+
+
+def _find_statements(python):
+    """Return the (row, col) where each top-level statement of some Python
+    source starts, rows being 1-indexed.
+
+    The source is tokenized once.  Statements start at the first token of a
+    logical line at indentation level zero, except for the else, elif,
+    except and finally clauses of compound statements and for what follows
+    decorators.  Raises tokenize.TokenError or IndentationError if the source
+    can't be tokenized.
+    """
+    starts = []
+    level = 0
+    line_start = True
+    decorator = False
+    readline = iter(python.splitlines(True)).next
+    for ttype, tstring, (srow, scol), _, _ in tokenize.generate_tokens(readline):
+        if ttype == tokenize.INDENT:
+            level += 1
+        elif ttype == tokenize.DEDENT:
+            level -= 1
+        elif ttype == tokenize.NEWLINE:
+            line_start = True
+        elif ttype in (tokenize.NL, tokenize.COMMENT, tokenize.ENDMARKER):
+            continue
+        elif line_start:
+            line_start = False
+            if level == 0 and not (ttype == tokenize.NAME and
+                                   tstring in clause_keywords):
+                if not decorator:
+                    starts.append((srow, scol))
+                decorator = tstring == '@'
+    return starts
+
+
+def find_blocks(python, compiler=None, compile_last_line=True):
+    """Split multiple lines of code into blocks that can be executed singly,
+    with their position.
+
+    This makes a single pass over the input with the tokenize module, so it
+    takes time linear in the size of the input.
+
+    Parameters
+    ----------
+    python : str
+        Pure, exec'able Python code.
+
+    compiler : callable, optional
+        If given, it is called with the source of each block, and the code
+        object it returns is stored in the block's code attribute.  If a
+        block doesn't compile (the compiler raises an exception or returns
+        None), the whole input is returned as a single block without code.
+
+    compile_last_line : bool, optional
+        If false, the last block isn't given to the compiler when it is a
+        single line, and its code is left as None.  The shell runs such a
+        block through the prefilter, which compiles it anyway.
+
+    Returns
+    -------
+    blocks : list of Block
+    """
+    python_ori = python # save original in case we bail on error
+    # Strip the blank lines and trailing whitespace around the input, which
+    # don't belong to any block.
+    python = python.strip()
+    lines = python.splitlines()
+    whole = [Block(python_ori, 1, max(len(lines), 1))]
+    try:
+        starts = _find_statements(python)
+    except (tokenize.TokenError, IndentationError):
+        return whole
+    if not starts:
+        return []
+
+    # The first block also gets what comes before its first statement (e.g.
+    # comments), and each block the lines after it up to the next one.
+    starts[0] = (1, starts[0][1])
+    ends = [row-1 for row, col in starts[1:]] + [len(lines)]
+    blocks = []
+    for (row, col), end in zip(starts, ends):
+        block = Block('\n'.join(lines[row-1:end])+'\n', row, end, col)
+        if end == len(lines) and row == end and not compile_last_line:
+            pass
+        elif compiler is not None:
+            try:
+                block.code = compiler(block.source)
+            except (SyntaxError, OverflowError, ValueError, TypeError,
+                    MemoryError):
+                return whole
+            if block.code is None:
+                return whole
+        blocks.append(block)
+    return blocks
+
+
+def _parse(source):
+    """Parse some source without compiling it, only to check its syntax."""
+    return compile(source, '<input>', 'exec', ast.PyCF_ONLY_AST, True)
+
 
 def split_blocks(python):
     """ Split multiple lines of code into discrete commands that can be
@@ -183,68 +372,33 @@ def split_blocks(python):
     Returns
     -------
     commands : list of str
-        Separate commands that can be exec'ed independently.
+        Separate commands that can be exec'ed independently.  If the input
+        has a syntax error, it is returned whole as a single command.
     """
+    return [block.source for block in find_blocks(python, _parse)]
 
-    import compiler
-    
-    # compiler.parse treats trailing spaces after a newline as a
-    # SyntaxError.  This is different than codeop.CommandCompiler, which
-    # will compile the trailng spaces just fine.  We simply strip any
-    # trailing whitespace off.  Passing a string with trailing whitespace
-    # to exec will fail however.  There seems to be some inconsistency in
-    # how trailing whitespace is handled, but this seems to work.
-    python_ori = python # save original in case we bail on error
-    python = python.strip()
-
-    # The compiler module does not like unicode. We need to convert
-    # it encode it:
-    if isinstance(python, unicode):
-        # Use the utf-8-sig BOM so the compiler detects this a UTF-8
-        # encode string.
-        python = '\xef\xbb\xbf' + python.encode('utf-8')
 
-    # The compiler module will parse the code into an abstract syntax tree.
-    # This has a bug with str("a\nb"), but not str("""a\nb""")!!!
-    try:
-        ast = compiler.parse(python)
-    except:
-        return [python_ori]
-
-    # Uncomment to help debug the ast tree
-    # for n in ast.node:
-    #     print n.lineno,'->',n
-
-    # Each separate command is available by iterating over ast.node. The
-    # lineno attribute is the line number (1-indexed) beginning the commands
-    # suite.
-    # lines ending with ";" yield a Discard Node that doesn't have a lineno
-    # attribute.  These nodes can and should be discarded.  But there are
-    # other situations that cause Discard nodes that shouldn't be discarded.
-    # We might eventually discover other cases where lineno is None and have
-    # to put in a more sophisticated test.
-    linenos = [x.lineno-1 for x in ast.node if x.lineno is not None]
-
-    # When we finally get the slices, we will need to slice all the way to
-    # the end even though we don't have a line number for it. Fortunately,
-    # None does the job nicely.
-    linenos.append(None)
-
-    # Same problem at the other end: sometimes the ast tree has its
-    # first complete statement not starting on line 0. In this case
-    # we might miss part of it.  This fixes ticket 266993.  Thanks Gael!
-    linenos[0] = 0
+class BufferSource(object):
+    """The source joined from a buffer of lines, computed when it is read.
 
-    lines = python.splitlines()
+    The value is cached in the _sources dict of the instance, which must be
+    cleared when the buffer changes.
+    """
+    def __init__(self, buffer_name):
+        self.buffer_name = buffer_name
 
-    # Create a list of atomic commands.
-    cmds = []
-    for i, j in zip(linenos[:-1], linenos[1:]):
-        cmd = lines[i:j]
-        if cmd:
-            cmds.append('\n'.join(cmd)+'\n')
+    def __get__(self, obj, cls):
+        if obj is None:
+            return self
+        try:
+            return obj._sources[self.buffer_name]
+        except KeyError:
+            source = obj._set_source(getattr(obj, self.buffer_name))
+            obj._sources[self.buffer_name] = source
+            return source
 
-    return cmds
+    def __set__(self, obj, value):
+        raise AttributeError("can't set attribute")
 
 
 class InputSplitter(object):
@@ -284,10 +438,11 @@ class InputSplitter(object):
     # String where the current full source input is stored, properly encoded.
     # Reading this attribute is the normal way of querying the currently pushed
     # source code, that has been properly encoded.
-    source = ''
-    # Code object corresponding to the current source.  It is automatically
-    # synced to the source, so it can be queried at any time to obtain the code
-    # object; it will be None if the source doesn't compile to valid Python.
+    source = BufferSource('_buffer')
+    # Code object corresponding to the last statement of the current source.
+    # It is automatically synced to the source, so it can be queried at any
+    # time to obtain the code object; it will be None if the statement doesn't
+    # compile to valid Python.
     code = None
     # Input mode
     input_mode = 'line'
@@ -302,6 +457,19 @@ class InputSplitter(object):
     _full_dedent = False
     # Boolean indicating whether the current block is complete
     _is_complete = None
+    # Cache of the sources joined from the buffers, see BufferSource
+    _sources = None
+
+    # The state of the incremental scanning of the input, which lets push()
+    # compile only the last top-level statement instead of the whole buffer.
+    # The lines of the last top-level statement
+    _stmt_lines = None
+    # Number of top-level statements so far
+    _stmt_count = 0
+    # Whether the last top-level statement is a decorator
+    _stmt_decorator = False
+    # Brackets and string open, and backslash continuation, see scan_line()
+    _scan_state = (0, None, False)
     
     def __init__(self, input_mode=None):
         """Create a new InputSplitter instance.
@@ -325,6 +493,8 @@ class InputSplitter(object):
           to prepending a full reset() to every push() call.
         """
         self._buffer = []
+        self._sources = {}
+        self._stmt_lines = []
         self._compile = codeop.CommandCompiler()
         self.encoding = get_input_encoding()
         self.input_mode = InputSplitter.input_mode if input_mode is None \
@@ -334,10 +504,14 @@ class InputSplitter(object):
         """Reset the input buffer and associated state."""
         self.indent_spaces = 0
         self._buffer[:] = []
-        self.source = ''
+        self._sources.clear()
         self.code = None
         self._is_complete = False
         self._full_dedent = False
+        self._stmt_lines = []
+        self._stmt_count = 0
+        self._stmt_decorator = False
+        self._scan_state = (0, None, False)
 
     def source_reset(self):
         """Return the input source and perform a full reset.
@@ -372,7 +546,7 @@ class InputSplitter(object):
             self.reset()
         
         self._store(lines)
-        source = self.source
+        self._scan(lines)
 
         # Before calling _compile(), reset the code object to None so that if an
         # exception is raised in compilation, we don't mislead by having
@@ -380,12 +554,25 @@ class InputSplitter(object):
         self.code, self._is_complete = None, None
 
         # Honor termination lines properly
-        if source.rstrip().endswith('\\'):
-            return False
+        for line in reversed(self._stmt_lines):
+            if line.strip():
+                if line.rstrip().endswith('\\'):
+                    return False
+                break
 
         self._update_indent(lines)
+
+        # Input with brackets or a string still open can't be complete.
+        depth, quote, continued = self._scan_state
+        if depth > 0 or quote is not None:
+            self._is_complete = False
+            return False
+
+        # The statements before the last one are complete (or invalid, which
+        # was reported when they were pushed), so only the last one needs to
+        # be compiled.  This keeps pushing a long input line by line linear.
         try:
-            self.code = self._compile(source)
+            self.code = self._compile(self._set_source(self._stmt_lines))
         # Invalid syntax can produce any of a number of different errors from
         # inside the compiler, so we have to catch them all.  Syntax errors
         # immediately produce a 'ready' block, so the invalid Python can be
@@ -449,14 +636,12 @@ class InputSplitter(object):
         if self.indent_spaces==0:
             if self.input_mode=='line':
                 return False
-            else:
-                nblocks = len(split_blocks(''.join(self._buffer)))
-                if nblocks==1:
-                    return False
+            elif self._stmt_count <= 1:
+                return False
 
         # When input is complete, then termination is marked by an extra blank
         # line at the end.
-        last_line = self.source.splitlines()[-1]
+        last_line = self._buffer[-1].splitlines()[-1]
         return bool(last_line and not last_line.isspace())
         
     def split_blocks(self, lines):
@@ -475,6 +660,31 @@ class InputSplitter(object):
           A list of strings, each possibly multiline.  Each string corresponds
           to a single block that can be compiled in 'single' mode (unless it
           has a syntax error)."""
+        return [block.source for block in self.find_blocks(lines, _parse)]
+
+    def find_blocks(self, lines, compiler=None, compile_last_line=True):
+        """Split a multiline string into multiple input blocks, with their
+        position and optionally their code.
+
+        Note: this method starts by performing a full reset().
+
+        Parameters
+        ----------
+        lines : str
+          A possibly multiline string.
+
+        compiler : callable, optional
+          Called with the source of each block to compile it, see
+          :func:`find_blocks`.
+
+        compile_last_line : bool, optional
+          Whether to compile the last block if it is a single line, see
+          :func:`find_blocks`.
+
+        Returns
+        -------
+        blocks : list of Block
+        """
 
         # This code is fairly delicate.  If you make any changes here, make
         # absolutely sure that you do run the full test suite and ALL tests
@@ -537,9 +747,9 @@ class InputSplitter(object):
             
         #return blocks
         # HACK!!! Now that our input is in blocks but guaranteed to be pure
-        # python syntax, feed it back a second time through the AST-based
+        # python syntax, feed it back a second time through the tokenizer-based
         # splitter, which is more accurate than ours.
-        return split_blocks(''.join(blocks))
+        return find_blocks(''.join(blocks), compiler, compile_last_line)
 
     #------------------------------------------------------------------------
     # Private interface
@@ -591,7 +801,7 @@ class InputSplitter(object):
             if line and not line.isspace():
                 self.indent_spaces, self._full_dedent = self._find_indent(line)
 
-    def _store(self, lines, buffer=None, store='source'):
+    def _store(self, lines, buffer=None):
         """Store one or more lines of input.
 
         If input lines are not newline-terminated, a newline is automatically
@@ -604,7 +814,27 @@ class InputSplitter(object):
             buffer.append(lines)
         else:
             buffer.append(lines+'\n')
-        setattr(self, store, self._set_source(buffer))
+        self._sources.clear()
+
+    def _scan(self, lines):
+        """Follow new lines of input, tracking where the last top-level
+        statement starts."""
+        if not lines.endswith('\n'):
+            lines += '\n'
+        for line in lines.splitlines(True):
+            depth, quote, continued = self._scan_state
+            # A new top-level statement starts at a flush-left line of code,
+            # unless it continues a compound statement or a decorator.
+            if (depth <= 0 and quote is None and not continued and
+                line[0] not in ' \t\r\n\f#' and not clause_re.match(line)):
+                decorator = line.startswith('@')
+                if not self._stmt_decorator:
+                    self._stmt_lines = []
+                    self._stmt_count += 1
+                self._stmt_decorator = decorator
+            self._stmt_lines.append(line)
+            depth, quote, continued = scan_line(line, max(depth, 0), quote)
+            self._scan_state = depth, quote, continued
 
     def _set_source(self, buffer):
         return ''.join(buffer).encode(self.encoding)
@@ -927,7 +1157,7 @@ class IPythonInputSplitter(InputSplitter):
     """An input splitter that recognizes all of IPython's special syntax."""
 
     # String with raw, untransformed input.
-    source_raw = ''
+    source_raw = BufferSource('_buffer_raw')
 
     # Private attributes
     
@@ -942,7 +1172,6 @@ class IPythonInputSplitter(InputSplitter):
         """Reset the input buffer and associated state."""
         InputSplitter.reset(self)
         self._buffer_raw[:] = []
-        self.source_raw = ''
 
     def source_raw_reset(self):
         """Return input and raw source and perform a full reset.
@@ -997,7 +1226,7 @@ class IPythonInputSplitter(InputSplitter):
         # Store raw source before applying any transformations to it.  Note
         # that this must be done *after* the reset() call that would otherwise
         # flush the buffer.
-        self._store(lines, self._buffer_raw, 'source_raw')
+        self._store(lines, self._buffer_raw)
         
         try:
             push = super(IPythonInputSplitter, self).push
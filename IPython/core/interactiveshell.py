@@ -176,6 +176,8 @@ class InteractiveShell(Configurable, Magic):
     quiet = CBool(False, config=True)
 
     history_length = Int(10000, config=True)
+    # The maximum number of completions returned, 0 for no limit.
+    completion_limit = Int(1000, config=True)
     
     # The readline stuff will eventually be moved to the terminal subclass
     # but for now, we can't do that as readline is welded in everywhere.
@@ -206,6 +208,13 @@ class InteractiveShell(Configurable, Magic):
     separate_in = SeparateStr('\n', config=True)
     separate_out = SeparateStr('', config=True)
     separate_out2 = SeparateStr('', config=True)
+    # Bounds of the registry of the inputs' sources in the linecache, used by
+    # tracebacks, see CachingCompiler.
+    source_cache_size = Int(1000, config=True)
+    source_cache_age = Int(0, config=True)
+    # The number of compiled inputs kept to be run again without being
+    # recompiled, see CachingCompiler.
+    code_cache_size = Int(500, config=True)
     wildcards_case_sensitive = CBool(True, config=True)
     xmode = CaselessStrEnum(('Context','Plain', 'Verbose'), 
                             default_value='Context', config=True)
@@ -375,8 +384,16 @@ class InteractiveShell(Configurable, Magic):
     def init_instance_attrs(self):
         self.more = False
 
+        # The version of the namespaces, bumped whenever they may have changed
+        # (see _ofind), and the object lookups cached for that version.
+        self.ns_version = 0
+        self._ofind_cache = {}
+        self._ofind_cache_version = 0
+
         # command compiler
-        self.compile = CachingCompiler()
+        self.compile = CachingCompiler(max_entries=self.source_cache_size,
+                                       max_age=self.source_cache_age,
+                                       code_cache_size=self.code_cache_size)
         
         # User input buffers
         # NOTE: these variables are slated for full removal, once we are 100%
@@ -981,14 +998,16 @@ class InteractiveShell(Configurable, Magic):
         # Finally, update the real user's namespace
         self.user_ns.update(ns)
 
-    def reset(self):
+    def reset(self, new_session=True):
         """Clear all internal namespaces.
 
         Note that this is much more aggressive than %reset, since it clears
         fully all namespaces, as well as all input/output lists.
+
+        If new_session is True, a new history session is started.
         """
         # Clear histories
-        self.history_manager.reset()
+        self.history_manager.reset(new_session)
 
         # Reset counter used to index all histories
         self.execution_count = 0
@@ -1013,6 +1032,7 @@ class InteractiveShell(Configurable, Magic):
         # Restore the default and user aliases
         self.alias_manager.clear_aliases()
         self.alias_manager.init_aliases()
+        self.ns_version += 1
 
     def reset_selective(self, regex=None):
         """Clear selective variables from internal namespaces based on a
@@ -1035,6 +1055,7 @@ class InteractiveShell(Configurable, Magic):
                 for var in ns:
                     if m.search(var):
                         del ns[var]        
+            self.ns_version += 1
         
     def push(self, variables, interactive=True):
         """Inject a group of variables into the IPython user namespace.
@@ -1084,18 +1105,46 @@ class InteractiveShell(Configurable, Magic):
         else:
             for name,val in vdict.iteritems():
                 config_ns[name] = val
+        self.ns_version += 1
 
     #-------------------------------------------------------------------------
     # Things related to object introspection
     #-------------------------------------------------------------------------
 
+    # The most lookups cached for a version of the namespaces.
+    ofind_cache_size = 1000
+
     def _ofind(self, oname, namespaces=None):
         """Find an object in the available namespaces.
 
         self._ofind(oname) -> dict with keys: found,obj,ospace,ismagic
 
         Has special code to detect magic functions.
+
+        The lookups in the default namespaces are cached until ns_version is
+        bumped, which happens whenever code is run, variables are pushed or
+        deleted, or magics are called.  Changes made to the objects by other
+        means (e.g. by threads) are not seen until then.
         """
+        if namespaces is not None:
+            return self._ofind_uncached(oname, namespaces)
+        cache = self._ofind_cache
+        if self._ofind_cache_version != self.ns_version:
+            cache.clear()
+            self._ofind_cache_version = self.ns_version
+        info = cache.get(oname)
+        if info is None:
+            info = self._ofind_uncached(oname)
+            # Failed ascii conversions print a message each time.
+            if 'obj' in info:
+                if len(cache) >= self.ofind_cache_size:
+                    cache.clear()
+                cache[oname] = info
+        return dict(info)
+
+    def _ofind_uncached(self, oname, namespaces=None):
+        """Find an object in the available namespaces, without caching, see
+        _ofind."""
         #oname = oname.strip()
         #print '1- oname: <%r>' % oname  # dbg
         try:
@@ -1236,6 +1285,8 @@ class InteractiveShell(Configurable, Magic):
 
     def init_history(self):
         self.history_manager = HistoryManager(shell=self)
+        # Let the compiler find the sources it dropped from the linecache.
+        self.compile.input_hist = self.history_manager.input_hist_parsed
 
     def save_history(self):
         """Save input history to a file (via readline library)."""
@@ -1264,8 +1315,8 @@ class InteractiveShell(Configurable, Magic):
                 self.reload_history()
         return wrapper
     
-    def get_history(self, index=None, raw=False, output=True):
-        return self.history_manager.get_history(index, raw, output)
+    def get_history(self, index=None, raw=False, output=True, session=None):
+        return self.history_manager.get_history(index, raw, output, session)
     
 
     #-------------------------------------------------------------------------
@@ -1598,15 +1649,21 @@ class InteractiveShell(Configurable, Magic):
         (typically over the network by remote frontends).
         """
         from IPython.core.completer import IPCompleter
-        from IPython.core.completerlib import (module_completer,
+        from IPython.core.completerlib import (ModuleIndex, module_completer,
                                                magic_run_completer, cd_completer)
+
+        # The index of the modules for import completion, which is brought
+        # up to date in the background.
+        self.module_index = ModuleIndex(self.db)
+        self.module_index.start()
         
         self.Completer = IPCompleter(self,
                                      self.user_ns,
                                      self.user_global_ns,
                                      self.readline_omit__names,
                                      self.alias_manager.alias_table,
-                                     self.has_readline)
+                                     self.has_readline,
+                                     self.completion_limit)
         
         # Add custom completers to the basic ones built into IPCompleter
         sdisp = self.strdispatchers.get('complete_command', StrDispatch())
@@ -1624,7 +1681,8 @@ class InteractiveShell(Configurable, Magic):
         if self.has_readline:
             self.set_readline_completer()
 
-    def complete(self, text, line=None, cursor_pos=None):
+    def complete(self, text, line=None, cursor_pos=None, matches=None,
+                 cancelled=None):
         """Return the completed text and a list of completions.
 
         Parameters
@@ -1641,6 +1699,13 @@ class InteractiveShell(Configurable, Magic):
            cursor_pos : int, optional
              The position of the cursor on the input line.
 
+           matches : list, optional
+             A list the matches are collected into as they are found.
+
+           cancelled : threading.Event, optional
+             Stops the completion early when set.  Both are used by the zmq
+             kernel to bound the time spent on a completion request.
+
         Returns
         -------
           text : string
@@ -1667,7 +1732,8 @@ class InteractiveShell(Configurable, Magic):
 
         # Inject names into __builtin__ so we can complete on the added names.
         with self.builtin_trap:
-            return self.Completer.complete(text, line, cursor_pos)
+            return self.Completer.complete(text, line, cursor_pos, matches,
+                                           cancelled)
 
     def set_custom_completer(self, completer, pos=0):
         """Adds a new custom completer function.
@@ -1734,9 +1800,12 @@ class InteractiveShell(Configurable, Magic):
             error("Magic function `%s` not found." % magic_name)
         else:
             magic_args = self.var_expand(magic_args,1)
-            with nested(self.builtin_trap,):
-                result = fn(magic_args)
-                return result
+            try:
+                with nested(self.builtin_trap,):
+                    result = fn(magic_args)
+                    return result
+            finally:
+                self.ns_version += 1
 
     def define_magic(self, magicname, func):
         """Expose own function as magic function for ipython 
@@ -1754,6 +1823,7 @@ class InteractiveShell(Configurable, Magic):
         im = types.MethodType(func,self)
         old = getattr(self, "magic_" + magicname, None)
         setattr(self, "magic_" + magicname, im)
+        self.ns_version += 1
         return old
 
     #-------------------------------------------------------------------------
@@ -1949,8 +2019,11 @@ class InteractiveShell(Configurable, Magic):
 
     def ex(self, cmd):
         """Execute a normal python statement in user namespace."""
-        with nested(self.builtin_trap,):
-            exec cmd in self.user_global_ns, self.user_ns
+        try:
+            with nested(self.builtin_trap,):
+                exec cmd in self.user_global_ns, self.user_ns
+        finally:
+            self.ns_version += 1
 
     def ev(self, expr):
         """Evaluate python expression expr in user namespace.
@@ -2016,6 +2089,7 @@ class InteractiveShell(Configurable, Magic):
                     self.showtraceback(exception_only=True)
             except:
                 self.showtraceback()
+        self.ns_version += 1
 
     def safe_execfile_ipy(self, fname):
         """Like safe_execfile, but for .ipy files with IPython syntax.
@@ -2085,8 +2159,15 @@ class InteractiveShell(Configurable, Magic):
         """
         
         # We need to break up the input into executable blocks that can be run
-        # in 'single' mode, to provide comfortable user behavior.
-        blocks = self.input_splitter.split_blocks(cell)
+        # in 'single' mode, to provide comfortable user behavior.  The blocks
+        # are compiled as they are found, and their code objects are run below
+        # instead of compiling their source again.  A last block of a single
+        # line is left alone: it goes through run_one_block, which compiles
+        # it in 'single' mode after the prefilter.
+        compiler = lambda source: self.compile(source, 'exec',
+                                               self.execution_count)
+        blocks = self.input_splitter.find_blocks(cell, compiler,
+                                                 compile_last_line=False)
         
         if not blocks:
             return
@@ -2094,7 +2175,7 @@ class InteractiveShell(Configurable, Magic):
         # Store the 'ipython' version of the cell as well, since that's what
         # needs to go into the translated history and get executed (the
         # original cell may contain non-python syntax).
-        ipy_cell = ''.join(blocks)
+        ipy_cell = ''.join(block.source for block in blocks)
 
         # Store raw and processed history
         self.history_manager.store_inputs(ipy_cell, cell)
@@ -2119,8 +2200,12 @@ class InteractiveShell(Configurable, Magic):
 
             # Single-block input should behave like an interactive prompt
             if len(blocks) == 1:
+                block = blocks[0]
+                if block.code is not None:
+                    out = self.run_code(block.code)
+                else:
+                    out = self.run_one_block(block.source)
                 # since we return here, we need to update the execution count
-                out = self.run_one_block(blocks[0])
                 self.execution_count += 1
                 return out
 
@@ -2129,7 +2214,7 @@ class InteractiveShell(Configurable, Magic):
             # Otherwise just feed the whole thing to run_code.  This seems like
             # a reasonable usability design.
             last = blocks[-1]
-            last_nlines = len(last.splitlines())
+            last_nlines = len(last.source.splitlines())
 
             # Note: below, whenever we call run_code, we must sync history
             # ourselves, because run_code is NOT meant to manage history at all.
@@ -2137,22 +2222,30 @@ class InteractiveShell(Configurable, Magic):
                 # Here we consider the cell split between 'body' and 'last',
                 # store all history and execute 'body', and if successful, then
                 # proceed to execute 'last'.
-
-                # Get the main body to run as a cell
-                ipy_body = ''.join(blocks[:-1])
-                retcode = self.run_source(ipy_body, symbol='exec',
-                                          post_execute=False)
-                if retcode==0:
+                if self.run_blocks(blocks[:-1]) == 0:
                     # And the last expression via runlines so it produces output
-                    self.run_one_block(last)
+                    self.run_one_block(last.source)
             else:
                 # Run the whole cell as one entity, storing both raw and
                 # processed input in history
-                self.run_source(ipy_cell, symbol='exec')
+                self.run_blocks(blocks)
+                self.run_post_execute()
 
         # Each cell is a *single* input, regardless of how many lines it has
         self.execution_count += 1
 
+    def run_blocks(self, blocks):
+        """Run the code of blocks found by the input splitter, one after
+        the other, stopping at the first error.
+
+        The post-execution functions are not called.  Returns 0 if all the
+        blocks ran successfully, 1 otherwise.
+        """
+        for block in blocks:
+            if self.run_code(block.code, post_execute=False):
+                return 1
+        return 0
+
     def run_one_block(self, block):
         """Run a single interactive block.
 
@@ -2321,6 +2414,7 @@ class InteractiveShell(Configurable, Magic):
             finally:
                 # Reset our crash handler in place
                 sys.excepthook = old_excepthook
+                self.ns_version += 1
         except SystemExit:
             self.reset_buffer()
             self.showtraceback(exception_only=True)
@@ -2335,25 +2429,29 @@ class InteractiveShell(Configurable, Magic):
             if softspace(sys.stdout, 0):
                 print
 
-        # Execute any registered post-execution functions.  Here, any errors
-        # are reported only minimally and just on the terminal, because the
-        # main exception channel may be occupied with a user traceback.
-        # FIXME: we need to think this mechanism a little more carefully.
         if post_execute:
-            for func in self._post_execute:
-                try:
-                    func()
-                except:
-                    head = '[ ERROR ] Evaluating post_execute function: %s' % \
-                           func
-                    print >> io.Term.cout, head
-                    print >> io.Term.cout, self._simple_error()
-                    print >> io.Term.cout, 'Removing from post_execute'
-                    self._post_execute.remove(func)
+            self.run_post_execute()
 
         # Flush out code object which has been run (and source)
         self.code_to_run = None
         return outflag
+
+    def run_post_execute(self):
+        """Call the functions registered with register_post_execute."""
+        # Execute any registered post-execution functions.  Here, any errors
+        # are reported only minimally and just on the terminal, because the
+        # main exception channel may be occupied with a user traceback.
+        # FIXME: we need to think this mechanism a little more carefully.
+        for func in self._post_execute:
+            try:
+                func()
+            except:
+                head = '[ ERROR ] Evaluating post_execute function: %s' % \
+                       func
+                print >> io.Term.cout, head
+                print >> io.Term.cout, self._simple_error()
+                print >> io.Term.cout, 'Removing from post_execute'
+                self._post_execute.remove(func)
         
     # For backwards compatibility
     runcode = run_code
@@ -2525,9 +2623,10 @@ class InteractiveShell(Configurable, Magic):
 
         
         self.save_history()
+        self.history_manager.end_session()
 
         # Clear all user namespaces to release all references cleanly.
-        self.reset()
+        self.reset(new_session=False)
 
         # Run user hooks
         self.hooks.shutdown_hook()
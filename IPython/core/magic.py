@@ -73,6 +73,57 @@ def on_off(tag):
 
 class Bunch: pass
 
+# The most threads listing the folders of $PATH in %rehashx.
+rehashx_threads = 8
+
+def parallel_map(func, items, nthreads):
+    """Return map(func, items), computed by up to nthreads threads.
+
+    This is meant for functions that spend their time waiting for IO, like
+    listing folders on network filesystems.
+    """
+    nthreads = min(nthreads, len(items))
+    if nthreads < 2:
+        return map(func, items)
+    try:
+        from multiprocessing.pool import ThreadPool
+        pool = ThreadPool(nthreads)
+    except (ImportError, OSError):
+        # No working semaphores on this platform.
+        return map(func, items)
+    try:
+        return pool.map(func, items)
+    finally:
+        pool.close()
+
+# How long after its last change a folder listed by %rehashx must have been
+# listed for that listing to be trusted, in seconds.  Some filesystems only
+# keep the mtime to the second (or two), so files added in the same second
+# as a listing could be missed.
+rehashx_mtime_slack = 2
+
+def scan_exec_dir(pdir, isexec, cached=None):
+    """List the executable files of a folder.
+
+    Returns a (mtime, names, listed) tuple, listed being the time of the
+    listing, or None if the folder can't be read.  cached is returned instead
+    if the mtime of the folder is still that of cached, and cached was listed
+    well after that mtime.  As changing the permissions of a file doesn't
+    change the mtime of its folder, files made executable are only found once
+    the folder changes, or without cached.
+    """
+    try:
+        mtime = os.stat(pdir).st_mtime
+        if (cached is not None and cached[0] == mtime and
+            cached[2] - mtime >= rehashx_mtime_slack):
+            return cached
+        listed = time.time()
+        join = os.path.join
+        names = [ff for ff in os.listdir(pdir) if isexec(join(pdir, ff))]
+        return mtime, names, listed
+    except OSError:
+        return None
+
 def compress_dhist(dh):
     head, tail = dh[:-10], dh[-10:]
 
@@ -2531,24 +2582,36 @@ Defaulting color scheme to 'NoColor'"""
 
         This version explicitly checks that every entry in $PATH is a file
         with execute access (os.X_OK), so it is much slower than %rehash.
+        To make up for it, the folders are listed in parallel, and the
+        executables of each folder are cached for the session with the mtime
+        of the folder, so only the folders that changed since the last call
+        are listed again.  Only the aliases that changed are redefined, and
+        those of executables that are gone are removed.
+
+        Options:
+
+          -f: list all the folders again, ignoring the cache.  Making a file
+          executable doesn't change the mtime of its folder, so use this to
+          find the files made executable since the last call.
 
         Under Windows, it checks executability as a match agains a
         '|'-separated string of extensions, stored in the IPython config
         variable win_exec_ext.  This defaults to 'exe|com|bat'.
         
-        This function also resets the root module cache of module completer,
-        used on slow filesystems.
+        This function also lists again all the folders of the module index
+        used by import completion, in the background.
         """
         from IPython.core.alias import InvalidAliasError
 
-        # for the benefit of module completer in ipy_completers.py
-        del self.db['rootmodules']
+        opts, args = self.parse_options(parameter_s, 'f')
+
+        # for the benefit of module completer in completerlib.py
+        self.shell.module_index.clear()
+        self.shell.module_index.start()
         
         path = [os.path.abspath(os.path.expanduser(p)) for p in 
             os.environ.get('PATH','').split(os.pathsep)]
-        path = filter(os.path.isdir,path)
 
-        syscmdlist = []
         # Now define isexec in a cross platform manner.
         if os.name == 'posix':
             isexec = lambda fname:os.path.isfile(fname) and \
@@ -2562,48 +2625,63 @@ Defaulting color scheme to 'NoColor'"""
                 winext += '|py'
             execre = re.compile(r'(.*)\.(%s)$' % winext,re.IGNORECASE)
             isexec = lambda fname:os.path.isfile(fname) and execre.match(fname)
-        savedir = os.getcwd()
 
-        # Now walk the paths looking for executables to alias.
-        try:
-            # write the whole loop for posix/Windows so we don't have an if in
-            # the innermost part
-            if os.name == 'posix':
-                for pdir in path:
-                    os.chdir(pdir)
-                    for ff in os.listdir(pdir):
-                        if isexec(ff):
-                            try:
-                                # Removes dots from the name since ipython
-                                # will assume names with dots to be python.
-                                self.shell.alias_manager.define_alias(
-                                    ff.replace('.',''), ff)
-                            except InvalidAliasError:
-                                pass
-                            else:
-                                syscmdlist.append(ff)
-            else:
-                no_alias = self.shell.alias_manager.no_alias
-                for pdir in path:
-                    os.chdir(pdir)
-                    for ff in os.listdir(pdir):
-                        base, ext = os.path.splitext(ff)
-                        if isexec(ff) and base.lower() not in no_alias:
-                            if ext.lower() == '.exe':
-                                ff = base
-                                try:
-                                    # Removes dots from the name since ipython
-                                    # will assume names with dots to be python.
-                                    self.shell.alias_manager.define_alias(
-                                        base.lower().replace('.',''), ff)
-                                except InvalidAliasError:
-                                    pass
-                                syscmdlist.append(ff)
-            db = self.db
-            db['syscmdlist'] = syscmdlist
-        finally:
-            os.chdir(savedir)
-        
+        # The executables of each folder are cached with its mtime, and the
+        # folders that changed are listed in parallel.
+        db = self.db
+        if 'f' in opts:
+            cache = {}
+        else:
+            cache = getattr(self.shell, '_rehashx_dirs', {})
+        scan = lambda pdir: scan_exec_dir(pdir, isexec, cache.get(pdir))
+        results = parallel_map(scan, path, rehashx_threads)
+        for pdir, result in zip(path, results):
+            if result is not None:
+                cache[pdir] = result
+        self.shell._rehashx_dirs = cache
+
+        # The aliases to define, the later folders taking precedence as
+        # they always did.
+        alias_manager = self.shell.alias_manager
+        no_alias = alias_manager.no_alias
+        aliases = {}
+        syscmdlist = []
+        for result in results:
+            if result is None:
+                continue
+            for ff in result[1]:
+                if os.name == 'posix':
+                    # Removes dots from the name since ipython will assume
+                    # names with dots to be python.
+                    name, cmd = ff.replace('.',''), ff
+                else:
+                    base, ext = os.path.splitext(ff)
+                    if base.lower() in no_alias or ext.lower() != '.exe':
+                        continue
+                    name, cmd = base.lower().replace('.',''), base
+                try:
+                    alias_manager.validate_alias(name, cmd)
+                except InvalidAliasError:
+                    if os.name == 'posix':
+                        continue
+                else:
+                    aliases[name] = cmd
+                syscmdlist.append(cmd)
+
+        # Only define the aliases that changed, and remove those that the
+        # last call defined if they vanished (and weren't redefined since).
+        alias_table = alias_manager.alias_table
+        for name, cmd in aliases.iteritems():
+            if alias_table.get(name, (None, None))[1] != cmd:
+                alias_manager.define_alias(name, cmd)
+        previous = getattr(self.shell, '_rehashx_aliases', {})
+        for name, cmd in previous.iteritems():
+            if (name not in aliases and
+                alias_table.get(name, (None, None))[1] == cmd):
+                alias_manager.undefine_alias(name)
+        self.shell._rehashx_aliases = aliases
+        db['syscmdlist'] = syscmdlist
+
     def magic_pwd(self, parameter_s = ''):
         """Return the current working directory path."""
         return os.getcwd()
@@ -27,7 +27,9 @@ Authors:
 
 import __builtin__
 import codeop
+import keyword
 import re
+import time
 
 from IPython.core.alias import AliasManager
 from IPython.core.autocall import IPyAutocall
@@ -74,6 +76,21 @@ re_fun_name = re.compile(r'[a-zA-Z_]([a-zA-Z0-9_.]*) *$')
 re_exclude_auto = re.compile(r'^[,&^\|\*/\+-]'
                              r'|^is |^not |^in |^and |^or ')
 
+# The first characters that can make a line special, once leading whitespace
+# is stripped: the escapes and the identifiers, which can be magics, aliases
+# or callables.  Lines starting with anything else are plain Python for the
+# default checkers.
+_special_first_chars = frozenset('!%?,;/_' + ''.join(
+    chr(c) for c in range(128) if chr(c).isalpha()))
+
+# Python keywords can't be aliases, callables or names in the namespaces, so
+# lines starting with one are plain Python.  print and exec are left out, as
+# they can be autocalled when they are functions.
+_plain_keywords = frozenset(keyword.kwlist) - set(['print', 'exec'])
+
+# The first word of a line, and whether it is assigned to.
+_first_word_re = re.compile(r'\s*([a-zA-Z_][\w.]*)(\s*=(?!=))?')
+
 # try to catch also methods for stuff in lists/tuples/dicts: off
 # (experimental). For this to work, the line_split regexp would need
 # to be modified so it wouldn't break things at '['. That line is
@@ -207,17 +224,35 @@ class PrefilterManager(Configurable):
     Users or developers can change the priority or enabled attribute of
     transformers or checkers, but they must call the :meth:`sort_checkers`
     or :meth:`sort_transformers` method after changing the priority.
+
+    As long as only the default checkers and normal handler are registered,
+    lines that none of them can handle specially (lines starting with a
+    Python keyword, an assignment or a character that can't start an escape
+    or a name) are sent straight through, without building a
+    :class:`LineInfo` or running the checkers.  The `fast_path` option
+    turns this off.
+
+    If `checker_timing` is set, the calls to each checker are timed in
+    :attr:`checker_times`, see :meth:`checker_timing_report`.
     """
 
     multi_line_specials = CBool(True, config=True)
+    fast_path = CBool(True, config=True)
+    checker_timing = CBool(False, config=True)
     shell = Instance('IPython.core.interactiveshell.InteractiveShellABC')
 
     def __init__(self, shell=None, config=None):
         super(PrefilterManager, self).__init__(shell=shell, config=config)
         self.shell = shell
+        # Maps checker class names to their [number of calls, total time].
+        self.checker_times = {}
+        # The number of lines sent through the fast path.
+        self.fast_path_count = 0
+        self._default_chain = False
         self.init_transformers()
         self.init_handlers()
         self.init_checkers()
+        self._update_default_chain()
 
     #-------------------------------------------------------------------------
     # API for managing transformers
@@ -285,11 +320,24 @@ class PrefilterManager(Configurable):
         if checker not in self._checkers:
             self._checkers.append(checker)
             self.sort_checkers()
+            self._update_default_chain()
 
     def unregister_checker(self, checker):
         """Unregister a checker instance."""
         if checker in self._checkers:
             self._checkers.remove(checker)
+            self._update_default_chain()
+
+    def _update_default_chain(self):
+        """Check whether only the default checkers and normal handler are
+        registered, which the fast path of :meth:`prefilter_line` needs."""
+        checkers = getattr(self, '_checkers', None)
+        if checkers is None:
+            # Still being initialized.
+            return
+        self._default_chain = (
+            type(self._handlers.get('normal')) is PrefilterHandler and
+            all(type(c) in _default_checkers for c in checkers))
 
     #-------------------------------------------------------------------------
     # API for managing checkers
@@ -314,6 +362,7 @@ class PrefilterManager(Configurable):
         self._handlers[name] = handler
         for esc_str in esc_strings:
             self._esc_handlers[esc_str] = handler
+        self._update_default_chain()
 
     def unregister_handler(self, name, handler, esc_strings):
         """Unregister a handler instance by name with esc_strings."""
@@ -325,6 +374,7 @@ class PrefilterManager(Configurable):
             h = self._esc_handlers.get(esc_str)
             if h is handler:
                 del self._esc_handlers[esc_str]
+        self._update_default_chain()
 
     def get_handler_by_name(self, name):
         """Get a handler by its name."""
@@ -349,13 +399,68 @@ class PrefilterManager(Configurable):
 
     def find_handler(self, line_info):
         """Find a handler for the line_info by trying checkers."""
+        if self.checker_timing:
+            return self._find_handler_timed(line_info)
+        for checker in self.checkers:
+            if checker.enabled:
+                handler = checker.check(line_info)
+                if handler:
+                    return handler
+        return self.get_handler_by_name('normal')
+
+    def _find_handler_timed(self, line_info):
+        """Like :meth:`find_handler`, timing the calls to the checkers."""
+        times = self.checker_times
+        clock = time.time
         for checker in self.checkers:
             if checker.enabled:
+                t0 = clock()
                 handler = checker.check(line_info)
+                elapsed = clock() - t0
+                stats = times.setdefault(checker.__class__.__name__, [0, 0.0])
+                stats[0] += 1
+                stats[1] += elapsed
                 if handler:
                     return handler
         return self.get_handler_by_name('normal')
 
+    def checker_timing_report(self):
+        """Return a table of the time spent in each checker, costliest first.
+
+        The times are only recorded while `checker_timing` is set.
+        """
+        lines = ['%-25s %8s %10s %14s' % ('Checker', 'Calls', 'Total (s)',
+                                          'Per call (us)')]
+        stats = sorted(self.checker_times.items(), key=lambda x: -x[1][1])
+        for name, (calls, total) in stats:
+            lines.append('%-25s %8d %10.4f %14.2f' % (name, calls, total,
+                                                       1e6*total/calls))
+        lines.append('%d lines took the fast path.' % self.fast_path_count)
+        return '\n'.join(lines)
+
+    def is_plain_python(self, line):
+        """Return True if line can't be handled specially by the checkers.
+
+        This is a cheap, conservative test: False only means that the
+        checkers have to be run.  The line must not be blank.
+        """
+        if not (self.fast_path and self._default_chain):
+            return False
+        stripped = line.lstrip()
+        if line[-1] == ESC_HELP or line.endswith('# PYTHON-MODE'):
+            return False
+        if stripped[0] not in _special_first_chars:
+            return True
+        m = _first_word_re.match(stripped)
+        if m is None:
+            return False
+        word = m.group(1)
+        if word in _plain_keywords:
+            return True
+        # Assignments are only special for IPyAutocall instances.
+        return (m.group(2) is not None and
+                not isinstance(self.shell.user_ns.get(word), IPyAutocall))
+
     def transform_line(self, line, continue_prompt):
         """Calls the enabled transformers in order of increasing priority."""
         for transformer in self.transformers:
@@ -392,12 +497,17 @@ class PrefilterManager(Configurable):
         if not continue_prompt or (continue_prompt and self.multi_line_specials):
             line = self.transform_line(line, continue_prompt)
 
-        # Now we compute line_info for the checkers and handlers
-        line_info = LineInfo(line, continue_prompt)
-        
         # the input history needs to track even empty lines
         stripped = line.strip()
 
+        # Plain Python lines go through the normal handler unchanged.
+        if stripped and self.is_plain_python(line):
+            self.fast_path_count += 1
+            return line
+
+        # Now we compute line_info for the checkers and handlers
+        line_info = LineInfo(line, continue_prompt)
+
         normal_handler = self.get_handler_by_name('normal')
         if not stripped:
             if not continue_prompt:
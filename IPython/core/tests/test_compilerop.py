@@ -14,6 +14,7 @@
 from __future__ import print_function
 
 # Stdlib imports
+import gc
 import linecache
 
 # Third-party imports
@@ -22,6 +23,22 @@ import nose.tools as nt
 # Our own imports
 from IPython.core import compilerop
 
+#-----------------------------------------------------------------------------
+# Setup and teardown
+#-----------------------------------------------------------------------------
+
+def setup():
+    # Each CachingCompiler patches the linecache functions: keep those of the
+    # shell, to put them back once the tests are done.
+    global checkcache, getlines
+    checkcache = linecache.checkcache
+    getlines = linecache.getlines
+
+
+def teardown():
+    linecache.checkcache = checkcache
+    linecache.getlines = getlines
+
 #-----------------------------------------------------------------------------
 # Test functions
 #-----------------------------------------------------------------------------
@@ -60,3 +77,112 @@ def test_compiler_check_cache():
             break
     else:
         raise AssertionError('Entry for input-99 missing from linecache')
+
+
+def test_compiler_bounded_cache():
+    """Test that the oldest entries are dropped, unless their code is alive
+    """
+    cp = compilerop.CachingCompiler(max_entries=2, code_cache_size=0)
+    f_code = cp('def f(): pass', 'exec', 101)
+    ns = {}
+    exec f_code in ns
+    del f_code
+    cp('x=1', 'single', 102)
+    cp('x=2', 'single', 103)
+    cp('x=3', 'single', 104)
+    names = [k for k in linecache.cache if k.startswith('<ipython-input-10')]
+    nt.assert_equals(sorted(n[:18] for n in names),
+                     ['<ipython-input-101', '<ipython-input-103',
+                      '<ipython-input-104'])
+    # The source of f is still found, and dropped along with f.
+    f_name = ns['f'].__code__.co_filename
+    nt.assert_equals(linecache.getlines(f_name), ['def f(): pass\n'])
+    del ns
+    gc.collect()
+    nt.assert_false(f_name in linecache.cache)
+
+
+def test_compiler_max_age():
+    cp = compilerop.CachingCompiler(max_age=1000, code_cache_size=0)
+    cp('x=1', 'single', 111)
+    name = compilerop.code_name('x=1', 111)
+    # Make all the current entries look old.
+    for k, (entry, stamp) in linecache._ipython_cache.items():
+        linecache._ipython_cache[k] = entry, stamp - 2000
+    cp('x=2', 'single', 112)
+    nt.assert_false(name in linecache.cache)
+
+
+def test_compiler_input_hist():
+    """Test that dropped sources are found again in the input history
+    """
+    cp = compilerop.CachingCompiler(max_entries=1)
+    cp.input_hist = ['', 'x=1\n', 'y=2\nz=3\n', 'a=1\nb=2\nc=3\n']
+    name1 = compilerop.code_name('x=1', 1)
+    name2 = compilerop.code_name('y=2\nz=3\n', 2)
+    cp('x=1', 'single', 1)
+    cp('y=2\nz=3\n', 'exec', 2)
+    cp('w=4', 'single', 3)
+    linecache.clearcache()
+    nt.assert_equals(linecache.getlines(name1), ['x=1\n'])
+    nt.assert_equals(linecache.getlines(name2), ['y=2\n', 'z=3\n'])
+    # A block in the middle of an input
+    nt.assert_equals(linecache.getlines(compilerop.code_name('b=2\n', 3)),
+                     ['b=2\n'])
+    nt.assert_equals(linecache.getlines(compilerop.code_name('v=5', 1)), [])
+
+
+def test_compiler_code_cache():
+    """Test that the code of inputs run again is taken from the cache
+    """
+    cp = compilerop.CachingCompiler(code_cache_size=2)
+    c1 = cp('x=1', 'single', 121)
+    nt.assert_equals((cp.hits, cp.misses), (0, 1))
+    nt.assert_true(cp('x=1', 'single', 121) is c1)
+    nt.assert_equals((cp.hits, cp.misses), (1, 1))
+    # The mode is part of the key
+    nt.assert_false(cp('x=1', 'exec', 123) is c1)
+    # Incomplete inputs aren't cached
+    nt.assert_equals(cp('if 1:', 'single', 124), None)
+    nt.assert_equals(cp('if 1:', 'single', 124), None)
+    nt.assert_equals((cp.hits, cp.misses), (1, 4))
+    # The least recently used entry is dropped
+    c3 = cp('x=1', 'exec', 123)
+    cp('x=2', 'single', 126)
+    nt.assert_true(cp('x=1', 'exec', 123) is c3)
+    nt.assert_equals((cp.hits, cp.misses), (3, 5))
+    nt.assert_false(cp('x=1', 'single', 121) is c1)
+    nt.assert_equals((cp.hits, cp.misses), (3, 6))
+    cp.clear_code_cache()
+    nt.assert_false(cp('x=1', 'exec', 123) is c3)
+    nt.assert_equals((cp.hits, cp.misses), (0, 1))
+
+
+def test_compiler_code_cache_name():
+    """Test that the code taken from the cache has the name of its input
+    """
+    cp = compilerop.CachingCompiler()
+    src = 'def f():\n    return 1/0\n'
+    c1 = cp(src, 'exec', 141)
+    c2 = cp(src, 'exec', 142)
+    nt.assert_equals((cp.hits, cp.misses), (1, 1))
+    name = compilerop.code_name(src, 142)
+    nt.assert_equals(c2.co_filename, name)
+    nt.assert_equals(c2.co_code, c1.co_code)
+    ns = {}
+    exec c2 in ns
+    nt.assert_equals(ns['f'].func_code.co_filename, name)
+    nt.assert_equals(linecache.getlines(name), src.splitlines(True))
+
+
+def test_compiler_code_cache_flags():
+    """Test that code compiled with other __future__ flags isn't reused
+    """
+    cp = compilerop.CachingCompiler()
+    c1 = cp('x=1/2', 'single', 131)
+    cp('from __future__ import division', 'single', 132)
+    c2 = cp('x=1/2', 'single', 133)
+    nt.assert_false(c1 is c2)
+    ns = {}
+    exec c2 in ns
+    nt.assert_equals(ns['x'], 0.5)
@@ -7,6 +7,7 @@
 # stdlib
 import os
 import sys
+import threading
 import unittest
 
 # third party
@@ -156,3 +157,81 @@ def test_file_completions():
         c = ip.complete(prefix, cmd)[1]
         comp = [prefix+s for s in suffixes]
         nt.assert_equal(c, comp)
+
+
+def test_name_index():
+    idx = completer.NameIndex(['abc', 'abd', 'b', 'ab'])
+    nt.assert_equals(idx.matches('ab'), ['ab', 'abc', 'abd'])
+    nt.assert_equals(idx.matches(u'ab'), ['ab', 'abc', 'abd'])
+    nt.assert_equals(idx.matches(''), ['ab', 'abc', 'abd', 'b'])
+    nt.assert_equals(idx.matches('c'), [])
+    idx.update(['abc', 'abe', 'b', 'ab'])
+    nt.assert_equals(idx.matches('ab'), ['ab', 'abc', 'abe'])
+    # The last match is kept by the limit, for the common prefix.
+    nt.assert_equals(idx.matches('a', 2), ['ab', 'abe'])
+
+
+def test_limit_matches():
+    nt.assert_equals(completer.limit_matches(range(5), 0), range(5))
+    nt.assert_equals(completer.limit_matches(range(5), 3), [0, 1, 4])
+    nt.assert_equals(completer.limit_matches(range(5), 5), range(5))
+
+
+def test_global_matches_index():
+    ip = get_ipython()
+    c = ip.Completer
+    ip.push({'_idx_name1': 1})
+    nt.assert_true('_idx_name1' in c.global_matches('_idx_'))
+    # Names added directly to the namespace are found too.
+    ip.user_ns['_idx_name2'] = 2
+    nt.assert_equals(c.global_matches('_idx_'), ['_idx_name1', '_idx_name2'])
+    ip.run_cell('del _idx_name1')
+    nt.assert_equals(c.global_matches('_idx_'), ['_idx_name2'])
+    del ip.user_ns['_idx_name2']
+
+
+def test_completion_limit():
+    ip = get_ipython()
+    names = dict(('_lim_%04d' % i, i) for i in range(50))
+    ip.push(names)
+    old_limit = ip.Completer.limit
+    ip.Completer.limit = 10
+    try:
+        text, matches = ip.complete('_lim_')
+        nt.assert_equals(len(matches), 10)
+        nt.assert_equals(matches[-1], '_lim_0049')
+    finally:
+        ip.Completer.limit = old_limit
+        for name in names:
+            del ip.user_ns[name]
+
+
+def test_attr_matches_cached():
+    ip = get_ipython()
+    class _C(object):
+        alpha = 1
+        alpine = 2
+    ip.push({'_attr_c': _C()})
+    c = ip.Completer
+    nt.assert_equals(c.attr_matches('_attr_c.alp'),
+                     ['_attr_c.alpha', '_attr_c.alpine'])
+    _C.alpaca = 3
+    nt.assert_equals(c.attr_matches('_attr_c.alp'),
+                     ['_attr_c.alpaca', '_attr_c.alpha', '_attr_c.alpine'])
+    del ip.user_ns['_attr_c']
+
+
+def test_complete_cancelled():
+    ip = get_ipython()
+    ip.push({'_cancel_name': 1})
+    c = ip.Completer
+    text, matches = ip.complete('_cancel_')
+    nt.assert_equals(matches, ['_cancel_name'])
+    # A cancelled completion runs no matcher and leaves c.matches alone.
+    cancelled = threading.Event()
+    cancelled.set()
+    found = []
+    text, matches = ip.complete('_cancel_', matches=found, cancelled=cancelled)
+    nt.assert_equals(matches, [])
+    nt.assert_equals(c.matches, ['_cancel_name'])
+    del ip.user_ns['_cancel_name']
@@ -0,0 +1,84 @@
+"""Tests for the completers of completerlib.
+"""
+#-----------------------------------------------------------------------------
+#  Copyright (C) 2010 The IPython Development Team.
+#
+#  Distributed under the terms of the BSD License.
+#
+#  The full license is in the file COPYING.txt, distributed with this software.
+#-----------------------------------------------------------------------------
+
+#-----------------------------------------------------------------------------
+# Imports
+#-----------------------------------------------------------------------------
+
+# Stdlib imports
+import os
+import sys
+
+# Third-party imports
+import nose.tools as nt
+
+# Our own imports
+from IPython.core import completerlib
+from IPython.utils.tempdir import TemporaryDirectory
+
+#-----------------------------------------------------------------------------
+# Test functions
+#-----------------------------------------------------------------------------
+
+def touch(path, content=''):
+    with open(path, 'w') as f:
+        f.write(content)
+
+
+def test_module_index():
+    with TemporaryDirectory() as tmpdir:
+        touch(os.path.join(tmpdir, 'idxmod_a.py'))
+        pkg = os.path.join(tmpdir, 'idxpkg')
+        os.mkdir(pkg)
+        touch(os.path.join(pkg, '__init__.py'))
+        touch(os.path.join(pkg, 'sub.py'))
+        db = {}
+        index = completerlib.ModuleIndex(db)
+        sys.path.insert(0, tmpdir)
+        try:
+            index.refresh()
+            modules = index.root_modules()
+            nt.assert_true('idxmod_a' in modules)
+            nt.assert_true('idxpkg' in modules)
+            nt.assert_equals(index.submodules('idxpkg'), ['sub'])
+            nt.assert_equals(index.submodules('idxmod_a'), None)
+            nt.assert_true(tmpdir in db['module_index'])
+
+            # Only changed folders are listed again.
+            listed = []
+            orig_module_list = completerlib.module_list
+            def module_list(path):
+                listed.append(path)
+                return orig_module_list(path)
+            completerlib.module_list = module_list
+            try:
+                index = completerlib.ModuleIndex(db)
+                index.refresh([tmpdir])
+                nt.assert_equals(listed, [])
+                touch(os.path.join(tmpdir, 'idxmod_b.py'))
+                # Make sure the mtime of the folder changes.
+                mtime = os.stat(tmpdir).st_mtime + 10
+                os.utime(tmpdir, (mtime, mtime))
+                index.refresh([tmpdir])
+                nt.assert_equals(listed, [tmpdir])
+            finally:
+                completerlib.module_list = orig_module_list
+            nt.assert_true('idxmod_b' in index.root_modules())
+            index.wait()
+        finally:
+            sys.path.remove(tmpdir)
+
+
+def test_module_completion():
+    ip = get_ipython()
+    ip.module_index.wait()
+    nt.assert_true('os' in completerlib.module_completion('import o'))
+    nt.assert_true('xml.dom' in completerlib.module_completion('import xml.d'))
+    nt.assert_true('path' in completerlib.module_completion('from os import '))
@@ -0,0 +1,117 @@
+"""Tests for the output cache of the displayhook.
+"""
+
+import os
+import sys
+
+import nose.tools as nt
+
+from IPython.core.displayhook import OutputCache, estimate_size
+from IPython.testing import decorators as dec
+
+class ArrayLike(object):
+    """Pretends to be an array, and records the lookups of its size."""
+    def __init__(self, nbytes):
+        self.lookups = 0
+        self._nbytes = nbytes
+
+    @property
+    def nbytes(self):
+        self.lookups += 1
+        return self._nbytes
+
+    def memory_usage(self):
+        self.lookups += 1
+        raise ValueError('not a DataFrame')
+
+def test_estimate_size():
+    obj = ArrayLike(1000)
+    nt.assert_equals(estimate_size(obj), sys.getsizeof(obj))
+    nt.assert_equals(obj.lookups, 0)
+    nt.assert_true(estimate_size(['x'*1000]) > 1000)
+    nt.assert_true(estimate_size({'a': 'x'*1000}) > 1000)
+
+@dec.skipif_not_numpy
+def test_estimate_size_numpy():
+    import numpy
+    class Broken(numpy.ndarray):
+        @property
+        def nbytes(self):
+            raise ValueError('broken')
+    a = numpy.zeros(1000)
+    nt.assert_equals(estimate_size(a), 8000)
+    b = a.view(Broken)
+    nt.assert_equals(estimate_size(b), sys.getsizeof(b))
+
+def test_lru_entries():
+    evicted = []
+    c = OutputCache(max_entries=3, on_evict=evicted.append)
+    for i in range(1, 4):
+        c[i] = i
+    # Using 1 makes 2 the least recently used entry.
+    c[1]
+    c[4] = 4
+    nt.assert_equals(sorted(c), [1, 3, 4])
+    nt.assert_equals(evicted, [2])
+    nt.assert_false(2 in c)
+    nt.assert_equals(c.get(2), None)
+
+def test_lru_bytes():
+    size = estimate_size('x'*100)
+    c = OutputCache(max_bytes=int(2.5*size))
+    c[1] = 'a'*100
+    c[2] = 'b'*100
+    c[3] = 'c'*100
+    nt.assert_equals(sorted(c), [2, 3])
+    nt.assert_equals(c.nbytes, 2*size)
+    # The newest entry is kept even if it is over the budget on its own.
+    c[4] = 'd'*1000
+    nt.assert_equals(sorted(c), [4])
+    nt.assert_equals(c.nbytes, estimate_size('d'*1000))
+
+def test_spill():
+    c = OutputCache(max_entries=2, spill=True)
+    c[1] = range(10)
+    c[2] = 'two'
+    c[3] = lambda x: x  # can't be pickled, so it is dropped when evicted
+    c[4] = 'four'
+    nt.assert_equals(sorted(c), [3, 4])
+    nt.assert_true(1 in c)
+    nt.assert_true(2 in c)
+    spill_dir = c.spill_dir
+    nt.assert_equals(len(os.listdir(spill_dir)), 2)
+    # Reloaded transparently, which evicts 3 and spills 4 in turn.
+    nt.assert_equals(c[1], range(10))
+    nt.assert_equals(c.get(2), 'two')
+    nt.assert_false(3 in c)
+    nt.assert_equals(c.pop(4), 'four')
+    nt.assert_false(4 in c)
+    c.clear()
+    nt.assert_false(os.path.exists(spill_dir))
+
+@dec.skipif_not_numpy
+def test_spill_numpy():
+    import numpy
+    c = OutputCache(max_entries=1, spill=True)
+    a = numpy.arange(10.0)
+    c[1] = a
+    c[2] = numpy.zeros(0)
+    nt.assert_true(os.listdir(c.spill_dir)[0].endswith('.npy'))
+    nt.assert_true((c[1] == a).all())
+    nt.assert_equals(c[2].shape, (0,))
+    c.clear()
+
+def test_displayhook_evicts_variables():
+    ip = get_ipython()
+    oh = ip.user_ns['_oh']
+    old_max = oh.max_entries
+    oh.max_entries = 3
+    try:
+        for i in range(5):
+            ip.run_cell('%d' % i)
+        nt.assert_equals(len(oh), 3)
+        n = ip.execution_count - 1
+        nt.assert_true('_%d' % n in ip.user_ns)
+        nt.assert_false('_%d' % (n-3) in ip.user_ns)
+    finally:
+        oh.max_entries = old_max
@@ -21,14 +21,16 @@ def test_history():
     ip = get_ipython()
     with TemporaryDirectory() as tmpdir:
         #tmpdir = '/software/temp'
-        histfile = os.path.realpath(os.path.join(tmpdir, 'history.json'))
         # Ensure that we restore the history management that we mess with in
         # this test doesn't affect the IPython instance used by the test suite
         # beyond this test.
         hist_manager_ori = ip.history_manager
+        ipython_dir_ori = ip.ipython_dir
         try:
+            ip.ipython_dir = tmpdir
             ip.history_manager = HistoryManager(ip)
-            ip.history_manager.hist_file = histfile
+            histfile = ip.history_manager.hist_file
+            nt.assert_equal(os.path.dirname(histfile), tmpdir)
             print 'test',histfile
             hist = ['a=1\n', 'def f():\n    test = 1\n    return test\n', 'b=2\n']
             # test save and load
@@ -43,6 +45,47 @@ def test_history():
             nt.assert_equal(len(ip.history_manager.input_hist_raw), len(hist))
             for i,h in enumerate(hist):
                 nt.assert_equal(hist[i], ip.history_manager.input_hist_raw[i])
+
+            # Inputs are written to the database as they are stored, and
+            # remain available from the next session.
+            hm = ip.history_manager
+            hm.reset()
+            hm.store_inputs('x=1\n', 'x=1\n')
+            hm.store_inputs('y=2\n', '%y 2\n')
+            session = hm.session_number
+            ip.history_manager = hm = HistoryManager(ip)
+            nt.assert_equal(hm.get_session_number(-1), session)
+            nt.assert_equal(hm.get_history(session=-1, output=False),
+                            {0: 'x=1', 1: 'y=2'})
+            nt.assert_equal(hm.get_history((1, 2), raw=True, output=False,
+                                           session=session),
+                            {1: '%y 2'})
+            nt.assert_equal(hm.get_history(1, session=-1),
+                            {1: ('y=2', None)})
+            # The current session still comes from memory.
+            nt.assert_equal(hm.get_history(output=False), {0: ''})
         finally:
             # Restore history manager
             ip.history_manager = hist_manager_ori
+            ip.ipython_dir = ipython_dir_ori
+
+def test_history_non_ascii():
+    """Non-ASCII cells are stored in the history database."""
+    ip = get_ipython()
+    with TemporaryDirectory() as tmpdir:
+        hist_manager_ori = ip.history_manager
+        ipython_dir_ori = ip.ipython_dir
+        # The cells typed at a UTF-8 terminal.
+        encoding_ori = ip.input_splitter.encoding, ip.stdin_encoding
+        try:
+            ip.ipython_dir = tmpdir
+            ip.history_manager = hm = HistoryManager(ip)
+            ip.input_splitter.encoding = ip.stdin_encoding = 'utf-8'
+            ip.run_cell(u'_ux = u"\xe9"\n'.encode('utf-8'))
+            nt.assert_equal(ip.user_ns['_ux'], u'\xe9')
+            nt.assert_equal(hm.get_session_history(0, raw=True)[-1][1],
+                            u'_ux = u"\xe9"')
+        finally:
+            ip.history_manager = hist_manager_ori
+            ip.ipython_dir = ipython_dir_ori
+            ip.input_splitter.encoding, ip.stdin_encoding = encoding_ori
@@ -106,6 +106,57 @@ def test_remove_comments():
         nt.assert_equal(isp.remove_comments(inp), out)
 
 
+def test_scan_line():
+    tests = [(('x = 1\n',), (0, None, False)),
+             (('x = f(1,\n',), (1, None, False)),
+             (('  2)\n', 1), (0, None, False)),
+             (('x = "(" + \'#\' # (\n',), (0, None, False)),
+             (('x = """a(\n',), (0, '"""', False)),
+             (('b"""\n', 0, '"""'), (0, None, False)),
+             (("x = r'\\'' + \\\n",), (0, None, True)),
+             (("x = 'a\\\n",), (0, "'", False)),
+             (("x = 'a\n",), (0, None, False)),
+             (('x = [{}]]\n',), (-1, None, False)),
+             ]
+    for args, out in tests:
+        nt.assert_equal(isp.scan_line(*args), out)
+
+
+def test_find_blocks():
+    src = ('# comment\n'
+           'x = (1,\n'
+           '     2)\n'
+           '@dec\n'
+           'def f():\n'
+           '    pass\n'
+           'if x:\n'
+           '    y = 1\n'
+           'else:\n'
+           '    y = 2\n'
+           '\n'
+           's = """a\n'
+           'b"""; t = 1\n')
+    blocks = isp.find_blocks(src)
+    nt.assert_equal([(b.lineno, b.end_lineno, b.col_offset) for b in blocks],
+                    [(1, 3, 0), (4, 6, 0), (7, 11, 0), (12, 13, 0)])
+    nt.assert_equal(''.join(b.source for b in blocks), src)
+    nt.assert_true(all(b.code is None for b in blocks))
+    # With a compiler the code objects are kept, unless a block fails.
+    compiler = lambda source: compile(source, '<input>', 'exec')
+    blocks = isp.find_blocks(src, compiler)
+    nt.assert_true(all(b.code is not None for b in blocks))
+    # A last block of a single line can be left for later.
+    blocks = isp.find_blocks('x = 1\ny = 2\n', compiler,
+                             compile_last_line=False)
+    nt.assert_equal([b.code is None for b in blocks], [False, True])
+    blocks = isp.find_blocks(src, compiler, compile_last_line=False)
+    nt.assert_true(all(b.code is not None for b in blocks))
+    blocks = isp.find_blocks('x = 1\ny = = 2\n', compiler)
+    nt.assert_equal(len(blocks), 1)
+    nt.assert_equal(blocks[0].code, None)
+    nt.assert_equal(isp.find_blocks('# just a comment\n'), [])
+
+
 def test_get_input_encoding():
     encoding = isp.get_input_encoding()
     nt.assert_true(isinstance(encoding, basestring))
@@ -347,6 +398,31 @@ class InputSplitterTestCase(unittest.TestCase):
         for block_lines in all_blocks:
             self.check_split(block_lines, compile=False)
 
+    def test_push_incremental(self):
+        # Only the last statement matters to know if the input is complete.
+        isp = self.isp
+        if isp.input_mode == 'cell': return
+        self.assertTrue(isp.push('x = 1'))
+        self.assertFalse(isp.push('if x:'))
+        self.assertTrue(isp.push('    y = 2'))
+        self.assertFalse(isp.push('z = [1,'))
+        # Brackets and quotes inside strings and comments don't count.
+        self.assertFalse(isp.push('     "]", # ]'))
+        self.assertTrue(isp.push('     2]'))
+        self.assertFalse(isp.push('s = """)'))
+        self.assertTrue(isp.push('"""'))
+        self.assertEqual(isp._stmt_count, 4)
+
+    def test_push_accepts_more_cell(self):
+        isp = self.isp
+        isp.input_mode = 'cell'
+        isp.push('@dec\ndef f():\n    pass\n')
+        self.assertFalse(isp.push_accepts_more())
+        isp.push('if 1:\n    x = 1\nelse:\n    x = 2\n\n')
+        self.assertFalse(isp.push_accepts_more())
+        isp.push('x = 1\ny = 2')
+        self.assertTrue(isp.push_accepts_more())
+
     def test_unicode(self):
         self.isp.push(u"Pérez")
         self.isp.push(u'\xc3\xa9')
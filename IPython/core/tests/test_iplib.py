@@ -269,3 +269,67 @@ def test_db():
     nt.assert_equals(ip.db['__unittest_'], 12)
     del ip.db['__unittest_']
     assert '__unittest_' not in ip.db
+
+
+def test_run_cell_blocks():
+    """Cells run the code objects compiled while splitting them."""
+    import inspect
+    ip.run_cell('def _cell_f():\n    return 1\n')
+    # The source of the function was registered for tracebacks and inspect.
+    nt.assert_equals(inspect.getsource(ip.user_ns['_cell_f']),
+                     'def _cell_f():\n    return 1\n')
+    ip.run_cell('_cell_x = 1\nif _cell_x:\n    _cell_x += 1\n_cell_x *= 3')
+    nt.assert_equals(ip.user_ns['_cell_x'], 6)
+    # An error in a block stops the following ones.
+    ip.run_cell('_cell_y = 1\n1/0\n_cell_y = 2\nif 1:\n    pass\n')
+    nt.assert_equals(ip.user_ns['_cell_y'], 1)
+
+
+def test_run_cell_code_cache():
+    """Cells run again are not recompiled."""
+    cell = '_cache_x = _cache_x + 1 if "_cache_x" in dir() else 1\n'
+    ip.run_cell(cell)
+    hits = ip.compile.hits
+    ip.run_cell(cell)
+    nt.assert_true(ip.compile.hits > hits)
+    nt.assert_equals(ip.user_ns['_cache_x'], 2)
+
+
+def test_ofind_cache():
+    """Object lookups are cached until the namespaces change."""
+    class Counter(object):
+        n = 0
+        @property
+        def attr(self):
+            Counter.n += 1
+            return Counter.n
+    ip.push({'_ofind_c': Counter()})
+    info = ip._ofind('_ofind_c.attr')
+    nt.assert_equals(info['obj'], 1)
+    nt.assert_equals(ip._ofind('_ofind_c.attr')['obj'], 1)
+    # Running code invalidates the cache.
+    ip.run_cell('pass')
+    nt.assert_equals(ip._ofind('_ofind_c.attr')['obj'], 2)
+    # So do push and deletions through magics.
+    ip.push({'ofind_d': 1})
+    nt.assert_true(ip._ofind('ofind_d')['found'])
+    ip.magic('reset_selective -f ofind_d')
+    nt.assert_false(ip._ofind('ofind_d')['found'])
+    ip.alias_manager.define_alias('_ofind_alias', 'true')
+    nt.assert_true(ip._ofind('_ofind_alias')['isalias'])
+    ip.alias_manager.undefine_alias('_ofind_alias')
+    nt.assert_false(ip._ofind('_ofind_alias')['found'])
+    del ip.user_ns['_ofind_c']
+
+
+def test_run_cell_compiles_once():
+    """Each block of a cell is compiled once."""
+    compiler = ip.compile
+    def compiles(cell):
+        before = compiler.hits + compiler.misses
+        ip.run_cell(cell)
+        return compiler.hits + compiler.misses - before
+    nt.assert_equals(compiles('_cell_z = 1'), 1)
+    nt.assert_equals(compiles('_cell_z = 1\n_cell_z += 1'), 2)
+    nt.assert_equals(compiles('if 1:\n    _cell_z = 3\n'), 1)
+    nt.assert_equals(ip.user_ns['_cell_z'], 3)
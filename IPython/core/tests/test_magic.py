@@ -9,8 +9,10 @@ from __future__ import absolute_import
 #-----------------------------------------------------------------------------
 
 import os
+import shutil
 import sys
 import tempfile
+import time
 import types
 from cStringIO import StringIO
 
@@ -42,6 +44,97 @@ def test_rehashx():
     yield (nt.assert_true, len(scoms) > 10)
 
 
+def test_scan_exec_dir_fresh():
+    """A folder changed right before being listed is listed again."""
+    from IPython.core import magic
+    tmpdir = tempfile.mkdtemp()
+    try:
+        isexec = lambda fname: True
+        open(os.path.join(tmpdir, 'a'), 'w').close()
+        first = magic.scan_exec_dir(tmpdir, isexec)
+        nt.assert_equals(first[1], ['a'])
+        # Added within the mtime resolution of the filesystem.
+        open(os.path.join(tmpdir, 'b'), 'w').close()
+        os.utime(tmpdir, (first[0], first[0]))
+        second = magic.scan_exec_dir(tmpdir, isexec, first)
+        nt.assert_equals(sorted(second[1]), ['a', 'b'])
+        # An old listing of an unchanged folder is kept.
+        mtime = os.stat(tmpdir).st_mtime
+        old = (mtime, ['a'], mtime + 10)
+        nt.assert_true(magic.scan_exec_dir(tmpdir, isexec, old) is old)
+    finally:
+        shutil.rmtree(tmpdir)
+
+
+@dec.skip_win32
+def test_rehashx_incremental():
+    """Only the folders of $PATH that changed are listed again."""
+    from IPython.core import magic
+    _ip = get_ipython()
+    atab = _ip.alias_manager.alias_table
+    tmpdir = tempfile.mkdtemp()
+    added = []
+    def add_exec(name):
+        fname = os.path.join(tmpdir, name)
+        open(fname, 'w').close()
+        os.chmod(fname, 0755)
+        # Make sure the mtime of the folder changes, and is old enough for
+        # the listing to be cached.
+        added.append(name)
+        mtime = time.time() - 100 + len(added)
+        os.utime(tmpdir, (mtime, mtime))
+    listed = []
+    orig_listdir = os.listdir
+    def listdir(path):
+        # The module index may list other folders in the background.
+        if path == tmpdir:
+            listed.append(path)
+        return orig_listdir(path)
+    old_path = os.environ['PATH']
+    os.environ['PATH'] = tmpdir
+    magic.os.listdir = listdir
+    try:
+        add_exec('rehashx_a')
+        _ip.magic('rehashx')
+        nt.assert_equals(atab['rehashx_a'][1], 'rehashx_a')
+        nt.assert_equals(listed, [tmpdir])
+        _ip.magic('rehashx')
+        nt.assert_equals(listed, [tmpdir])
+        # Aliases that changed are defined again, like they all used to be.
+        _ip.alias_manager.define_alias('rehashx_a', 'echo a')
+        add_exec('rehashx.b')
+        _ip.magic('rehashx')
+        nt.assert_equals(listed, [tmpdir, tmpdir])
+        nt.assert_equals(atab['rehashxb'][1], 'rehashx.b')
+        nt.assert_equals(atab['rehashx_a'][1], 'rehashx_a')
+        # Aliases of executables that are gone are removed, unless they
+        # were redefined.
+        os.remove(os.path.join(tmpdir, 'rehashx.b'))
+        os.remove(os.path.join(tmpdir, 'rehashx_a'))
+        _ip.alias_manager.define_alias('rehashx_a', 'echo a')
+        add_exec('rehashx_d')
+        _ip.magic('rehashx')
+        nt.assert_false('rehashxb' in atab)
+        nt.assert_equals(atab['rehashx_a'][1], 'echo a')
+        nt.assert_true('rehashx_d' in atab)
+        # A file made executable is only found with -f, as the mtime of the
+        # folder doesn't change.
+        os.chmod(os.path.join(tmpdir, 'rehashx_d'), 0644)
+        _ip.magic('rehashx -f')
+        nt.assert_false('rehashx_d' in atab)
+        os.chmod(os.path.join(tmpdir, 'rehashx_d'), 0755)
+        _ip.magic('rehashx')
+        nt.assert_false('rehashx_d' in atab)
+        _ip.magic('rehashx -f')
+        nt.assert_true('rehashx_d' in atab)
+    finally:
+        magic.os.listdir = orig_listdir
+        os.environ['PATH'] = old_path
+        for name in ['rehashx_a', 'rehashx_d']:
+            _ip.alias_manager.undefine_alias(name)
+        shutil.rmtree(tmpdir)
+
+
 def test_magic_parse_options():
     """Test that we don't mangle paths when parsing magic options."""
     ip = get_ipython()
@@ -153,15 +246,12 @@ def doctest_hist_op():
 
 def test_shist():
     # Simple tests of ShadowHist class - test generator.
-    import os, shutil, tempfile
+    import os, shutil, sqlite3, tempfile
 
     from IPython.utils import pickleshare
     from IPython.core.history import ShadowHist
     
-    tfile = tempfile.mktemp('','tmp-ipython-')
-    
-    db = pickleshare.PickleShareDB(tfile)
-    s = ShadowHist(db, get_ipython())
+    s = ShadowHist(sqlite3.connect(':memory:'), get_ipython())
     s.add('hello')
     s.add('world')
     s.add('hello')
@@ -171,9 +261,72 @@ def test_shist():
     yield nt.assert_equals,s.all(),[(1, 'hello'), (2, 'world'), (3, 'karhu')]
     
     yield nt.assert_equal,s.get(2),'world'
+    yield nt.assert_equal,s.get(4),None
+
+    # Shadow history kept by earlier versions is imported with its numbering
+    tfile = tempfile.mktemp('','tmp-ipython-')
+    pdb = pickleshare.PickleShareDB(tfile)
+    pdb.hset('shadowhist', 'old', 1)
+    pdb.hset('shadowhist', 'older', 5)
+    s = ShadowHist(sqlite3.connect(':memory:'), get_ipython())
+    s.import_pickleshare(pdb)
+    s.add('new')
+    s.add('old')
+
+    yield nt.assert_equals,s.all(),[(1, 'old'), (5, 'older'), (6, 'new')]
     
     shutil.rmtree(tfile)
 
+
+def test_shist_search():
+    import sqlite3
+    from IPython.core.history import ShadowHist
+
+    s = ShadowHist(sqlite3.connect(':memory:'), get_ipython())
+    for ent in ['import os', 'x = [1]', 'print x*2', 'os.getcwd()',
+                'import sys', 'x = [2]']:
+        s.add(ent)
+    search = lambda *args: [idx for idx, ent in s.search(*args)]
+    nt.assert_equals(search('import*'), [5, 1])
+    nt.assert_equals(search('import*', 'glob', 1), [5])
+    nt.assert_equals(search('[!o]*'), [6, 5, 3, 2, 1])
+    nt.assert_equals(search('x*', 'substring'), [3])
+    nt.assert_equals(search('[', 'substring'), [6, 2])
+    nt.assert_equals(search(r'x = \[\d\]', 'regex'), [6, 2])
+    nt.assert_equals(search(r'^(os|x)\b', 'regex', 2), [6, 4])
+    nt.assert_equals(search('IMPORT', 'substring'), [])
+    nt.assert_raises(ValueError, s.search, 'x', 'nonexistent')
+
+
+def test_shist_non_ascii():
+    import sqlite3
+    from IPython.core.history import ShadowHist
+
+    s = ShadowHist(sqlite3.connect(':memory:'), get_ipython())
+    s.add(u'x = u"\xe9"'.encode('utf-8'))
+    s.add('y = 1')
+    nt.assert_equals(s.all(), [(1, u'x = u"\xe9"'), (2, 'y = 1')])
+    search = lambda *args: [idx for idx, ent in s.search(*args)]
+    nt.assert_equals(search(u'*\xe9*'.encode('utf-8')), [1])
+
+
+def test_history_grep():
+    _ip.history_manager.shadow_hist.add('shist_grep_marker = 1')
+    _ip.history_manager.shadow_hist.add('shist_grep_marker = 2')
+    tfile = tempfile.mktemp('.py', 'tmp-ipython-')
+    def grep(args):
+        _ip.magic('history -g -f %s %s' % (tfile, args))
+        try:
+            return open(tfile).read()
+        finally:
+            os.remove(tfile)
+    out = grep('-l 1 shist_grep_marker*')
+    nt.assert_true('shist_grep_marker = 2' in out)
+    nt.assert_false('shist_grep_marker = 1' in out)
+    out = grep('-e marker.=.1')
+    nt.assert_true('shist_grep_marker = 1' in out)
+    nt.assert_false('shist_grep_marker = 2' in out)
+
     
 # XXX failing for now, until we get clearcmd out of quarantine.  But we should
 # fix this and revert the skip to happen only if numpy is not around.
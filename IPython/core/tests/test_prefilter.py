@@ -66,3 +66,51 @@ def test_issue114():
             yield nt.assert_equals(ip.prefilter(raw), raw)
     finally:
         ip.prefilter_manager.multi_line_specials = msp
+
+
+def test_fast_path():
+    """The fast path gives the same results as the checkers"""
+    pm = ip.prefilter_manager
+    lines = ['x = 1', 'x=1', 'x == 1', 'if x:', 'import os', '(1, 2)',
+             '[f(1)]', '"abc".upper()', '1 + 2', '.5', '# comment',
+             'f 1', 'f = 1', 'print 1', 'print(1)', 'cd /', 'ls -l',
+             '!ls', '%cd', '  %cd', ',f a b', ';f a', '/f 1',
+             'x = !ls', 'for i in f:', 'return f', 'a.b = 1', 'x += 1']
+    ip.magic('autocall 2')
+    ip.user_ns['f'] = lambda x=None: x
+    try:
+        for continue_prompt in (False, True):
+            pm.fast_path = False
+            slow = [pm.prefilter_line(l, continue_prompt) for l in lines]
+            pm.fast_path = True
+            count = pm.fast_path_count
+            fast = [pm.prefilter_line(l, continue_prompt) for l in lines]
+            nt.assert_equals(fast, slow)
+            nt.assert_true(pm.fast_path_count > count)
+    finally:
+        pm.fast_path = True
+        ip.magic('autocall 0')
+        del ip.user_ns['f']
+
+
+def test_fast_path_plain_python():
+    pm = ip.prefilter_manager
+    for line in ['x = 1', 'if x:', '  return 2', '(1, 2)', '1 + 2', '.5']:
+        nt.assert_true(pm.is_plain_python(line), line)
+    for line in ['f 1', 'x == 1', 'print 1', 'cd /', '!ls', '%cd', 'x?']:
+        nt.assert_false(pm.is_plain_python(line), line)
+
+
+def test_checker_timing():
+    pm = ip.prefilter_manager
+    pm.checker_timing = True
+    try:
+        ip.prefilter('x = 1')
+        nt.assert_false(pm.checker_times)
+        ip.prefilter('cd')
+    finally:
+        pm.checker_timing = False
+    calls, total = pm.checker_times['AutoMagicChecker']
+    nt.assert_equals(calls, 1)
+    nt.assert_true('AutoMagicChecker' in pm.checker_timing_report())
+    pm.checker_times.clear()
@@ -35,19 +35,22 @@ except ImportError:
 from foolscap.referenceable import RemoteReference
 
 from IPython.kernel.pbutil import packageFailure, unpackageFailure
+from IPython.kernel.newserialized import pack_serialized, unpack_serialized
 from IPython.kernel.controllerservice import IControllerBase
 from IPython.kernel.engineservice import (
     IEngineBase,
     IEngineQueued,
     StrictDict
 )
+from IPython.kernel.error import MissingFunctionDigest
 from IPython.kernel.pickleutil import (
     can,
     canDict,
     canSequence,
     uncan,
     uncanDict,
-    uncanSequence
+    uncanSequence,
+    SentFunctions
 )
 
 
@@ -136,14 +139,14 @@ class FCEngineReferenceFromService(Referenceable, object):
     def remote_push_function(self, pNamespace):
         try:
             namespace = pickle.loads(pNamespace)
-        except:
-            return defer.fail(failure.Failure()).addErrback(packageFailure)
-        else:
             # The usage of globals() here is an attempt to bind any pickled functions
             # to the globals of this module.  What we really want is to have it bound
             # to the globals of the callers module.  This will require walking the 
             # stack.  BG 10/3/07.
             namespace = uncanDict(namespace, globals())
+        except:
+            return defer.fail(failure.Failure()).addErrback(packageFailure)
+        else:
             return self.service.push_function(namespace).addErrback(packageFailure)
     
     def remote_pull_function(self, keys):
@@ -178,7 +181,7 @@ class FCEngineReferenceFromService(Referenceable, object):
     
     def remote_push_serialized(self, pNamespace):
         try:
-            namespace = pickle.loads(pNamespace)
+            namespace = unpack_serialized(pNamespace)
         except:
             return defer.fail(failure.Failure()).addErrback(packageFailure)
         else:
@@ -187,9 +190,29 @@ class FCEngineReferenceFromService(Referenceable, object):
     
     def remote_pull_serialized(self, keys):
         d = self.service.pull_serialized(keys)
-        d.addCallback(pickle.dumps, 2)
+        d.addCallback(pack_serialized)
         d.addErrback(packageFailure)
         return d
+
+    def remote_push_chunk(self, transfer_id, chunk):
+        d = self.service.push_chunk(transfer_id, chunk)
+        return d.addErrback(packageFailure)
+
+    def remote_push_serialized_transfer(self, transfer_id, layout):
+        d = self.service.push_serialized_transfer(transfer_id, layout)
+        return d.addErrback(packageFailure)
+
+    def remote_pull_serialized_transfer(self, transfer_id, keys, chunk_size):
+        d = self.service.pull_serialized_transfer(transfer_id, keys, chunk_size)
+        return d.addErrback(packageFailure)
+
+    def remote_pull_chunk(self, transfer_id, index, offset, size):
+        d = self.service.pull_chunk(transfer_id, index, offset, size)
+        return d.addErrback(packageFailure)
+
+    def remote_drop_transfer(self, transfer_id):
+        d = self.service.drop_transfer(transfer_id)
+        return d.addErrback(packageFailure)
     
     #---------------------------------------------------------------------------
     # Properties interface
@@ -253,6 +276,9 @@ class EngineFromReference(object):
         self._id = None
         self._properties = StrictDict()
         self.currentCommand = None
+        # The functions pushed to the engine are only sent once, and then
+        # by digest while the engine has them cached.
+        self.sent_functions = SentFunctions()
     
     def callRemote(self, *args, **kwargs):
         try:
@@ -346,7 +372,8 @@ class EngineFromReference(object):
     
     def push_function(self, namespace):
         try:
-            package = pickle.dumps(canDict(namespace), 2)
+            canned = self.sent_functions.packDict(canDict(dict(namespace)))
+            package = pickle.dumps(canned, 2)
         except:
             return defer.fail(failure.Failure())
         else:
@@ -354,7 +381,15 @@ class EngineFromReference(object):
                 return defer.fail(package)
             else:
                 d = self.callRemote('push_function', package)
-                return d.addCallback(self.checkReturnForFailure)    
+                d.addCallback(self.checkReturnForFailure)
+                return d.addErrback(self._resendFunctions, namespace)
+    
+    def _resendFunctions(self, reason, namespace):
+        """Push namespace again with its functions, if the engine didn't have
+        one of them cached anymore."""
+        reason.trap(MissingFunctionDigest)
+        self.sent_functions.forget()
+        return self.push_function(namespace)
     
     def pull_function(self, keys):
         d = self.callRemote('pull_function', keys)
@@ -443,9 +478,13 @@ class EngineFromReference(object):
     #---------------------------------------------------------------------------
     
     def push_serialized(self, namespace):
-        """Older version of pushSerialize."""
+        """Older version of pushSerialize.
+
+        The data of the Serialized objects is sent as is, next to a small
+        pickled header, see `pack_serialized`.
+        """
         try:
-            package = pickle.dumps(namespace, 2)
+            package = pack_serialized(namespace)
         except:
             return defer.fail(failure.Failure())
         else:
@@ -458,8 +497,32 @@ class EngineFromReference(object):
     def pull_serialized(self, keys):
         d = self.callRemote('pull_serialized', keys)
         d.addCallback(self.checkReturnForFailure)
-        d.addCallback(pickle.loads)
+        d.addCallback(unpack_serialized)
         return d
+
+    # The layouts and chunks go as they are: they are strings and ints, and
+    # the chunks come back in a list so they can't be taken for a Failure.
+
+    def push_chunk(self, transfer_id, chunk):
+        d = self.callRemote('push_chunk', transfer_id, chunk)
+        return d.addCallback(self.checkReturnForFailure)
+
+    def push_serialized_transfer(self, transfer_id, layout):
+        d = self.callRemote('push_serialized_transfer', transfer_id, layout)
+        return d.addCallback(self.checkReturnForFailure)
+
+    def pull_serialized_transfer(self, transfer_id, keys, chunk_size):
+        d = self.callRemote('pull_serialized_transfer', transfer_id, keys,
+                            chunk_size)
+        return d.addCallback(self.checkReturnForFailure)
+
+    def pull_chunk(self, transfer_id, index, offset, size):
+        d = self.callRemote('pull_chunk', transfer_id, index, offset, size)
+        return d.addCallback(self.checkReturnForFailure)
+
+    def drop_transfer(self, transfer_id):
+        d = self.callRemote('drop_transfer', transfer_id)
+        return d.addCallback(self.checkReturnForFailure)
     
     #---------------------------------------------------------------------------
     # Misc
@@ -153,6 +153,39 @@ class IEngineSerialized(zi.Interface):
         
         Raises NameError is any one of the objects does not exist.
         """
+
+    def push_chunk(transfer_id, chunk):
+        """Receive a chunk of the objects of a chunked push.
+        
+        The chunks are kept until `push_serialized_transfer` is called with
+        the same transfer_id.
+        """
+
+    def push_serialized_transfer(transfer_id, layout):
+        """Push the Serialized objects sent in chunks with `push_chunk`.
+        
+        layout has an entry for each string of the package made by
+        `newserialized.pack_serialized`: the string itself if it was small
+        enough to be sent here, or else the number of chunks it was sent in.
+        """
+
+    def pull_serialized_transfer(transfer_id, keys, chunk_size):
+        """Pull objects by key as Serialized, to be read in chunks.
+        
+        Returns the layout of their package, as for `push_serialized_transfer`,
+        but with the size of each string longer than chunk_size.  These are
+        kept to be read with `pull_chunk`.
+        """
+
+    def pull_chunk(transfer_id, index, offset, size):
+        """Read a chunk of string index of the package of a chunked pull.
+        
+        Returns a list with the chunk.  A string is dropped once all of it has
+        been read.
+        """
+
+    def drop_transfer(transfer_id):
+        """Drop what is kept of a chunked push or pull that was abandoned."""
     
 
 class IEngineProperties(zi.Interface):
@@ -354,6 +387,9 @@ class EngineService(object, service.Service):
         self.mpi = mpi
         self.id = None
         self.properties = get_engine(self.id).properties
+        # The chunks of the pushes and the packages of the pulls done in
+        # chunks, by transfer id.
+        self._transfers = {}
         if self.mpi is not None:
             log.msg("MPI started with rank = %i and size = %i" % 
                 (self.mpi.rank, self.mpi.size))
@@ -455,6 +491,7 @@ class EngineService(object, service.Service):
         del self.shell
         self.shell = self.shellClass()
         self.properties.clear()
+        self._transfers.clear()
         d = self.executeAndRaise(msg, self._seedNamespace)
         return d
     
@@ -558,6 +595,67 @@ class EngineService(object, service.Service):
                 return serials
             return packThemUp
 
+    def push_chunk(self, transfer_id, chunk):
+        self._transfers.setdefault(transfer_id, []).append(chunk)
+        return defer.succeed(None)
+
+    def push_serialized_transfer(self, transfer_id, layout):
+        chunks = self._transfers.pop(transfer_id, [])
+        package = []
+        try:
+            for entry in layout:
+                if isinstance(entry, str):
+                    package.append(entry)
+                else:
+                    package.append(chunks[:entry])
+                    del chunks[:entry]
+            sNamespace = newserialized.unpack_serialized(package)
+        except:
+            return defer.fail()
+        del package
+        return self.push_serialized(sNamespace)
+
+    def pull_serialized_transfer(self, transfer_id, keys, chunk_size):
+        d = self.pull_serialized(keys)
+        d.addCallback(newserialized.pack_serialized)
+        d.addCallback(self._storeTransfer, transfer_id, chunk_size)
+        return d
+
+    def _storeTransfer(self, package, transfer_id, chunk_size):
+        """Keep the strings of package longer than chunk_size to be read with
+        pull_chunk, and return the layout of package."""
+        layout = []
+        stored = {}
+        for index, data in enumerate(package):
+            if len(data) <= chunk_size:
+                layout.append(data)
+            else:
+                layout.append(len(data))
+                stored[index] = [data, len(data)]
+        if stored:
+            self._transfers[transfer_id] = stored
+        return layout
+
+    def pull_chunk(self, transfer_id, index, offset, size):
+        try:
+            stored = self._transfers[transfer_id]
+            entry = stored[index]
+        except KeyError:
+            return defer.fail(error.InvalidTransferID(
+                "No pull transfer %r with a string %r" % (transfer_id, index)))
+        chunk = entry[0][offset:offset+size]
+        # Count what is left to read, so the string goes once it is all read.
+        entry[1] -= len(chunk)
+        if entry[1] <= 0:
+            del stored[index]
+            if not stored:
+                del self._transfers[transfer_id]
+        return defer.succeed([chunk])
+
+    def drop_transfer(self, transfer_id):
+        self._transfers.pop(transfer_id, None)
+        return defer.succeed(None)
+
 
 def queue(methodToQueue):
     def queuedMethod(this, *args, **kwargs):
@@ -746,6 +844,27 @@ class QueuedEngine(object):
     @queue
     def pull_serialized(self, keys):
         pass
+
+    # The chunks only move data to or from the engine, so they don't wait in
+    # the queue.  The transfers themselves are queued, which keeps them in
+    # order with the other commands.
+
+    def push_chunk(self, transfer_id, chunk):
+        return self.engine.push_chunk(transfer_id, chunk)
+
+    @queue
+    def push_serialized_transfer(self, transfer_id, layout):
+        pass
+
+    @queue
+    def pull_serialized_transfer(self, transfer_id, keys, chunk_size):
+        pass
+
+    def pull_chunk(self, transfer_id, index, offset, size):
+        return self.engine.pull_chunk(transfer_id, index, offset, size)
+
+    def drop_transfer(self, transfer_id):
+        return self.engine.drop_transfer(transfer_id)
     
     #---------------------------------------------------------------------------
     # IEngineProperties methods
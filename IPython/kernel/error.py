@@ -73,6 +73,14 @@ class InvalidDeferredID(KernelError):
     pass
 
 
+class InvalidTransferID(KernelError):
+    pass
+
+
+class MissingFunctionDigest(KernelError):
+    pass
+
+
 class SerializationError(KernelError):
     pass
 
@@ -15,9 +15,12 @@ __docformat__ = "restructuredtext en"
 # Imports
 #----------------------------------------------------------------------------
 
+import math
+from collections import deque
 from types import FunctionType
 from zope.interface import Interface, implements
-from IPython.kernel.task import MapTask
+from twisted.internet import defer
+from IPython.kernel.task import MapTask, ChunkedMapTask
 from IPython.kernel.twistedutil import gatherBoth
 from IPython.kernel.error import collect_exceptions
 
@@ -67,14 +70,15 @@ class ITaskMapperFactory(Interface):
     """
     
     def mapper(clear_before=False, clear_after=False, retries=0, 
-                recovery_task=None, depend=None, block=True):
+                recovery_task=None, depend=None, block=True, chunked=False):
         """
         Create an `IMapper` implementer with a given set of arguments.
         
         The `IMapper` created using a task controller is load balanced.
         
         See the documentation for `IPython.kernel.task.BaseTask` for 
-        documentation on the arguments to this method.
+        documentation on the arguments to this method.  If chunked, the
+        elements are batched into tasks, see `TaskMapper`.
         """
 
 
@@ -122,15 +126,73 @@ class MultiEngineMapper(object):
         return self.multiengine.raw_map(func, sequences, dist=self.dist,
             targets=self.targets, block=self.block)
 
+class ChunkSizer(object):
+    """
+    Choose the number of elements of each task of a chunked map.
+    
+    Until a task has finished, tasks have a single element, so that short
+    maps return as soon as possible.  Then the size goes (at most doubling
+    each time) towards the one that makes tasks last `chunk_time` seconds,
+    going by the latency per element measured on the tasks that finished.
+    A size is never more than an even share of the remaining elements
+    between `window` tasks, so that the end of the map is still balanced.
+    """
+    
+    def __init__(self, chunk_time=0.2, window=8):
+        self.chunk_time = chunk_time
+        self.window = window
+        # The latency per element, as a moving average.
+        self.latency = None
+        self.largest = 0
+    
+    def record(self, size, duration):
+        """Record that a task of size elements took duration seconds."""
+        latency = duration/size
+        if self.latency is None:
+            self.latency = latency
+        else:
+            self.latency = 0.5*self.latency + 0.5*latency
+        self.largest = max(self.largest, size)
+    
+    def next_size(self, remaining):
+        """The size of the next task, when remaining elements are left."""
+        if self.latency is None:
+            return 1
+        if self.latency > 0:
+            size = int(self.chunk_time/self.latency)
+        else:
+            size = remaining
+        share = int(math.ceil(remaining/float(self.window)))
+        return max(1, min(size, 2*self.largest, share))
+
+
+def _check_sequences(sequences):
+    max_len = max(len(s) for s in sequences)
+    for s in sequences:
+        if len(s)!=max_len:
+            raise ValueError('all sequences must have equal length')
+
+
 class TaskMapper(object):
     """
     Make an `ITaskController` look like an `IMapper`.
     
     This class provides a load balanced version of `map`.
+    
+    By default every element is run as a task of its own.  In chunked mode,
+    the elements are batched into `ChunkedMapTask` with sizes chosen by a 
+    `ChunkSizer`, and no more than `chunk_window` tasks are submitted at a 
+    time.  As later chunks are sized from the earlier ones, a chunked map 
+    always waits for its results.
     """
     
+    # The duration aimed at for each task of a chunked map, in seconds.
+    chunk_time = 0.2
+    # The number of tasks of a chunked map that are submitted at a time.
+    chunk_window = 8
+    
     def __init__(self, task_controller, clear_before=False, clear_after=False, retries=0, 
-            recovery_task=None, depend=None, block=True):
+            recovery_task=None, depend=None, block=True, chunked=False):
         """
         Create a `IMapper` given a `TaskController` and arguments.
         
@@ -141,6 +203,8 @@ class TaskMapper(object):
         :Parameters:
             task_controller : an `IBlockingTaskClient` implementer
                 The `TaskController` to use for calls to `map`
+            chunked : boolean
+                Whether to batch the elements into tasks
         """
         self.task_controller = task_controller
         self.clear_before = clear_before
@@ -149,6 +213,7 @@ class TaskMapper(object):
         self.recovery_task = recovery_task
         self.depend = depend
         self.block = block
+        self.chunked = chunked
     
     def map(self, func, *sequences):
         """
@@ -156,11 +221,10 @@ class TaskMapper(object):
         
         This version is load balanced.
         """
-        max_len = max(len(s) for s in sequences)
-        for s in sequences:
-            if len(s)!=max_len:
-                raise ValueError('all sequences must have equal length')
+        _check_sequences(sequences)
         task_args = zip(*sequences)
+        if self.chunked:
+            return self._map_chunked(func, task_args)
         task_ids = []
         dlist = []
         for ta in task_args:
@@ -178,6 +242,50 @@ class TaskMapper(object):
                 return d
             dlist.addCallback(get_results)
         return dlist
+    
+    def _map_chunked(self, func, task_args):
+        sizer = ChunkSizer(self.chunk_time, self.chunk_window)
+        # The results of each chunk, in the order of task_args.
+        chunks = []
+        state = dict(next=0, pending=0)
+        done = defer.Deferred()
+        
+        def finished(r, index, size):
+            duration, results = r
+            sizer.record(size, duration)
+            chunks[index] = results
+            state['pending'] -= 1
+            submit()
+        
+        def failed(f):
+            if not done.called:
+                done.errback(f)
+        
+        def submit():
+            if done.called:
+                return
+            while state['next'] < len(task_args) and \
+                state['pending'] < self.chunk_window:
+                start = state['next']
+                size = sizer.next_size(len(task_args)-start)
+                task = ChunkedMapTask(func, task_args[start:start+size],
+                    clear_before=self.clear_before,
+                    clear_after=self.clear_after, retries=self.retries,
+                    recovery_task=self.recovery_task, depend=self.depend)
+                state['next'] = start+size
+                state['pending'] += 1
+                chunks.append(None)
+                d = self.task_controller.run(task)
+                d.addCallback(lambda tid: 
+                    self.task_controller.get_task_result(tid, block=True))
+                d.addCallback(finished, len(chunks)-1, size)
+                d.addErrback(failed)
+            if state['pending'] == 0:
+                done.callback([r for results in chunks for r in results])
+        
+        submit()
+        done.addErrback(lambda f: collect_exceptions([f], 'map'))
+        return done
 
 class SynchronousTaskMapper(object):
     """
@@ -186,8 +294,11 @@ class SynchronousTaskMapper(object):
     This class provides a load balanced version of `map`.
     """
     
+    chunk_time = TaskMapper.chunk_time
+    chunk_window = TaskMapper.chunk_window
+    
     def __init__(self, task_controller, clear_before=False, clear_after=False, retries=0, 
-            recovery_task=None, depend=None, block=True):
+            recovery_task=None, depend=None, block=True, chunked=False):
         """
         Create a `IMapper` given a `IBlockingTaskClient` and arguments.
         
@@ -198,6 +309,8 @@ class SynchronousTaskMapper(object):
         :Parameters:
             task_controller : an `IBlockingTaskClient` implementer
                 The `TaskController` to use for calls to `map`
+            chunked : boolean
+                Whether to batch the elements into tasks, see `TaskMapper`
         """
         self.task_controller = task_controller
         self.clear_before = clear_before
@@ -206,6 +319,7 @@ class SynchronousTaskMapper(object):
         self.recovery_task = recovery_task
         self.depend = depend
         self.block = block
+        self.chunked = chunked
     
     def map(self, func, *sequences):
         """
@@ -213,10 +327,9 @@ class SynchronousTaskMapper(object):
         
         This version is load balanced.
         """
-        max_len = max(len(s) for s in sequences)
-        for s in sequences:
-            if len(s)!=max_len:
-                raise ValueError('all sequences must have equal length')
+        if self.chunked:
+            return list(self.imap(func, *sequences))
+        _check_sequences(sequences)
         task_args = zip(*sequences)
         task_ids = []
         for ta in task_args:
@@ -229,4 +342,32 @@ class SynchronousTaskMapper(object):
             task_results = [self.task_controller.get_task_result(tid) for tid in task_ids]
             return task_results
         else:
-            return task_ids
\ No newline at end of file
+            return task_ids
+    
+    def imap(self, func, *sequences):
+        """
+        Apply func to *sequences elementwise, as a chunked map.
+        
+        This returns an iterator over the results, in order, which yields 
+        those of each chunk as soon as it and all the earlier ones are done.
+        """
+        _check_sequences(sequences)
+        task_args = zip(*sequences)
+        sizer = ChunkSizer(self.chunk_time, self.chunk_window)
+        pending = deque()
+        start = 0
+        while start < len(task_args) or pending:
+            while start < len(task_args) and len(pending) < self.chunk_window:
+                size = sizer.next_size(len(task_args)-start)
+                task = ChunkedMapTask(func, task_args[start:start+size],
+                    clear_before=self.clear_before,
+                    clear_after=self.clear_after, retries=self.retries,
+                    recovery_task=self.recovery_task, depend=self.depend)
+                pending.append((self.task_controller.run(task), size))
+                start += size
+            task_id, size = pending.popleft()
+            duration, results = self.task_controller.get_task_result(
+                task_id, block=True)
+            sizer.record(size, duration)
+            for r in results:
+                yield r
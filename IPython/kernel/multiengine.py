@@ -31,7 +31,7 @@ from twisted.internet import defer, reactor
 from twisted.python import log, components, failure
 from zope.interface import Interface, implements
 
-from IPython.kernel.twistedutil import gatherBoth
+from IPython.kernel.twistedutil import gatherBoth, windowed_calls
 from IPython.kernel import error
 from IPython.kernel.pendingdeferred import PendingDeferredManager, two_phase
 from IPython.kernel.controllerservice import (
@@ -168,6 +168,32 @@ class IEngineMultiplexer(Interface):
             keys : tuple of strings
                 Sequence of variable names to pull as serialized objects.
         """
+
+    def push_chunk(transfer_id, chunk, targets='all'):
+        """Forward a chunk of a chunked push to targets.
+        
+        The chunk is not kept by the controller: the result fires once
+        all targets have received it, which paces the client.
+        """
+
+    def push_serialized_transfer(transfer_id, layout, targets='all'):
+        """Push the Serialized objects sent in chunks with `push_chunk`.
+        
+        See `IEngineSerialized.push_serialized_transfer` for the layout.
+        """
+
+    def pull_serialized_transfer(transfer_id, keys, chunk_size, targets='all'):
+        """Pull Serialized objects by keys from targets, to be read in chunks.
+        
+        Returns the layout of the package on each target, see
+        `IEngineSerialized.pull_serialized_transfer`.
+        """
+
+    def pull_chunk(transfer_id, index, offset, size, targets='all'):
+        """Read a chunk of a chunked pull from targets."""
+
+    def drop_transfer(transfer_id, targets='all'):
+        """Have targets drop what they keep of an abandoned chunked transfer."""
         
     def clear_queue(targets='all'):
         """Clear the queue of pending command for targets."""
@@ -209,6 +235,13 @@ class IMultiEngine(IEngineMultiplexer):
 # Implementation of the core MultiEngine classes
 #-------------------------------------------------------------------------------
 
+class _FailedCall(object):
+    """The failure of a call, held as a result."""
+    
+    def __init__(self, failure):
+        self.failure = failure
+
+
 class MultiEngine(ControllerAdapterBase):
     """The representation of a ControllerService as a IMultiEngine.
     
@@ -220,6 +253,11 @@ class MultiEngine(ControllerAdapterBase):
     
     implements(IMultiEngine)
     
+    # The number of engines a chunk is sent to at once.  Foolscap serializes
+    # a message into the transport buffer as soon as it is sent, so this
+    # bounds the memory used by a chunk to fanout copies of it.
+    fanout = 16
+    
     def __init(self, controller):
         ControllerAdapterBase.__init__(self, controller)
     
@@ -297,6 +335,32 @@ class MultiEngine(ControllerAdapterBase):
                 raise AttributeError("Engine %i does not have method %s" % (e.id, methodName))
         return dList
         
+    def _performOnEnginesWindowed(self, methodName, *args, **kwargs):
+        """Call a method on engines, at most `fanout` of them at once.
+        
+        The results and failures are gathered as by
+        `_performOnEnginesAndGatherBoth`.
+        """
+        targets = kwargs.pop('targets')
+        try:
+            engines = self.engineList(targets)
+        except (error.InvalidEngineID, error.NoEnginesRegistered):
+            return defer.fail(failure.Failure())
+        def make_call(e):
+            meth = getattr(e, methodName)
+            def call():
+                # The failures are kept as results, so that every engine is
+                # called and all their failures are collected.
+                return meth(*args, **kwargs).addErrback(_FailedCall)
+            return call
+        def unwrap(results):
+            return [isinstance(r, _FailedCall) and r.failure or r
+                    for r in results]
+        d = windowed_calls([make_call(e) for e in engines], self.fanout)
+        d.addCallback(unwrap)
+        d.addCallback(error.collect_exceptions, methodName)
+        return d
+        
     def _performOnEnginesAndGatherBoth(self, methodName, *args, **kwargs):
         """Called _performOnEngines and wraps result/exception into deferred."""
         try:
@@ -384,6 +448,29 @@ class MultiEngine(ControllerAdapterBase):
             d.addCallback(error.collect_exceptions, 'pull_serialized')
             return d  
                               
+    def push_chunk(self, transfer_id, chunk, targets='all'):
+        # The chunks are not queued by the engines, so a slow engine doesn't
+        # hold the others back for long.
+        return self._performOnEnginesWindowed('push_chunk', transfer_id,
+            chunk, targets=targets)
+
+    def push_serialized_transfer(self, transfer_id, layout, targets='all'):
+        return self._performOnEnginesAndGatherBoth('push_serialized_transfer',
+            transfer_id, layout, targets=targets)
+
+    def pull_serialized_transfer(self, transfer_id, keys, chunk_size,
+        targets='all'):
+        return self._performOnEnginesAndGatherBoth('pull_serialized_transfer',
+            transfer_id, keys, chunk_size, targets=targets)
+
+    def pull_chunk(self, transfer_id, index, offset, size, targets='all'):
+        return self._performOnEnginesAndGatherBoth('pull_chunk', transfer_id,
+            index, offset, size, targets=targets)
+
+    def drop_transfer(self, transfer_id, targets='all'):
+        return self._performOnEnginesAndGatherBoth('drop_transfer',
+            transfer_id, targets=targets)
+
     def _logSizes(self, listOfSerialized):
         if isinstance(listOfSerialized, (list, tuple)):
             for s in listOfSerialized:
@@ -591,6 +678,30 @@ class SynchronousMultiEngine(PendingDeferredManager):
     def pull_serialized(self, keys, targets='all'):
         return self.multiengine.pull_serialized(keys, targets)
     
+    @two_phase
+    def push_chunk(self, transfer_id, chunk, targets='all'):
+        return self.multiengine.push_chunk(transfer_id, chunk, targets)
+
+    @two_phase
+    def push_serialized_transfer(self, transfer_id, layout, targets='all'):
+        return self.multiengine.push_serialized_transfer(transfer_id, layout,
+                                                         targets)
+
+    @two_phase
+    def pull_serialized_transfer(self, transfer_id, keys, chunk_size,
+        targets='all'):
+        return self.multiengine.pull_serialized_transfer(transfer_id, keys,
+                                                         chunk_size, targets)
+
+    @two_phase
+    def pull_chunk(self, transfer_id, index, offset, size, targets='all'):
+        return self.multiengine.pull_chunk(transfer_id, index, offset, size,
+                                           targets)
+
+    @two_phase
+    def drop_transfer(self, transfer_id, targets='all'):
+        return self.multiengine.drop_transfer(transfer_id, targets)
+
     @two_phase
     def clear_queue(self, targets='all'):
         return self.multiengine.clear_queue(targets)
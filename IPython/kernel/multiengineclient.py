@@ -98,6 +98,7 @@ class PendingResult(object):
     Properties:
     
     * `r`
+    * `progress`
     """
     
     def __init__(self, client, result_id):
@@ -180,6 +181,13 @@ class PendingResult(object):
     r = property(_get_r)
     """This property is a shortcut to a `get_result(block=True)`."""
 
+    def _get_progress(self):
+        return self.client.get_transfer_progress(self.result_id)
+
+    progress = property(_get_progress)
+    """The (done, total) bytes of a push or pull done in chunks, while it
+    runs, or None."""
+
 
 #-------------------------------------------------------------------------------
 # Pretty printing wrappers for certain lists
@@ -394,6 +402,9 @@ class FullBlockingMultiEngineClient(InteractiveMultiEngineClient):
     
     def get_pending_deferred(self, deferredID, block):
         return self._bcft(self.smultiengine.get_pending_deferred, deferredID, block)
+
+    def get_transfer_progress(self, deferredID):
+        return self._bcft(self.smultiengine.get_transfer_progress, deferredID)
     
     def barrier(self, pendingResults):
         """Synchronize a set of `PendingResults`.
@@ -476,7 +487,7 @@ class FullBlockingMultiEngineClient(InteractiveMultiEngineClient):
             result.add_callback(wrapResultList)
         return result
     
-    def push(self, namespace, targets=None, block=None):
+    def push(self, namespace, targets=None, block=None, broadcast=False):
         """
         Push a dictionary of keys and values to engines namespace.
         
@@ -495,10 +506,15 @@ class FullBlockingMultiEngineClient(InteractiveMultiEngineClient):
                 If False, this method will return the actual result.  If False,
                 a `PendingResult` is returned which can be used to get the result
                 at a later time.
+            broadcast : boolean
+                If True, serialize the objects once here and have the
+                controller forward the same bytes to every target, streamed
+                in chunks when they are large, see `push_serialized`.  This is
+                faster for large objects pushed to many engines.
         """
         targets, block = self._findTargetsAndBlock(targets, block)
         return self._blockFromThread(self.smultiengine.push, namespace,
-            targets=targets, block=block)
+            targets=targets, block=block, broadcast=broadcast)
     
     def pull(self, keys, targets=None, block=None):
         """
@@ -559,13 +575,40 @@ class FullBlockingMultiEngineClient(InteractiveMultiEngineClient):
         targets, block = self._findTargetsAndBlock(targets, block)
         return self._blockFromThread(self.smultiengine.pull_function, keys, targets=targets, block=block)
     
-    def push_serialized(self, namespace, targets=None, block=None):
+    def push_serialized(self, namespace, targets=None, block=None,
+        chunk_size=None):
+        """
+        Push Serialized objects into engines namespaces.
+        
+        Objects larger than chunk_size bytes are sent in chunks, which the
+        controller forwards to the engines as they come.  In non-blocking
+        mode, the `progress` of the `PendingResult` tells how much was sent.
+        
+        :Parameters:
+            namespace : dict
+                A dict of keys and Serialized objects to be pushed.
+            targets : id or list of ids
+                The engine to use for the execution
+            block : boolean
+                If False, a `PendingResult` is returned.
+            chunk_size : int
+                The size of the chunks, by default the ``chunk_size`` of the
+                asynchronous client.
+        """
         targets, block = self._findTargetsAndBlock(targets, block)
-        return self._blockFromThread(self.smultiengine.push_serialized, namespace, targets=targets, block=block)
+        return self._blockFromThread(self.smultiengine.push_serialized, namespace,
+            targets=targets, block=block, chunk_size=chunk_size)
     
-    def pull_serialized(self, keys, targets=None, block=None):
+    def pull_serialized(self, keys, targets=None, block=None, chunk_size=None):
+        """
+        Pull objects by key out of engines namespaces as Serialized objects.
+        
+        Objects larger than chunk_size bytes are read in chunks, see
+        `push_serialized`.
+        """
         targets, block = self._findTargetsAndBlock(targets, block)
-        return self._blockFromThread(self.smultiengine.pull_serialized, keys, targets=targets, block=block)
+        return self._blockFromThread(self.smultiengine.pull_serialized, keys,
+            targets=targets, block=block, chunk_size=chunk_size)
     
     def get_result(self, i=None, targets=None, block=None):
         """
@@ -853,6 +896,8 @@ class FullBlockingMultiEngineClient(InteractiveMultiEngineClient):
         These benchmarks will vary widely on different hardware and networks
         and thus can be used to get an idea of the performance characteristics
         of a particular configuration of an IPython controller and engines.
+        The push to all engines is measured both as a plain push and as a
+        push with ``broadcast=True``, to compare their throughput.
         
         This function is not testable within our current testing framework.
         """
@@ -882,6 +927,13 @@ class FullBlockingMultiEngineClient(InteractiveMultiEngineClient):
             result = min(timer.repeat(repeat,count))/count
             benchmarks['all_engine_push'] = (1e-6*push_size*8/result, 'MB/sec')
 
+            timer = timeit.Timer(
+                "_mec_self.push(d, broadcast=True)",
+                "import numpy as np; d = dict(a=np.zeros(%r,dtype='float64'))" % push_size
+            )
+            result = min(timer.repeat(repeat,count))/count
+            benchmarks['all_engine_push_broadcast'] = (1e-6*push_size*8/result, 'MB/sec')
+
         try:
             import numpy as np
         except:
@@ -29,6 +29,7 @@ try:
 except ImportError:
     from foolscap import Referenceable
 
+from IPython.external import guid
 from IPython.kernel import error 
 from IPython.kernel import map as Map
 from IPython.kernel.parallelfunction import ParallelFunction
@@ -37,7 +38,9 @@ from IPython.kernel.mapper import (
     IMultiEngineMapperFactory,
     IMapper
 )
-from IPython.kernel.twistedutil import gatherBoth
+from IPython.kernel.twistedutil import gatherBoth, windowed_calls
+from IPython.kernel.newserialized import (
+    pack_serialized, unpack_serialized, serialize)
 from IPython.kernel.multiengine import (
     IMultiEngine,
     IFullSynchronousMultiEngine,
@@ -45,7 +48,8 @@ from IPython.kernel.multiengine import (
 from IPython.kernel.pendingdeferred import PendingDeferredManager
 from IPython.kernel.pickleutil import (
     canDict,
-    canSequence, uncanDict, uncanSequence
+    canSequence, uncanDict, uncanSequence,
+    SentFunctions
 )
 
 from IPython.kernel.clientinterfaces import (
@@ -162,10 +166,10 @@ class FCSynchronousMultiEngineFromMultiEngine(Referenceable):
     def remote_push_function(self, binaryNS, targets, block):
         try:
             namespace = pickle.loads(binaryNS)
+            namespace = uncanDict(namespace)
         except:
             d = defer.fail(failure.Failure())
         else:
-            namespace = uncanDict(namespace)
             d = self.smultiengine.push_function(namespace, targets=targets, block=block)
         return d
     
@@ -190,7 +194,7 @@ class FCSynchronousMultiEngineFromMultiEngine(Referenceable):
     @packageResult    
     def remote_push_serialized(self, binaryNS, targets, block):
         try:
-            namespace = pickle.loads(binaryNS)
+            namespace = unpack_serialized(binaryNS)
         except:
             d = defer.fail(failure.Failure())
         else:
@@ -202,6 +206,32 @@ class FCSynchronousMultiEngineFromMultiEngine(Referenceable):
         d = self.smultiengine.pull_serialized(keys, targets=targets, block=block)
         return d
     
+    @packageResult
+    def remote_push_chunk(self, transfer_id, chunk, targets, block):
+        return self.smultiengine.push_chunk(transfer_id, chunk,
+            targets=targets, block=block)
+
+    @packageResult
+    def remote_push_serialized_transfer(self, transfer_id, layout, targets, block):
+        return self.smultiengine.push_serialized_transfer(transfer_id, layout,
+            targets=targets, block=block)
+
+    @packageResult
+    def remote_pull_serialized_transfer(self, transfer_id, keys, chunk_size,
+        targets, block):
+        return self.smultiengine.pull_serialized_transfer(transfer_id, keys,
+            chunk_size, targets=targets, block=block)
+
+    @packageResult
+    def remote_pull_chunk(self, transfer_id, index, offset, size, targets, block):
+        return self.smultiengine.pull_chunk(transfer_id, index, offset, size,
+            targets=targets, block=block)
+
+    @packageResult
+    def remote_drop_transfer(self, transfer_id, targets, block):
+        return self.smultiengine.drop_transfer(transfer_id, targets=targets,
+            block=block)
+    
     @packageResult
     def remote_get_result(self, i, targets, block):
         if i == 'None':
@@ -287,6 +317,27 @@ components.registerAdapter(FCSynchronousMultiEngineFromMultiEngine,
 #-------------------------------------------------------------------------------
 
 
+class ChunkedTransfer(object):
+    """The progress of a push or pull of Serialized objects done in chunks.
+    
+    Only the strings sent in chunks are counted, in bytes.
+    """
+    
+    def __init__(self):
+        self.transfer_id = guid.generate()
+        self.total = 0
+        self.done = 0
+    
+    def advance(self, result, size):
+        """Count size more bytes as transferred and pass result through."""
+        self.done += size
+        return result
+    
+    def progress(self):
+        """Return the bytes transferred so far and the total, as a tuple."""
+        return self.done, self.total
+
+
 class FCFullSynchronousMultiEngineClient(object):
     
     implements(
@@ -296,9 +347,20 @@ class FCFullSynchronousMultiEngineClient(object):
         IMapper
     )
     
+    # Serialized objects larger than chunk_size bytes are pushed and pulled
+    # in chunks of that size, with at most chunk_window chunks in flight, so
+    # that the controller never holds more than that of them.
+    chunk_size = 4*1024*1024
+    chunk_window = 4
+    
     def __init__(self, remote_reference):
         self.remote_reference = remote_reference
         self._deferredIDCallbacks = {}
+        # The ChunkedTransfers still running, by local deferred id.
+        self._transfers = {}
+        # The functions pushed to the controller are only sent once, and then
+        # by digest while the controller has them cached.
+        self.sent_functions = SentFunctions()
         # This class manages some pending deferreds through this instance.  This
         # is required for methods like gather/scatter as it enables us to
         # create our own pending deferreds for composite operations.
@@ -355,7 +417,13 @@ class FCFullSynchronousMultiEngineClient(object):
         d.addCallback(self.unpackage)
         return d
     
-    def push(self, namespace, targets='all', block=True):
+    def push(self, namespace, targets='all', block=True, broadcast=False):
+        if broadcast:
+            # The controller unpickles a push and pickles it again for each
+            # engine.  Serialized objects are forwarded as they are, in chunks
+            # when they are large, so each one is only serialized here.
+            sNamespace = dict((k, serialize(v)) for k, v in namespace.iteritems())
+            return self.push_serialized(sNamespace, targets, block)
         serial = pickle.dumps(namespace, 2)
         d =  self.remote_reference.callRemote('push', serial, targets, block)
         d.addCallback(self.unpackage)
@@ -367,10 +435,16 @@ class FCFullSynchronousMultiEngineClient(object):
         return d
     
     def push_function(self, namespace, targets='all', block=True):
-        cannedNamespace = canDict(namespace)
+        cannedNamespace = self.sent_functions.packDict(canDict(dict(namespace)))
         serial = pickle.dumps(cannedNamespace, 2)
         d = self.remote_reference.callRemote('push_function', serial, targets, block)
         d.addCallback(self.unpackage)
+        def resend(reason):
+            # The controller didn't have one of the functions cached anymore.
+            reason.trap(error.MissingFunctionDigest)
+            self.sent_functions.forget()
+            return self.push_function(namespace, targets, block)
+        d.addErrback(resend)
         return d
     
     def pull_function(self, keys, targets='all', block=True):
@@ -388,17 +462,135 @@ class FCFullSynchronousMultiEngineClient(object):
             d.addCallback(lambda did: self._addDeferredIDCallback(did, uncan_functions, keys))
         return d
     
-    def push_serialized(self, namespace, targets='all', block=True):
-        cannedNamespace = canDict(namespace)
-        serial = pickle.dumps(cannedNamespace, 2)
-        d =  self.remote_reference.callRemote('push_serialized', serial, targets, block)
+    def push_serialized(self, namespace, targets='all', block=True,
+        chunk_size=None):
+        if chunk_size is None:
+            chunk_size = self.chunk_size
+        serial = pack_serialized(namespace)
+        if sum(len(data) for data in serial) <= chunk_size:
+            d =  self.remote_reference.callRemote('push_serialized', serial, targets, block)
+            d.addCallback(self.unpackage)
+            return d
+        transfer = ChunkedTransfer()
+        layout = []
+        calls = []
+        for data in serial:
+            if len(data) <= chunk_size:
+                layout.append(data)
+            else:
+                offsets = range(0, len(data), chunk_size)
+                layout.append(len(offsets))
+                transfer.total += len(data)
+                for offset in offsets:
+                    calls.append(self._push_chunk_call(transfer, data, offset,
+                        chunk_size, targets))
+        d = windowed_calls(calls, self.chunk_window)
+        d.addCallback(lambda _: self.remote_reference.callRemote(
+            'push_serialized_transfer', transfer.transfer_id, layout, targets,
+            True))
         d.addCallback(self.unpackage)
-        return d
-    
-    def pull_serialized(self, keys, targets='all', block=True):
-        d = self.remote_reference.callRemote('pull_serialized', keys, targets, block)
+        d.addErrback(self._drop_transfer, transfer, targets)
+        return self._two_phase_transfer(d, transfer, block)
+    
+    def _push_chunk_call(self, transfer, data, offset, size, targets):
+        """Return a function sending the chunk of data at offset."""
+        def push_chunk():
+            chunk = data[offset:offset+size]
+            d = self.remote_reference.callRemote('push_chunk',
+                transfer.transfer_id, chunk, targets, True)
+            d.addCallback(self.unpackage)
+            d.addCallback(transfer.advance, len(chunk))
+            return d
+        return push_chunk
+    
+    def pull_serialized(self, keys, targets='all', block=True, chunk_size=None):
+        # The engines send the small objects right away, with the layout of
+        # their package, and keep the large ones to be read in chunks.  The
+        # targets are made explicit to know which engine sent each layout.
+        if chunk_size is None:
+            chunk_size = self.chunk_size
+        transfer = ChunkedTransfer()
+        def pull_layouts(engines):
+            d = self.remote_reference.callRemote('pull_serialized_transfer',
+                transfer.transfer_id, keys, chunk_size, engines, True)
+            d.addCallback(self.unpackage)
+            d.addCallback(lambda layouts: zip(engines, layouts))
+            return d
+        d = self._process_targets(targets)
+        d.addCallback(pull_layouts)
+        d.addCallback(self._pull_chunks, transfer, chunk_size)
+        d.addErrback(self._drop_transfer, transfer, targets)
+        return self._two_phase_transfer(d, transfer, block)
+    
+    def _pull_chunks(self, layouts, transfer, chunk_size):
+        """Read the strings kept by each engine and unpack the packages."""
+        packages = []
+        calls = []
+        for engine, layout in layouts:
+            package = list(layout)
+            packages.append(package)
+            for index, entry in enumerate(layout):
+                if isinstance(entry, str):
+                    continue
+                transfer.total += entry
+                offsets = range(0, entry, chunk_size)
+                chunks = package[index] = [None]*len(offsets)
+                for i, offset in enumerate(offsets):
+                    calls.append(self._pull_chunk_call(transfer, engine, index,
+                        offset, chunk_size, chunks, i))
+        def unpack(_):
+            results = []
+            for package in packages:
+                results.append(unpack_serialized(package))
+            return results
+        d = windowed_calls(calls, self.chunk_window)
+        d.addCallback(unpack)
+        return d
+    
+    def _pull_chunk_call(self, transfer, engine, index, offset, size, chunks, i):
+        """Return a function reading a chunk from engine into chunks[i]."""
+        def pull_chunk():
+            d = self.remote_reference.callRemote('pull_chunk',
+                transfer.transfer_id, index, offset, size, engine, True)
+            d.addCallback(self.unpackage)
+            def save(result):
+                # One engine was targeted, and it sent the chunk in a list.
+                chunks[i] = result[0][0]
+                transfer.advance(None, len(chunks[i]))
+            return d.addCallback(save)
+        return pull_chunk
+    
+    def _drop_transfer(self, reason, transfer, targets):
+        """Have targets drop what they keep of a failed transfer, and pass
+        reason on."""
+        d = self.remote_reference.callRemote('drop_transfer',
+            transfer.transfer_id, targets, True)
         d.addCallback(self.unpackage)
+        # The engines may well be gone, it is the first failure that matters.
+        d.addBoth(lambda _: reason)
         return d
+    
+    def _two_phase_transfer(self, d, transfer, block):
+        """Return d, or if not block, a local deferred id for it whose
+        progress can be followed with `get_transfer_progress`."""
+        if block:
+            return d
+        deferred_id = self.pdm.get_deferred_id()
+        self._transfers[deferred_id] = transfer
+        def forget(result):
+            del self._transfers[deferred_id]
+            return result
+        d.addBoth(forget)
+        self.pdm.save_pending_deferred(d, deferred_id)
+        return defer.succeed(deferred_id)
+    
+    def get_transfer_progress(self, deferredID):
+        """Return the progress of a chunked transfer done in non-blocking
+        mode, as (done, total) in bytes, or None if it is not running."""
+        transfer = self._transfers.get(deferredID)
+        if transfer is None:
+            return None
+        return transfer.progress()
         
     def get_result(self, i=None, targets='all', block=True):
         if i is None: # This is because None cannot be marshalled by xml-rpc
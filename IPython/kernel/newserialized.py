@@ -95,17 +95,14 @@ class SerializeIt(object):
     def __init__(self, unSerialized):
         self.data = None
         self.obj = unSerialized.getObject()
-        if globals().has_key('numpy'):
-            if isinstance(self.obj, numpy.ndarray):
-                if len(self.obj) == 0:         # length 0 arrays can't be reconstructed
-                    raise SerializationError("You cannot send a length 0 array")
-                self.obj = numpy.ascontiguousarray(self.obj, dtype=None)
-                self.typeDescriptor = 'ndarray'
-                self.metadata = {'shape':self.obj.shape,
-                                 'dtype':self.obj.dtype.str}
-            else:
-                self.typeDescriptor = 'pickle'
-                self.metadata = {}
+        if globals().has_key('numpy') and \
+            isinstance(self.obj, numpy.ndarray) and not self.obj.dtype.hasobject:
+            # Arrays of objects hold pointers, not data, so they are pickled.
+            # This makes no copy if the array is already contiguous.
+            self.obj = numpy.ascontiguousarray(self.obj, dtype=None)
+            self.typeDescriptor = 'ndarray'
+            self.metadata = {'shape':self.obj.shape,
+                             'dtype':self.obj.dtype.str}
         else:
             self.typeDescriptor = 'pickle'
             self.metadata = {}
@@ -113,7 +110,10 @@ class SerializeIt(object):
     
     def _generateData(self):
         if self.typeDescriptor == 'ndarray':
-            self.data = numpy.getbuffer(self.obj)
+            if self.obj.size == 0:
+                self.data = ''
+            else:
+                self.data = numpy.getbuffer(self.obj)
         elif self.typeDescriptor == 'pickle':
             self.data = pickle.dumps(self.obj, 2)
         else:
@@ -144,11 +144,7 @@ class UnSerializeIt(UnSerialized):
         typeDescriptor = self.serialized.getTypeDescriptor()
         if globals().has_key('numpy'):
             if typeDescriptor == 'ndarray':
-                result = numpy.frombuffer(self.serialized.getData(), dtype = self.serialized.metadata['dtype'])
-                result.shape = self.serialized.metadata['shape']
-                # This is a hack to make the array writable.  We are working with
-                # the numpy folks to address this issue.
-                result = result.copy()
+                result = self._getArray()
             elif typeDescriptor == 'pickle':
                 result = pickle.loads(self.serialized.getData())
             else:
@@ -159,6 +155,28 @@ class UnSerializeIt(UnSerialized):
             raise SerializationError("Really wierd serialization error.")
         return result
 
+    def _getArray(self):
+        """Rebuild a writable ndarray from the data of the Serialized.
+
+        Data in a bytearray, as `unpack_serialized` receives it, is used in
+        place instead of being copied.  The Serialized should then be
+        unserialized only once, as the arrays would share their memory.
+        Other buffers, such as strings or the ones of a local array, are
+        copied, as they must never be written.
+        """
+        metadata = self.serialized.getMetadata()
+        dtype = numpy.dtype(metadata['dtype'])
+        shape = metadata['shape']
+        data = self.serialized.getData()
+        if len(data) == 0:
+            # frombuffer doesn't accept an empty buffer.
+            return numpy.empty(shape, dtype=dtype)
+        result = numpy.frombuffer(data, dtype=dtype)
+        result.shape = shape
+        if not isinstance(data, bytearray):
+            result = result.copy()
+        return result
+
 components.registerAdapter(UnSerializeIt, ISerialized, IUnSerialized)
 
 components.registerAdapter(SerializeIt, IUnSerialized, ISerialized)
@@ -168,3 +186,72 @@ def serialize(obj):
     
 def unserialize(serialized):
     return IUnSerialized(serialized).getObject()
+
+
+def _pack(serialized, buffers):
+    """Append the data of serialized to buffers and return its header."""
+    data = serialized.getData()
+    if not isinstance(data, str):
+        # Foolscap only sends strings, so this is the one copy of the data.
+        data = str(data)
+    buffers.append(data)
+    return (serialized.getTypeDescriptor(), serialized.getMetadata(),
+            len(buffers))
+
+
+def pack_serialized(serials):
+    """Pack Serialized objects in a list of strings to send over the network.
+
+    serials is a Serialized, or a list or dict of them.  The first string is
+    a small pickled header with the type descriptor and metadata of each
+    object, and the data of each object follows as a separate string, so it
+    is never pickled again.  Use `unpack_serialized` to get serials back.
+    """
+    buffers = []
+    if isinstance(serials, dict):
+        header = dict((k, _pack(s, buffers)) for k, s in serials.iteritems())
+    elif isinstance(serials, (list, tuple)):
+        header = [_pack(s, buffers) for s in serials]
+    else:
+        header = _pack(serials, buffers)
+    return [pickle.dumps(header, 2)] + buffers
+
+
+def join_chunks(chunks):
+    """Copy the strings in chunks into a single new bytearray."""
+    result = bytearray(sum(len(c) for c in chunks))
+    offset = 0
+    for c in chunks:
+        # A slice of the same length is replaced in place (memoryview is only
+        # there from Python 2.7).
+        result[offset:offset+len(c)] = c
+        offset += len(c)
+    return result
+
+
+def unpack_serialized(package):
+    """Rebuild the Serialized objects packed by `pack_serialized`.
+
+    Each string of package can also come as the list of its chunks.  The
+    chunks of an ndarray are joined into a bytearray, that the unserialized
+    array then uses in place, so they are copied only once.
+    """
+    def data(index, typeDescriptor=None):
+        entry = package[index]
+        if not isinstance(entry, list):
+            return entry
+        elif typeDescriptor == 'ndarray':
+            return join_chunks(entry)
+        else:
+            return ''.join(entry)
+    header = pickle.loads(data(0))
+    def unpack(h):
+        typeDescriptor, metadata, index = h
+        return Serialized(data(index, typeDescriptor), typeDescriptor,
+            metadata)
+    if isinstance(header, dict):
+        return dict((k, unpack(h)) for k, h in header.iteritems())
+    elif isinstance(header, list):
+        return [unpack(h) for h in header]
+    else:
+        return unpack(header)
@@ -50,7 +50,7 @@ class ITaskParallelDecorator(Interface):
     """A decorator that creates a parallel function."""
     
     def parallel(clear_before=False, clear_after=False, retries=0, 
-        recovery_task=None, depend=None, block=True):
+        recovery_task=None, depend=None, block=True, chunked=False):
         """
         A decorator that turns a function into a parallel function.
         
@@ -65,7 +65,8 @@ class ITaskParallelDecorator(Interface):
         This causes f(0,0), f(1,1), ... to be called in parallel.
         
         See the documentation for `IPython.kernel.task.BaseTask` for 
-        documentation on the arguments to this method.
+        documentation on the arguments to this method.  If chunked, the
+        elements are batched into tasks, see `IPython.kernel.mapper.TaskMapper`.
         """
 
 class IParallelFunction(Interface):
@@ -15,8 +15,113 @@ __docformat__ = "restructuredtext en"
 # Imports
 #-------------------------------------------------------------------------------
 
+import cPickle as pickle
+from hashlib import sha1
 from types import FunctionType
 
+from IPython.kernel import codeutil
+from IPython.kernel.error import MissingFunctionDigest
+from IPython.utils.data import OrderedDict
+
+#-------------------------------------------------------------------------------
+# Function caches
+#-------------------------------------------------------------------------------
+
+class FunctionCache(object):
+    """The code of the functions received, by digest, with LRU eviction.
+    
+    Every canned function unpickled in this process is added to
+    `function_cache`, so that later it can be sent as its digest only.
+    """
+    
+    def __init__(self, size=256):
+        self.size = size
+        self._codes = OrderedDict()
+    
+    def add(self, digest, code):
+        self._codes.pop(digest, None)
+        self._codes[digest] = code
+        while len(self._codes) > self.size:
+            self._codes.popitem(last=False)
+    
+    def get(self, digest):
+        """Return the code with digest, or raise MissingFunctionDigest."""
+        try:
+            code = self._codes.pop(digest)
+        except KeyError:
+            raise MissingFunctionDigest(digest)
+        self._codes[digest] = code
+        return code
+    
+    def __contains__(self, digest):
+        return digest in self._codes
+    
+    def __len__(self):
+        return len(self._codes)
+
+function_cache = FunctionCache()
+
+# The digests of the codes canned lately, so that canning the same function
+# for every task doesn't pickle its code every time.
+_digests = OrderedDict()
+_digests_size = 256
+
+def code_digest(code):
+    """Return the digest of the pickled code object code."""
+    try:
+        digest = _digests.pop(code)
+    except KeyError:
+        digest = sha1(pickle.dumps(code, 2)).hexdigest()
+        while len(_digests) >= _digests_size:
+            _digests.popitem(last=False)
+    _digests[code] = digest
+    return digest
+
+
+class SentFunctions(object):
+    """The digests of the functions a sender believes a receiver has cached.
+    
+    A sender keeps one of these for each receiver.  `pack` replaces canned
+    functions that were already sent by their digest.  When the receiver
+    no longer has one, it raises `MissingFunctionDigest`: the sender must
+    then `forget` the digest and send the function again.
+    """
+    
+    def __init__(self, size=256):
+        self.size = size
+        self._digests = OrderedDict()
+    
+    def pack(self, obj):
+        """Return obj, or its FunctionDigest if it was already sent."""
+        if not isinstance(obj, CannedFunction) or \
+            isinstance(obj, FunctionDigest):
+            return obj
+        digest = obj.digest
+        if self._digests.pop(digest, False):
+            self._digests[digest] = True
+            return FunctionDigest(digest, obj.code)
+        self._digests[digest] = True
+        while len(self._digests) > self.size:
+            self._digests.popitem(last=False)
+        return obj
+    
+    def packDict(self, obj):
+        if isinstance(obj, dict):
+            for k, v in obj.iteritems():
+                obj[k] = self.pack(v)
+        return obj
+    
+    def forget(self, digest=None):
+        """Forget digest, or all the digests if it is None."""
+        if digest is None:
+            self._digests.clear()
+        else:
+            self._digests.pop(digest, None)
+
+#-------------------------------------------------------------------------------
+# Canning
+#-------------------------------------------------------------------------------
+
 class CannedObject(object):
     pass
     
@@ -25,16 +130,57 @@ class CannedFunction(CannedObject):
     def __init__(self, f):
         self._checkType(f)    
         self.code = f.func_code
+        self._digest = None
     
     def _checkType(self, obj):
         assert isinstance(obj, FunctionType), "Not a function type"
     
+    def _get_digest(self):
+        # Computed on demand, as code with closures can't be pickled.
+        if self._digest is None:
+            self._digest = code_digest(self.code)
+        return self._digest
+    
+    digest = property(_get_digest)
+    
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        # The functions sent with their digest are kept for later tasks.
+        if state.get('_digest') is not None:
+            function_cache.add(self._digest, self.code)
+    
     def getFunction(self, g=None):
         if g is None:
             g = globals()
         newFunc = FunctionType(self.code, g)
         return newFunc
 
+
+class FunctionDigest(CannedFunction):
+    """A canned function sent as the digest of its code only.
+    
+    The code is kept on the sending side but not pickled, and the receiver
+    looks it up in its `function_cache`.
+    """
+    
+    def __init__(self, digest, code=None):
+        self._digest = digest
+        self._code = code
+    
+    def __getstate__(self):
+        return {'_digest': self._digest}
+    
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self._code = None
+    
+    def _get_code(self):
+        if self._code is not None:
+            return self._code
+        return function_cache.get(self._digest)
+    
+    code = property(_get_code)
+
 def can(obj):
     if isinstance(obj, FunctionType):
         return CannedFunction(obj)
@@ -150,12 +150,14 @@ class ITask(zi.Interface):
             True if the task should be run, False otherwise
         """
     
-    def can_task(self):
+    def can_task(self, functions=None):
         """Serialize (can) any functions in the task for pickling.
         
         Subclasses must override this method and make sure that all 
         functions in the task are canned by calling `can` on the 
-        function.
+        function.  If functions, a `SentFunctions`, is given, the canned
+        functions are then passed to its `pack` method, so that those
+        already sent go by digest only.
         """
     
     def uncan_task(self):
@@ -255,10 +257,12 @@ class BaseTask(object):
         else:
             return True
 
-    def can_task(self):
+    def can_task(self, functions=None):
         self.depend = can(self.depend)
+        if functions is not None:
+            self.depend = functions.pack(self.depend)
         if isinstance(self.recovery_task, BaseTask):
-            self.recovery_task.can_task()
+            self.recovery_task.can_task(functions)
             
     def uncan_task(self):
         self.depend = uncan(self.depend)
@@ -313,15 +317,60 @@ class MapTask(BaseTask):
         )
         d.addCallback(lambda r: queued_engine.pull('_ipython_task_result'))
     
-    def can_task(self):
+    def can_task(self, functions=None):
         self.function = can(self.function)
-        BaseTask.can_task(self)
+        if functions is not None:
+            self.function = functions.pack(self.function)
+        BaseTask.can_task(self, functions)
     
     def uncan_task(self):
         self.function = uncan(self.function)
         BaseTask.uncan_task(self)
 
 
+class ChunkedMapTask(MapTask):
+    """
+    A task that applies a function to a chunk of argument tuples.
+
+    This is what the chunked mode of `TaskMapper` submits, so that many
+    elements share the overhead of one task.  Its result is a tuple of the
+    duration of the task and the list of the results of the function.
+    """
+
+    def __init__(self, function, chunk, clear_before=False,
+            clear_after=False, retries=0, recovery_task=None, depend=None):
+        """
+        Create a task that calls function(*args) for each args in chunk.
+
+        :Parameters:
+            function : FunctionType
+                The function to call
+            chunk : list of tuples
+                The arguments of each call
+        """
+        MapTask.__init__(self, function, list(chunk), None, clear_before,
+            clear_after, retries, recovery_task, depend)
+
+    def submit_task(self, d, queued_engine):
+        d.addCallback(lambda r: queued_engine.push_function(
+            dict(_ipython_task_function=self.function))
+        )
+        d.addCallback(lambda r: queued_engine.push(
+            dict(_ipython_task_chunk=self.args))
+        )
+        d.addCallback(lambda r: queued_engine.execute(
+            '_ipython_task_result = [_ipython_task_function(*_ipython_task_args) '
+            'for _ipython_task_args in _ipython_task_chunk]')
+        )
+        d.addCallback(lambda r: queued_engine.pull('_ipython_task_result'))
+
+    def process_result(self, result, engine_id):
+        if isinstance(result, failure.Failure):
+            return (False, result)
+        else:
+            return (True, (self.duration, result))
+
+
 class StringTask(BaseTask):
     """
     A task that consists of a string of Python code to run.
@@ -172,23 +172,25 @@ class BlockingTaskClient(object):
         return self.mapper().map(func, *sequences)
 
     def mapper(self, clear_before=False, clear_after=False, retries=0, 
-                recovery_task=None, depend=None, block=True):
+                recovery_task=None, depend=None, block=True, chunked=False):
         """
         Create an `IMapper` implementer with a given set of arguments.
         
         The `IMapper` created using a task controller is load balanced.
         
         See the documentation for `IPython.kernel.task.BaseTask` for 
-        documentation on the arguments to this method.
+        documentation on the arguments to this method.  If chunked, the
+        elements are batched into tasks, see `TaskMapper`.
         """
         return SynchronousTaskMapper(self, clear_before=clear_before, 
             clear_after=clear_after, retries=retries, 
-            recovery_task=recovery_task, depend=depend, block=block)
+            recovery_task=recovery_task, depend=depend, block=block,
+            chunked=chunked)
     
     def parallel(self, clear_before=False, clear_after=False, retries=0, 
-        recovery_task=None, depend=None, block=True):
+        recovery_task=None, depend=None, block=True, chunked=False):
         mapper = self.mapper(clear_before, clear_after, retries,
-            recovery_task, depend, block)
+            recovery_task, depend, block, chunked)
         pf = ParallelFunction(mapper)
         return pf
 
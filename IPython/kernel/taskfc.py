@@ -29,6 +29,7 @@ try:
 except ImportError:
     from foolscap import Referenceable
 
+from IPython.kernel import error
 from IPython.kernel import task as taskmodule
 from IPython.kernel.clientinterfaces import (
     IFCClientInterfaceProvider, 
@@ -39,6 +40,7 @@ from IPython.kernel.mapper import (
     ITaskMapperFactory,
     IMapper
 )
+from IPython.kernel.pickleutil import SentFunctions
 from IPython.kernel.parallelfunction import (
     ParallelFunction, 
     ITaskParallelDecorator
@@ -109,6 +111,9 @@ class FCTaskControllerFromTaskController(Referenceable):
         try:
             task = pickle.loads(ptask)
             task.uncan_task()
+        except error.MissingFunctionDigest:
+            # The client will send the functions again
+            d = defer.fail()
         except:
             d = defer.fail(pickle.UnpickleableError("Could not unmarshal task"))
         else:
@@ -182,6 +187,9 @@ class FCTaskClient(object):
     
     def __init__(self, remote_reference):
         self.remote_reference = remote_reference
+        # The functions of the tasks are only sent once, and then by digest
+        # while the controller has them cached.
+        self.sent_functions = SentFunctions()
     
     #---------------------------------------------------------------------------
     # Non interface methods
@@ -206,13 +214,21 @@ class FCTaskClient(object):
             `get_task_result` to get the `TaskResult` object.
         """
         assert isinstance(task, taskmodule.BaseTask), "task must be a Task object!"
-        task.can_task()
+        task.can_task(self.sent_functions)
         ptask = pickle.dumps(task, 2)
         task.uncan_task()
         d = self.remote_reference.callRemote('run', ptask)
         d.addCallback(self.unpackage)
+        d.addErrback(self._resendTask, task)
         return d
     
+    def _resendTask(self, reason, task):
+        """Run task again with its functions, if the controller didn't have
+        one of them cached anymore."""
+        reason.trap(error.MissingFunctionDigest)
+        self.sent_functions.forget()
+        return self.run(task)
+    
     def get_task_result(self, taskid, block=False):
         """
         Get a task result by taskid.
@@ -307,23 +323,25 @@ class FCTaskClient(object):
         return self.mapper().map(func, *sequences)
     
     def mapper(self, clear_before=False, clear_after=False, retries=0, 
-                recovery_task=None, depend=None, block=True):
+                recovery_task=None, depend=None, block=True, chunked=False):
         """
         Create an `IMapper` implementer with a given set of arguments.
         
         The `IMapper` created using a task controller is load balanced.
         
         See the documentation for `IPython.kernel.task.BaseTask` for 
-        documentation on the arguments to this method.
+        documentation on the arguments to this method.  If chunked, the
+        elements are batched into tasks, see `TaskMapper`.
         """
         return TaskMapper(self, clear_before=clear_before, 
             clear_after=clear_after, retries=retries, 
-            recovery_task=recovery_task, depend=depend, block=block)
+            recovery_task=recovery_task, depend=depend, block=block,
+            chunked=chunked)
     
     def parallel(self, clear_before=False, clear_after=False, retries=0, 
-        recovery_task=None, depend=None, block=True):
+        recovery_task=None, depend=None, block=True, chunked=False):
         mapper = self.mapper(clear_before, clear_after, retries,
-            recovery_task, depend, block)
+            recovery_task, depend, block, chunked)
         pf = ParallelFunction(mapper)
         return pf
 
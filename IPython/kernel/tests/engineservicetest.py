@@ -278,6 +278,47 @@ class IEngineSerializedTestCase(object):
         d.addErrback(lambda f: self.assertRaises(pickle.PicklingError, f.raiseException))
         return d
 
+    def testPushPullSerializedTransfer(self):
+        obj = 'x'*1000
+        package = newserialized.pack_serialized(
+            dict(key=newserialized.serialize(obj)))
+        # The header goes as is, and the pickled string in chunks of 200 bytes.
+        header, data = package
+        chunks = [data[i:i+200] for i in range(0, len(data), 200)]
+        for chunk in chunks:
+            self.engine.push_chunk('push', chunk)
+        d = self.engine.push_serialized_transfer('push', [header, len(chunks)])
+        d.addCallback(lambda _: self.engine.pull_serialized_transfer('pull',
+            'key', 200))
+        def read_chunks(layout):
+            self.assert_(isinstance(layout[0], str))
+            self.assertEquals(layout[1], len(data))
+            dList = [self.engine.pull_chunk('pull', 1, offset, 200)
+                     for offset in range(0, len(data), 200)]
+            d = defer.gatherResults(dList)
+            d.addCallback(lambda chunks: ''.join(c[0] for c in chunks))
+            d.addCallback(lambda data: [layout[0], data])
+            return d
+        d.addCallback(read_chunks)
+        d.addCallback(newserialized.unpack_serialized)
+        d.addCallback(newserialized.unserialize)
+        d.addCallback(lambda value: self.assertEquals(value, obj))
+        # Everything was read, so the transfer is gone.
+        d.addCallback(lambda _: self.engine.pull_chunk('pull', 1, 0, 200))
+        d.addErrback(lambda f: self.assertRaises(error.InvalidTransferID,
+            f.raiseException))
+        return d
+
+    def testDropTransfer(self):
+        d = self.engine.push(dict(key='x'*1000))
+        d.addCallback(lambda _: self.engine.pull_serialized_transfer('pull',
+            'key', 200))
+        d.addCallback(lambda _: self.engine.drop_transfer('pull'))
+        d.addCallback(lambda _: self.engine.pull_chunk('pull', 1, 0, 200))
+        d.addErrback(lambda f: self.assertRaises(error.InvalidTransferID,
+            f.raiseException))
+        return d
+
 Parametric(IEngineSerializedTestCase)
 
 class IEngineQueuedTestCase(object):
@@ -170,6 +170,18 @@ class ITaskControllerTestCase(TaskTestBase):
         d.addErrback(lambda f: self.assertRaises(ZeroDivisionError, f.raiseException))
         return d
     
+    def test_chunked_map_task(self):
+        self.addEngine(1)
+        t1 = task.ChunkedMapTask(lambda x, y: x+y, [(1,2), (3,4)])
+        d = self.tc.run(t1)
+        d.addCallback(self.tc.get_task_result, block=True)
+        def check(r):
+            duration, results = r
+            self.assert_(duration >= 0)
+            self.assertEquals(results, [3,7])
+        d.addCallback(check)
+        return d
+    
     def test_map_task_args(self):
         self.assertRaises(TypeError, task.MapTask, 'asdfasdf')
         self.assertRaises(TypeError, task.MapTask, lambda x: x, 10)
@@ -0,0 +1,59 @@
+# encoding: utf-8
+
+"""This file contains unittests for the mapper.py module."""
+
+__docformat__ = "restructuredtext en"
+
+#-----------------------------------------------------------------------------
+#  Copyright (C) 2010  The IPython Development Team
+#
+#  Distributed under the terms of the BSD License.  The full license is in
+#  the file COPYING, distributed as part of this software.
+#-----------------------------------------------------------------------------
+
+#-----------------------------------------------------------------------------
+# Imports
+#-----------------------------------------------------------------------------
+
+# Tell nose to skip this module
+__test__ = {}
+
+from twisted.trial import unittest
+
+from IPython.kernel.mapper import ChunkSizer
+
+#-----------------------------------------------------------------------------
+# Tests
+#-----------------------------------------------------------------------------
+
+class ChunkSizerTest(unittest.TestCase):
+    
+    def testFirstChunks(self):
+        sizer = ChunkSizer(chunk_time=1.0, window=4)
+        self.assertEquals(sizer.next_size(1000), 1)
+        self.assertEquals(sizer.next_size(1000), 1)
+    
+    def testGrowth(self):
+        sizer = ChunkSizer(chunk_time=1.0, window=4)
+        sizer.record(1, 1/1024.0)
+        # At most doubling
+        self.assertEquals(sizer.next_size(1000), 2)
+        sizer.record(2, 2/1024.0)
+        self.assertEquals(sizer.next_size(1000), 4)
+        for size in (4, 8, 16, 32, 64, 128, 256, 512):
+            sizer.record(size, size/1024.0)
+        # The size that takes chunk_time
+        self.assertEquals(sizer.next_size(100000), 1024)
+    
+    def testSlowElements(self):
+        sizer = ChunkSizer(chunk_time=1.0, window=4)
+        sizer.record(1, 5.0)
+        self.assertEquals(sizer.next_size(1000), 1)
+    
+    def testShare(self):
+        sizer = ChunkSizer(chunk_time=1.0, window=4)
+        for size in (1, 2, 4, 8, 16):
+            sizer.record(size, 0.0)
+        # An even share of the remaining elements
+        self.assertEquals(sizer.next_size(10), 3)
+        self.assertEquals(sizer.next_size(1), 1)
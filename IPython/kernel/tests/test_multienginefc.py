@@ -31,6 +31,7 @@ from IPython.kernel.clientconnector import AsyncClientConnector
 from IPython.kernel.parallelfunction import ParallelFunction
 from IPython.kernel.error import CompositeError
 from IPython.kernel.util import printer
+from IPython.kernel import newserialized
 
 
 def _raise_it(f):
@@ -144,3 +145,62 @@ class FullSynchronousMultiEngineTestCase(
         d.addBoth(lambda f: self.assertRaises(ZeroDivisionError, _raise_it, f))
         return d
 
+    def test_push_pull_serialized_chunks(self):
+        self.addEngine(2)
+        obj = 'x'*10000
+        ns = dict(a=newserialized.serialize(obj))
+        d = self.multiengine.push_serialized(ns, chunk_size=1000)
+        d.addCallback(lambda _: self.multiengine.pull('a'))
+        d.addCallback(lambda r: self.assertEquals(r, [obj, obj]))
+        d.addCallback(lambda _: self.multiengine.pull_serialized('a',
+            targets=1, chunk_size=1000))
+        d.addCallback(lambda r: self.assertEquals(
+            [newserialized.unserialize(s) for s in r], [obj]))
+        return d
+
+    def test_push_serialized_chunks_fail(self):
+        self.addEngine(2)
+        # The third chunk fails on the second engine.
+        engine = self.engines[1]
+        push_chunk = engine.push_chunk
+        calls = []
+        def failing_push_chunk(transfer_id, chunk):
+            calls.append(chunk)
+            if len(calls) == 3:
+                return defer.fail(IOError('chunk lost'))
+            return push_chunk(transfer_id, chunk)
+        engine.push_chunk = failing_push_chunk
+        ns = dict(a=newserialized.serialize('x'*10000))
+        d = self.multiengine.push_serialized(ns, chunk_size=1000)
+        d.addCallbacks(lambda _: self.fail('the push should fail'),
+            lambda f: self.assertRaises(IOError, _raise_it, f))
+        # Neither engine keeps the chunks of the failed push.
+        d.addCallback(lambda _: self.assertEquals(
+            [e._transfers for e in self.engines], [{}, {}]))
+        return d
+
+    def test_push_serialized_chunks_noblock(self):
+        self.addEngine(1)
+        obj = range(10000)
+        ns = dict(a=newserialized.serialize(obj))
+        d = self.multiengine.push_serialized(ns, chunk_size=1000, block=False)
+        def check_progress(did):
+            done, total = self.multiengine.get_transfer_progress(did)
+            self.assert_(done <= total)
+            return self.multiengine.get_pending_deferred(did, True)
+        d.addCallback(check_progress)
+        d.addCallback(lambda _: self.multiengine.pull('a'))
+        d.addCallback(lambda r: self.assertEquals(r, [obj]))
+        return d
+
+    def test_push_broadcast(self):
+        self.addEngine(4)
+        # The chunks go to two engines at a time.
+        self.imultiengine.fanout = 2
+        self.multiengine.chunk_size = 1000
+        obj = range(10000)
+        d = self.multiengine.push(dict(a=obj), broadcast=True)
+        d.addCallback(lambda _: self.multiengine.pull('a'))
+        d.addCallback(lambda r: self.assertEquals(r, [obj]*4))
+        return d
+
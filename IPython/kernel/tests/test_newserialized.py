@@ -28,7 +28,11 @@ from IPython.kernel.newserialized import \
     Serialized, \
     UnSerialized, \
     SerializeIt, \
-    UnSerializeIt
+    UnSerializeIt, \
+    serialize, \
+    unserialize, \
+    pack_serialized, \
+    unpack_serialized
 
 
 #-----------------------------------------------------------------------------
@@ -98,5 +102,53 @@ class SerializedTestCase(unittest.TestCase):
             self.assert_(numpy.getbuffer(a) == numpy.getbuffer(final))
             self.assert_(a.dtype.str == final.dtype.str)
             self.assert_(a.shape == final.shape)
-        
-        
+
+    def testZeroLengthNDArraySerialized(self):
+        try:
+            import numpy
+        except ImportError:
+            pass
+        else:
+            a = numpy.zeros((0, 3), dtype='int32')
+            s = serialize(a)
+            self.assert_(s.getTypeDescriptor() == 'ndarray')
+            final = unserialize(s)
+            self.assert_(final.shape == (0, 3))
+            self.assert_(final.dtype.str == a.dtype.str)
+
+    def testPackSerialized(self):
+        obj = {'a':1.45345, 'b':'asdfsdf'}
+        ns = dict((k, serialize(v)) for k, v in obj.iteritems())
+        package = pack_serialized(ns)
+        self.assert_(len(package) == 3)
+        self.assert_(all(isinstance(p, str) for p in package))
+        final = unpack_serialized(package)
+        for k, v in final.iteritems():
+            self.assert_(unserialize(v) == obj[k])
+        final = unpack_serialized(pack_serialized([ns['a'], ns['b']]))
+        self.assert_([unserialize(s) for s in final] == [1.45345, 'asdfsdf'])
+        final = unpack_serialized(pack_serialized(ns['b']))
+        self.assert_(unserialize(final) == 'asdfsdf')
+
+    def testPackNDArraySerialized(self):
+        try:
+            import numpy
+        except ImportError:
+            pass
+        else:
+            a = numpy.arange(10000.0)
+            package = pack_serialized({'a':serialize(a)})
+            final = unserialize(unpack_serialized(package)['a'])
+            self.assert_((a == final).all())
+            self.assert_(final.flags.writeable)
+            final[0] = 1.0
+            self.assert_(a[0] == 0.0)
+            # The array received in chunks is writable, without being copied
+            # again.
+            data = package[1]
+            package[1] = [data[:1000], data[1000:]]
+            serial = unpack_serialized(package)['a']
+            final = unserialize(serial)
+            self.assert_((a == final).all())
+            self.assert_(final.flags.writeable)
+            self.assert_(final.base is serial.getData())
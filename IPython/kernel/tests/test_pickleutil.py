@@ -0,0 +1,88 @@
+# encoding: utf-8
+
+"""This file contains unittests for the pickleutil.py module."""
+
+__docformat__ = "restructuredtext en"
+
+#-----------------------------------------------------------------------------
+#  Copyright (C) 2010  The IPython Development Team
+#
+#  Distributed under the terms of the BSD License.  The full license is in
+#  the file COPYING, distributed as part of this software.
+#-----------------------------------------------------------------------------
+
+#-----------------------------------------------------------------------------
+# Imports
+#-----------------------------------------------------------------------------
+
+# Tell nose to skip this module
+__test__ = {}
+
+import cPickle as pickle
+
+from twisted.trial import unittest
+
+from IPython.kernel import pickleutil
+from IPython.kernel.error import MissingFunctionDigest
+from IPython.kernel.pickleutil import \
+    can, \
+    uncan, \
+    CannedFunction, \
+    FunctionCache, \
+    FunctionDigest, \
+    SentFunctions
+
+#-----------------------------------------------------------------------------
+# Tests
+#-----------------------------------------------------------------------------
+
+def double(x):
+    return 2*x
+
+def triple(x):
+    return 3*x
+
+class FunctionCacheTest(unittest.TestCase):
+    
+    def tearDown(self):
+        pickleutil.function_cache._codes.clear()
+    
+    def testFunctionCache(self):
+        cache = FunctionCache(size=2)
+        cache.add('a', 1)
+        cache.add('b', 2)
+        self.assertEquals(cache.get('a'), 1)
+        cache.add('c', 3)
+        # b was the least recently used
+        self.assert_('a' in cache)
+        self.assert_('b' not in cache)
+        self.assertEquals(len(cache), 2)
+        self.assertRaises(MissingFunctionDigest, cache.get, 'b')
+    
+    def testSentFunctions(self):
+        sent = SentFunctions()
+        first = sent.pack(can(double))
+        self.assert_(isinstance(first, CannedFunction))
+        self.assert_(not isinstance(first, FunctionDigest))
+        second = sent.pack(can(double))
+        self.assert_(isinstance(second, FunctionDigest))
+        self.assertEquals(second.digest, first.digest)
+        self.assert_(not isinstance(sent.pack(can(triple)), FunctionDigest))
+        self.assertEquals(sent.pack(10), 10)
+        sent.forget()
+        self.assert_(not isinstance(sent.pack(can(double)), FunctionDigest))
+    
+    def testDigestRoundTrip(self):
+        sent = SentFunctions()
+        full = pickle.dumps(sent.pack(can(double)), 2)
+        digest = pickle.dumps(sent.pack(can(double)), 2)
+        self.assert_(len(digest) < len(full))
+        uncan(pickle.loads(full))
+        f = uncan(pickle.loads(digest))
+        self.assertEquals(f(4), 8)
+    
+    def testMissingDigest(self):
+        sent = SentFunctions()
+        sent.pack(can(triple))
+        digest = pickle.dumps(sent.pack(can(triple)), 2)
+        self.assertRaises(MissingFunctionDigest, uncan, pickle.loads(digest))
@@ -24,6 +24,7 @@ from twisted.internet import defer, reactor
 from IPython.kernel.fcutil import Tub, UnauthenticatedTub
 
 from IPython.kernel import task as taskmodule
+from IPython.kernel import pickleutil
 from IPython.kernel import controllerservice as cs
 import IPython.kernel.multiengine as me
 from IPython.testing.util import DeferredTestCase
@@ -160,3 +161,43 @@ class TaskTest(DeferredTestCase, ITaskControllerTestCase):
         d.addBoth(lambda f: self.assertRaises(ZeroDivisionError, _raise_it, f))
         return d
 
+
+    def test_map_function_digest(self):
+        self.addEngine(1)
+        f = lambda x: 2*x
+        d = self.tc.map(f, range(10))
+        def evict(r):
+            # The function now goes by digest, so it must be sent again.
+            self.assertEquals(r,[2*x for x in range(10)])
+            self.assertEquals(len(self.tc.sent_functions._digests), 1)
+            pickleutil.function_cache._codes.clear()
+            return self.tc.map(f, range(10))
+        d.addCallback(evict)
+        d.addCallback(lambda r: self.assertEquals(r,[2*x for x in range(10)]))
+        return d
+
+    def test_map_chunked(self):
+        self.addEngine(2)
+        m = self.tc.mapper(chunked=True)
+        m.chunk_window = 3
+        d = m.map(lambda x, y: x*y, range(50), range(50))
+        d.addCallback(lambda r: self.assertEquals(r,[x*x for x in range(50)]))
+        d.addCallback(lambda _: m.map(lambda x: x, []))
+        d.addCallback(lambda r: self.assertEquals(r,[]))
+        return d
+
+    def test_map_chunked_fail(self):
+        self.addEngine(1)
+        m = self.tc.mapper(chunked=True)
+        d = m.map(lambda x: 1/x, range(10))
+        d.addBoth(lambda f: self.assertRaises(ZeroDivisionError, _raise_it, f))
+        return d
+
+    def test_parallel_chunked(self):
+        self.addEngine(1)
+        p = self.tc.parallel(chunked=True)
+        @p
+        def f(x): return 2*x
+        d = f(range(10))
+        d.addCallback(lambda r: self.assertEquals(r,[2*x for x in range(10)]))
+        return d
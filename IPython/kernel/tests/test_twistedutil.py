@@ -18,11 +18,11 @@ __test__ = {}
 import tempfile
 import os, sys
 
-from twisted.internet import reactor
+from twisted.internet import defer, reactor
 from twisted.trial import unittest
 
 from IPython.kernel.error import FileTimeoutError
-from IPython.kernel.twistedutil import wait_for_file
+from IPython.kernel.twistedutil import wait_for_file, windowed_calls
 
 #-----------------------------------------------------------------------------
 # Tests
@@ -48,4 +48,31 @@ class TestWaitForFile(unittest.TestCase):
         d = wait_for_file(filename,delay=0.1,max_tries=1)
         d.addErrback(lambda f: self.assertRaises(FileTimeoutError,f.raiseException))
         return d
-        
\ No newline at end of file
+
+
+class TestWindowedCalls(unittest.TestCase):
+
+    def test_window(self):
+        pending = []
+        def make_call(i):
+            def call():
+                d = defer.Deferred()
+                pending.append((d, i))
+                return d
+            return call
+        d = windowed_calls([make_call(i) for i in range(5)], 2)
+        # Only two calls are made until one of them fires.
+        self.assertEquals(len(pending), 2)
+        while pending:
+            call_d, i = pending.pop(0)
+            call_d.callback(i*i)
+        d.addCallback(lambda r: self.assertEquals(r, [0, 1, 4, 9, 16]))
+        return d
+
+    def test_failure(self):
+        calls = [lambda: defer.succeed(1), lambda: defer.fail(ValueError()),
+                 lambda: self.fail("called after a failure")]
+        d = windowed_calls(calls, 1)
+        d.addErrback(lambda f: self.assertRaises(ValueError, f.raiseException))
+        return d
+
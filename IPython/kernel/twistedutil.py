@@ -272,3 +272,51 @@ def make_deferred(func):
     return _wrapper
 
 
+
+
+def windowed_calls(calls, window):
+    """Make the calls, keeping at most window of them pending at once.
+
+    Each call is a function without arguments that returns a deferred.  A
+    call is only made once one of the pending ones has fired, which bounds
+    the data in flight when each call sends or receives a chunk of it.
+
+    Returns a deferred to the list of the results, in the order of the calls,
+    which errbacks with the first failure.  No call is made after a failure.
+    """
+    calls = list(calls)
+    results = [None]*len(calls)
+    finished = defer.Deferred()
+    state = dict(next=0, pending=0, failed=False, starting=False)
+
+    def start():
+        # Calls whose deferred has already fired come back here through
+        # succeeded, so the loop below is guarded against reentrance.
+        if state['starting']:
+            return
+        state['starting'] = True
+        while state['next'] < len(calls) and state['pending'] < window \
+            and not state['failed']:
+            i = state['next']
+            state['next'] += 1
+            state['pending'] += 1
+            d = defer.maybeDeferred(calls[i])
+            d.addCallbacks(succeeded, failed, callbackArgs=(i,))
+        state['starting'] = False
+        if state['next'] == len(calls) and state['pending'] == 0 \
+            and not state['failed']:
+            finished.callback(results)
+
+    def succeeded(result, i):
+        results[i] = result
+        state['pending'] -= 1
+        start()
+
+    def failed(f):
+        state['pending'] -= 1
+        if not state['failed']:
+            state['failed'] = True
+            finished.errback(f)
+
+    start()
+    return finished
@@ -104,3 +104,114 @@ def chop(seq, size):
     return map(chunk,xrange(0,len(seq),size))
 
 
+
+
+class _OrderedDict(dict):
+    """A dict that remembers the order in which its keys were inserted.
+
+    This is the part of `collections.OrderedDict` that IPython uses, for
+    Python 2.6 which doesn't have it.  Use `OrderedDict`, which is the one
+    of the standard library when there is one.
+    """
+
+    def __init__(self, items=()):
+        dict.__init__(self)
+        # A circular doubly linked list of [prev, next, key] links, with
+        # _root as its sentinel, and the link of each key in _map.
+        self._root = root = []
+        root[:] = [root, root, None]
+        self._map = {}
+        self.update(items)
+
+    def __setitem__(self, key, value):
+        if key not in self:
+            root = self._root
+            last = root[0]
+            last[1] = root[0] = self._map[key] = [last, root, key]
+        dict.__setitem__(self, key, value)
+
+    def __delitem__(self, key):
+        dict.__delitem__(self, key)
+        prev, next, key = self._map.pop(key)
+        prev[1] = next
+        next[0] = prev
+
+    def __iter__(self):
+        root = self._root
+        link = root[1]
+        while link is not root:
+            yield link[2]
+            link = link[1]
+
+    def __reversed__(self):
+        root = self._root
+        link = root[0]
+        while link is not root:
+            yield link[2]
+            link = link[0]
+
+    def __repr__(self):
+        return '%s(%r)' % (self.__class__.__name__, self.items())
+
+    def clear(self):
+        dict.clear(self)
+        root = self._root
+        root[:] = [root, root, None]
+        self._map.clear()
+
+    def update(self, items=()):
+        if hasattr(items, 'keys'):
+            items = [(k, items[k]) for k in items.keys()]
+        for key, value in items:
+            self[key] = value
+
+    def setdefault(self, key, default=None):
+        if key not in self:
+            self[key] = default
+        return self[key]
+
+    def pop(self, key, *default):
+        if key in self:
+            value = self[key]
+            del self[key]
+            return value
+        if default:
+            return default[0]
+        raise KeyError(key)
+
+    def popitem(self, last=True):
+        """Remove and return the last (key, value) pair, or the first if not
+        last."""
+        if not self:
+            raise KeyError('dictionary is empty')
+        if last:
+            key = next(reversed(self))
+        else:
+            key = next(iter(self))
+        return key, self.pop(key)
+
+    def iterkeys(self):
+        return iter(self)
+
+    def itervalues(self):
+        for key in self:
+            yield self[key]
+
+    def iteritems(self):
+        for key in self:
+            yield key, self[key]
+
+    def keys(self):
+        return list(self)
+
+    def values(self):
+        return list(self.itervalues())
+
+    def items(self):
+        return list(self.iteritems())
+
+
+try:
+    from collections import OrderedDict
+except ImportError:
+    OrderedDict = _OrderedDict
@@ -13,6 +13,12 @@
 # Imports
 #-----------------------------------------------------------------------------
 
+import inspect
+import types
+import weakref
+
+from IPython.utils.data import OrderedDict
+
 #-----------------------------------------------------------------------------
 # Code
 #-----------------------------------------------------------------------------
@@ -80,3 +86,85 @@ def dir2(obj):
     # and poor coding in third-party modules
     return [w for w in words if isinstance(w, basestring)]
 
+
+
+# The sorted members of classes, with the stamp they were computed for.
+_class_cache = weakref.WeakKeyDictionary()
+
+# Modules can't be weakly referenced, so the most recently used ones are
+# kept with their sorted attributes.
+_module_cache = OrderedDict()
+_module_cache_size = 64
+
+
+def _class_stamp(cls):
+    """Return a value that changes when attributes are added to or removed
+    from cls or its bases, in most cases."""
+    return tuple([(id(c), len(c.__dict__)) for c in inspect.getmro(cls)])
+
+
+def _class_names(cls):
+    """Return the sorted, unique members of a class, see get_class_members."""
+    try:
+        stamp = _class_stamp(cls)
+        stamp_, names = _class_cache[cls]
+        if stamp_ == stamp:
+            return names
+    except KeyError:
+        pass
+    except TypeError:
+        # Not weakly referenceable, or without a proper __dict__.
+        return sorted(set(w for w in get_class_members(cls)
+                          if isinstance(w, basestring)))
+    names = sorted(set(w for w in get_class_members(cls)
+                       if isinstance(w, basestring)))
+    _class_cache[cls] = stamp, names
+    return names
+
+
+def _module_names(module):
+    """Return the sorted result of dir2 for a module."""
+    key = id(module)
+    stamp = len(module.__dict__)
+    item = _module_cache.pop(key, None)
+    if item is not None and item[0] is module and item[1] == stamp:
+        names = item[2]
+    else:
+        names = sorted(set(dir2(module)))
+    _module_cache[key] = module, stamp, names
+    while len(_module_cache) > _module_cache_size:
+        _module_cache.popitem(last=False)
+    return names
+
+
+def cached_dir2(obj):
+    """Return the names of dir2(obj), sorted and without duplicates.
+
+    The members of classes and the attributes of modules are cached until
+    attributes are added to or removed from them (or from a base class).
+    For instances, only the names in their __dict__ are looked up each time.
+    Objects with a custom __dir__, Traits and PyCrust-style objects are not
+    cached.
+
+    The returned list must not be modified.
+    """
+    cls = getattr(obj, '__class__', None)
+    if (cls is None or hasattr(cls, '__dir__') or
+        hasattr(obj, 'trait_names') or hasattr(obj, '_getAttributeNames')):
+        return sorted(set(dir2(obj)))
+    if isinstance(obj, types.ModuleType):
+        return _module_names(obj)
+    if isinstance(obj, (type, types.ClassType)):
+        names = set(_class_names(obj))
+    else:
+        names = set(_class_names(cls))
+        try:
+            names.update(k for k in obj.__dict__ if isinstance(k, basestring))
+        except (AttributeError, TypeError):
+            pass
+        if hasattr(obj, '__members__') or hasattr(obj, '__methods__'):
+            # Old style extension types, dir() knows about these.
+            return sorted(set(dir2(obj)))
+    names.update(_class_names(cls))
+    names.add('__class__')
+    return sorted(names)
@@ -0,0 +1,47 @@
+"""Tests for IPython.utils.data"""
+
+#-----------------------------------------------------------------------------
+#  Copyright (C) 2010 The IPython Development Team
+#
+#  Distributed under the terms of the BSD License.  The full license is in
+#  the file COPYING, distributed as part of this software.
+#-----------------------------------------------------------------------------
+
+#-----------------------------------------------------------------------------
+# Imports
+#-----------------------------------------------------------------------------
+
+import nose.tools as nt
+
+from IPython.utils.data import _OrderedDict
+
+#-----------------------------------------------------------------------------
+# Tests
+#-----------------------------------------------------------------------------
+
+def test_ordered_dict_order():
+    d = _OrderedDict([('b', 1), ('a', 2)])
+    d['c'] = 3
+    nt.assert_equal(d.keys(), ['b', 'a', 'c'])
+    # Setting an existing key keeps its place.
+    d['b'] = 4
+    nt.assert_equal(d.items(), [('b', 4), ('a', 2), ('c', 3)])
+    # Moving a key to the end, as for a least recently used order.
+    d['a'] = d.pop('a')
+    nt.assert_equal(list(d), ['b', 'c', 'a'])
+    nt.assert_equal(next(d.iteritems()), ('b', 4))
+
+
+def test_ordered_dict_popitem():
+    d = _OrderedDict([(i, str(i)) for i in range(4)])
+    nt.assert_equal(d.popitem(last=False), (0, '0'))
+    nt.assert_equal(d.popitem(), (3, '3'))
+    nt.assert_equal(len(d), 2)
+    del d[1]
+    nt.assert_equal(d.items(), [(2, '2')])
+    nt.assert_equal(d.pop(5, None), None)
+    nt.assert_raises(KeyError, d.pop, 5)
+    d.clear()
+    nt.assert_raises(KeyError, d.popitem)
+    d['x'] = 1
+    nt.assert_equal(d.keys(), ['x'])
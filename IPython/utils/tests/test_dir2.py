@@ -0,0 +1,66 @@
+"""Tests for the dir2 utilities."""
+
+#-----------------------------------------------------------------------------
+#  Copyright (C) 2010  The IPython Development Team
+#
+#  Distributed under the terms of the BSD License.  The full license is in
+#  the file COPYING, distributed as part of this software.
+#-----------------------------------------------------------------------------
+
+#-----------------------------------------------------------------------------
+# Imports
+#-----------------------------------------------------------------------------
+
+import types
+
+import nose.tools as nt
+
+from IPython.utils.dir2 import dir2, cached_dir2
+
+#-----------------------------------------------------------------------------
+# Tests
+#-----------------------------------------------------------------------------
+
+class Base(object):
+    a = 1
+
+class Derived(Base):
+    def method(self):
+        pass
+
+class Old:
+    x = 1
+
+class WithDir(object):
+    def __dir__(self):
+        return ['only']
+
+
+def test_cached_dir2_same_names():
+    inst = Derived()
+    inst.attr = 1
+    old = Old()
+    old.y = 2
+    for obj in [Base, Derived, inst, Old, old, types, 5, 'abc', None]:
+        names = cached_dir2(obj)
+        nt.assert_equals(set(names), set(dir2(obj)))
+        nt.assert_equals(names, sorted(names))
+
+
+def test_cached_dir2_invalidation():
+    inst = Derived()
+    nt.assert_false('added' in cached_dir2(inst))
+    Base.added = 1
+    try:
+        nt.assert_true('added' in cached_dir2(inst))
+    finally:
+        del Base.added
+    nt.assert_false('added' in cached_dir2(inst))
+    mod = types.ModuleType('mod')
+    nt.assert_false('added' in cached_dir2(mod))
+    mod.added = 1
+    nt.assert_true('added' in cached_dir2(mod))
+
+
+def test_cached_dir2_custom_dir():
+    nt.assert_true('only' in cached_dir2(WithDir()))
@@ -5,10 +5,19 @@
 from __future__ import print_function
 
 import itertools
-import readline
 import rlcompleter
+import sys
+import threading
 import time
 
+try:
+    import readline
+except ImportError:
+    # The kernel only needs BudgetedCall, readline is used by the frontend.
+    readline = None
+
+import zmq
+
 import session
 
 class KernelCompleter(object):
@@ -29,6 +38,49 @@ class KernelCompleter(object):
         return matches
     
 
+class BudgetedCall(object):
+    """Run a function in a daemon thread, waiting for it at most a time budget.
+
+    The function is called with the BudgetedCall itself, and should collect
+    its results in ``call.results`` as it goes and check ``call.cancelled``
+    between steps.  When the caller stops waiting, it cancels the call and
+    uses the results collected so far; the function keeps running until its
+    next check, but nobody waits for it anymore.
+    """
+
+    def __init__(self, func):
+        self.func = func
+        self.results = []
+        self.value = None
+        self.error = None
+        self.cancelled = threading.Event()
+        self.finished = threading.Event()
+        self._thread = threading.Thread(target=self._run)
+        self._thread.daemon = True
+
+    def _run(self):
+        try:
+            self.value = self.func(self)
+        except:
+            self.error = sys.exc_info()
+        self.finished.set()
+
+    def start(self):
+        """Start the call and return it."""
+        self._thread.start()
+        return self
+
+    def wait(self, timeout=None):
+        """Wait up to timeout seconds for the call to finish, and return
+        whether it did."""
+        self.finished.wait(timeout)
+        return self.finished.is_set()
+
+    def cancel(self):
+        """Ask the function to stop at its next check."""
+        self.cancelled.set()
+
+
 class ClientCompleter(object):
     """Client-side completion machinery.
 
@@ -36,6 +88,11 @@ class ClientCompleter(object):
     state=0,1,2,... When state=0 it should compute ALL the completion matches,
     and then return them for each value of state."""
     
+    # The time budget given to the kernel for each completion, in seconds,
+    # and how much longer we wait for its reply to arrive.
+    timeout = 0.5
+    reply_margin = 0.5
+
     def __init__(self, client, session, socket):
          # ugly, but we get called asynchronously and need access to some
          # client state, like backgrounded code
@@ -50,20 +107,27 @@ class ClientCompleter(object):
         # send completion request to kernel
         msg = self.session.send(self.socket,
                                 'complete_request',
-                                dict(text=text, line=line))
+                                dict(text=text, line=line,
+                                     timeout=self.timeout))
+        msg_id = msg.header.msg_id
 
-        # Give the kernel up to 0.5s to respond
-        for i in range(5):
+        # The kernel replies with the matches it found within the budget, so
+        # we only need to allow for the round trip on top of it.  Replies to
+        # earlier requests which came in too late are dropped.
+        poller = zmq.Poller()
+        poller.register(self.socket, zmq.POLLIN)
+        deadline = time.time() + self.timeout + self.reply_margin
+        while True:
+            remaining = deadline - time.time()
+            if remaining <= 0:
+                print ('TIMEOUT')  # Can't see this message...
+                return None
+            if not poller.poll(1000*remaining):
+                continue
             rep = self.session.recv(self.socket)
-            if rep is not None and rep.msg_type == 'complete_reply':
-                matches = rep.content.matches
-                break
-            time.sleep(0.1)
-        else:
-            # timeout
-            print ('TIMEOUT')  # Can't see this message...
-            matches = None
-        return matches
+            if rep is not None and rep.msg_type == 'complete_reply' and \
+                    rep.parent_header.msg_id == msg_id:
+                return rep.content.matches
     
     def complete(self, text, state):
         
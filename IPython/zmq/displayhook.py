@@ -16,7 +16,7 @@ class DisplayHook(object):
         __builtin__._ = obj
         msg = self.session.msg(u'pyout', {u'data':repr(obj)},
                                parent=self.parent_header)
-        self.pub_socket.send_json(msg)
+        self.session.send(self.pub_socket, msg)
 
     def set_parent(self, parent):
         self.parent_header = extract_header(parent)
\ No newline at end of file
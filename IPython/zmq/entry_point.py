@@ -21,7 +21,8 @@ from displayhook import DisplayHook
 from heartbeat import Heartbeat
 from iostream import OutStream
 from parentpoller import ParentPollerUnix, ParentPollerWindows
-from session import Session
+from session import Session, packers
+import tracing
 
 def bind_port(socket, ip, port):
     """ Binds the specified ZMQ socket. If the port is zero, a random port is
@@ -51,6 +52,21 @@ def make_argument_parser():
                         help='set the REQ channel port [default: random]')
     parser.add_argument('--hb', type=int, metavar='PORT', default=0,
                         help='set the heartbeat port [default: random]')
+    parser.add_argument('--packer', type=str, default='json',
+                        choices=sorted(packers.keys()),
+                        help='set the message serialization [default: json]')
+    parser.add_argument('--trace', type=str, metavar='LEVEL',
+                        choices=sorted(tracing.levels.keys()),
+                        help='log the messages handled by the kernel at this '
+                        'level: warning logs the slow requests, info one line '
+                        'per message, debug the full messages [default: no '
+                        'tracing]')
+    parser.add_argument('--trace-sample', type=float, metavar='FRACTION',
+                        default=1.0, help='only trace this fraction of the '
+                        'messages [default: 1.0]')
+    parser.add_argument('--trace-history', type=int, metavar='N', default=0,
+                        help='keep the last N messages in memory '
+                        '[default: 0]')
 
     if sys.platform == 'win32':
         parser.add_argument('--interrupt', type=int, metavar='HANDLE', 
@@ -83,12 +99,15 @@ def make_kernel(namespace, kernel_factory,
     sys.excepthook = FormattedTB(mode='Verbose', color_scheme='NoColor', 
                                  ostream=sys.__stdout__)
 
+    tracing.tracer.configure(namespace.trace, namespace.trace_sample,
+                             namespace.trace_history)
+
     # Create a context, a session, and the kernel sockets.
     io.raw_print("Starting the kernel at pid:", os.getpid())
     context = zmq.Context()
     # Uncomment this to try closing the context.
     # atexit.register(context.close)
-    session = Session(username=u'kernel')
+    session = Session(username=u'kernel', packer=namespace.packer)
 
     reply_socket = context.socket(zmq.XREP)
     xrep_port = bind_port(reply_socket, namespace.ip, namespace.xrep)
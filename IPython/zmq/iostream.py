@@ -1,49 +1,91 @@
 import sys
+import threading
 import time
 from cStringIO import StringIO
 
 from session import extract_header, Message
-
-from IPython.utils import io
+from tracing import tracer
 
 #-----------------------------------------------------------------------------
 # Stream classes
 #-----------------------------------------------------------------------------
 
 class OutStream(object):
-    """A file like object that publishes the stream to a 0MQ PUB socket."""
+    """A file like object that publishes the stream to a 0MQ PUB socket.
+
+    Writes are coalesced into as few messages as possible: the buffer is
+    published as soon as it holds flush_size bytes, or once its oldest data is
+    flush_interval seconds old.  A background thread takes care of the latter,
+    so output written right before a long computation doesn't sit in the
+    buffer until the next write or request.
+
+    To protect the frontends from cells that flood their output, a
+    rate_limit can be set: writes beyond a sustained rate of rate_limit bytes
+    per second are then dropped, and a note with the number of dropped bytes
+    is published in their place.
+    """
 
-    # The time interval between automatic flushes, in seconds.
+    # The maximum time output waits in the buffer, in seconds.
     flush_interval = 0.05
 
+    # The buffer size that triggers an immediate flush, in bytes.
+    flush_size = 1 << 16
+
+    # The sustained output rate above which writes are dropped, in bytes per
+    # second.  Bursts of up to this many bytes, or a single write of any size
+    # after a quiet second, are always accepted.  None disables the limit.
+    rate_limit = None
+
     def __init__(self, session, pub_socket, name):
         self.session = session
         self.pub_socket = pub_socket
         self.name = name
         self.parent_header = {}
+        self._lock = threading.RLock()
+        self._allowance = None
+        self._last_write = time.time()
+        self._dropped = 0
         self._new_buffer()
+        self._wakeup = threading.Event()
+        self._flusher = threading.Thread(target=self._flush_loop)
+        self._flusher.daemon = True
+        self._flusher.start()
 
     def set_parent(self, parent):
         self.parent_header = extract_header(parent)
 
     def close(self):
-        self.pub_socket = None
+        """Publish the pending output and close the stream."""
+        with self._lock:
+            if self.pub_socket is not None:
+                self.flush()
+                self.pub_socket = None
+        self._wakeup.set()
 
     def flush(self):
         #io.rprint('>>>flushing output buffer: %s<<<' % self.name)  # dbg
-        if self.pub_socket is None:
-            raise ValueError(u'I/O operation on closed file')
-        else:
-            data = self._buffer.getvalue()
-            if data:
-                content = {u'name':self.name, u'data':data}
-                msg = self.session.msg(u'stream', content=content,
-                                       parent=self.parent_header)
-                io.raw_print(msg)
-                self.pub_socket.send_json(msg)
-                
-                self._buffer.close()
-                self._new_buffer()
+        # The socket is checked under the lock, so that the background
+        # flusher can't send on it once close has cleared it.
+        with self._lock:
+            if self.pub_socket is None:
+                raise ValueError(u'I/O operation on closed file')
+            else:
+                data = self._buffer.getvalue()
+                if self._dropped:
+                    data += ('\n[%i bytes of output dropped, over the rate '
+                             'limit of %i bytes/s]\n' % (self._dropped,
+                                                         self.rate_limit))
+                    self._dropped = 0
+                if data:
+                    content = {u'name':self.name, u'data':data}
+                    msg = self.session.msg(u'stream', content=content,
+                                           parent=self.parent_header)
+                    if tracer.enabled:
+                        tracer.trace('send', msg)
+                    self.session.send(self.pub_socket, msg)
+                    
+                    self._buffer.close()
+                    self._new_buffer()
 
     def isatty(self):
         return False
@@ -65,12 +107,19 @@ class OutStream(object):
             # into utf-8 for all frontends if we get unicode inputs.
             if type(string) == unicode:
                 string = string.encode('utf-8')
-                
-            self._buffer.write(string)
-            current_time = time.time()
-            if self._start <= 0:
-                self._start = current_time
-            elif current_time - self._start > self.flush_interval:
+
+            with self._lock:
+                if self.rate_limit is None or \
+                       self._within_rate_limit(len(string)):
+                    self._buffer.write(string)
+                else:
+                    self._dropped += len(string)
+                if self._start < 0:
+                    # The buffer was empty, start the clock for the flusher.
+                    self._start = time.time()
+                    self._wakeup.set()
+                size = self._buffer.tell()
+            if size >= self.flush_size:
                 self.flush()
 
     def writelines(self, sequence):
@@ -83,3 +132,50 @@ class OutStream(object):
     def _new_buffer(self):
         self._buffer = StringIO()
         self._start = -1
+
+    def _within_rate_limit(self, size):
+        """Spend size bytes of the output allowance, if there are enough.
+
+        The allowance is refilled continuously at rate_limit bytes per second,
+        up to rate_limit bytes.  When it is full, any write is accepted, and
+        the allowance goes negative for the excess.
+        """
+        now = time.time()
+        rate = self.rate_limit
+        if self._allowance is None:
+            self._allowance = rate
+        else:
+            self._allowance = min(rate,
+                                  self._allowance + (now-self._last_write)*rate)
+        self._last_write = now
+        if size > self._allowance and self._allowance < rate:
+            return False
+        self._allowance -= size
+        return True
+
+    def _flush_loop(self):
+        """Flush the buffer once its data is flush_interval seconds old.
+
+        This runs in the background thread, which sleeps while the buffer is
+        empty.
+        """
+        while True:
+            self._wakeup.wait()
+            self._wakeup.clear()
+            while True:
+                if self.pub_socket is None:
+                    return
+                start = self._start
+                if start < 0:
+                    # Already flushed by a write or by the kernel.
+                    break
+                delay = start + self.flush_interval - time.time()
+                if delay > 0:
+                    time.sleep(delay)
+                    continue
+                try:
+                    self.flush()
+                except ValueError:
+                    # Closed in the meantime.
+                    return
+                break
@@ -18,23 +18,29 @@ from __future__ import print_function
 # Standard library imports.
 import __builtin__
 import atexit
+import errno
 import sys
 import time
 import traceback
+from collections import deque
 
 # System library imports.
 import zmq
 
 # Local imports.
 from IPython.config.configurable import Configurable
+from IPython.core import oinspect
+from IPython.core.completer import limit_matches
 from IPython.utils import io
 from IPython.utils.jsonutil import json_clean
 from IPython.lib import pylabtools
 from IPython.utils.traitlets import Instance, Float
+from completer import BudgetedCall
 from entry_point import (base_launch_kernel, make_argument_parser, make_kernel,
                          start_kernel)
 from iostream import OutStream
 from session import Session, Message
+from tracing import tracer
 from zmqshell import ZMQInteractiveShell
 
 #-----------------------------------------------------------------------------
@@ -64,17 +70,34 @@ class Kernel(Configurable):
     # a little if it's not enough after more interactive testing.
     _execute_sleep = Float(0.0005, config=True)
 
-    # Frequency of the kernel's event loop.
+    # Frequency of the kernel's event loop.  The plain kernel blocks on its
+    # reply socket and only uses this as the idle wake-up interval, GUI
+    # kernels drive do_one_iteration from a timer firing at this rate.
     # Units are in seconds, kernel subclasses for GUI toolkits may need to
     # adapt to milliseconds.
     _poll_interval = Float(0.05, config=True)
 
+    # Time budget of completion and object info requests, which may ask for
+    # another one in their 'timeout' field.  They are computed in a worker
+    # thread, and when the budget expires the kernel replies with what was
+    # found so far, so that a slow attribute lookup can't block the kernel.
+    # Units are in seconds.
+    _request_budget = Float(0.5, config=True)
+
+    # Requests received from the reply socket while waiting on a budgeted
+    # request, to be handled before reading the socket again.
+    _queued = None
+
+    # The BudgetedCall of a timed out request, if it is still running.
+    _abandoned = None
+
     # If the shutdown was requested over the network, we leave here the
     # necessary reply message so it can be sent by our registered atexit
     # handler.  This ensures that the reply is only sent to clients truly at
     # the end of our shutdown process (which happens after the underlying
     # IPython shell's own shutdown).
     _shutdown_message = None
+    _shutdown_ident = None
 
     # This is a dict of port number that the kernel is listening on. It is set
     # by record_ports and used by connect_request.
@@ -103,50 +126,42 @@ class Kernel(Configurable):
         for msg_type in msg_types:
             self.handlers[msg_type] = getattr(self, msg_type)
 
+        # A newer request of one of these types supersedes the older ones
+        # from the same session, which are then aborted.
+        self.budgeted_types = set(['complete_request', 'object_info_request'])
+        self._queued = deque()
+
     def do_one_iteration(self):
         """Do one iteration of the kernel's evaluation loop.
-        """
-        try:
-            ident = self.reply_socket.recv(zmq.NOBLOCK)
-        except zmq.ZMQError, e:
-            if e.errno == zmq.EAGAIN:
-                return
-            else:
-                raise
-        # This assert will raise in versions of zeromq 2.0.7 and lesser.
-        # We now require 2.0.8 or above, so we can uncomment for safety.
-        assert self.reply_socket.rcvmore(), "Missing message part."
-        msg = self.reply_socket.recv_json()
-        
-        # Print some info about this message and leave a '--->' marker, so it's
-        # easier to trace visually the message chain when debugging.  Each
-        # handler prints its message at the end.
-        # Eventually we'll move these from stdout to a logger.
-        io.raw_print('\n*** MESSAGE TYPE:', msg['msg_type'], '***')
-        io.raw_print('   Content: ', msg['content'],
-                     '\n   --->\n   ', sep='', end='')
-
-        # Find and call actual handler for message
-        handler = self.handlers.get(msg['msg_type'], None)
-        if handler is None:
-            io.raw_print_err("UNKNOWN MESSAGE TYPE:", msg)
-        else:
-            handler(ident, msg)
-            
-        # Check whether we should exit, in case the incoming message set the
-        # exit flag on
-        if self.shell.exit_now:
-            io.raw_print('\nExiting IPython kernel...')
-            # We do a normal, clean exit, which allows any actions registered
-            # via atexit (such as history saving) to take place.
-            sys.exit(0)
 
+        All requests already queued on the reply socket are handled before
+        returning, so GUI kernels driving this method from a timer don't fall
+        one request behind per timer tick.
+        """
+        while self._handle_one_request():
+            pass
 
     def start(self):
         """ Start the kernel main loop.
+
+        Rather than sleeping between non-blocking reads, we block in a zmq
+        poller until a request arrives, so requests are dispatched as soon as
+        they come in.  The poll timeout only bounds how long we stay in zmq
+        while idle, so that interrupts are still noticed promptly.
         """
+        poller = zmq.Poller()
+        poller.register(self.reply_socket, zmq.POLLIN)
+        # Units for the poller are in milliseconds
+        timeout = int(1000*self._poll_interval)
         while True:
-            time.sleep(self._poll_interval)
+            try:
+                poller.poll(timeout)
+            except zmq.ZMQError, e:
+                # A signal (e.g. an interrupt from the frontend) may arrive
+                # while we're blocked in the poller.
+                if e.errno == errno.EINTR:
+                    continue
+                raise
             self.do_one_iteration()
 
     def record_ports(self, xrep_port, pub_port, req_port, hb_port):
@@ -170,7 +185,7 @@ class Kernel(Configurable):
         """Publish the code request on the pyin stream."""
 
         pyin_msg = self.session.msg(u'pyin',{u'code':code}, parent=parent)
-        self.pub_socket.send_json(pyin_msg)
+        self.session.send(self.pub_socket, pyin_msg)
 
     def execute_request(self, ident, parent):
         
@@ -179,7 +194,7 @@ class Kernel(Configurable):
             {u'execution_state':u'busy'},
             parent=parent
         )
-        self.pub_socket.send_json(status_msg)
+        self.session.send(self.pub_socket, status_msg)
         
         try:
             content = parent[u'content']
@@ -265,7 +280,8 @@ class Kernel(Configurable):
 
         # Send the reply.
         reply_msg = self.session.msg(u'execute_reply', reply_content, parent)
-        io.raw_print(reply_msg)
+        if tracer.enabled:
+            tracer.trace('send', reply_msg)
 
         # Flush output before sending the reply.
         sys.stdout.flush()
@@ -276,8 +292,7 @@ class Kernel(Configurable):
         if self._execute_sleep:
             time.sleep(self._execute_sleep)
         
-        self.reply_socket.send(ident, zmq.SNDMORE)
-        self.reply_socket.send_json(reply_msg)
+        self.session.send(self.reply_socket, reply_msg, ident=ident)
         if reply_msg['content']['status'] == u'error':
             self._abort_queue()
 
@@ -286,34 +301,69 @@ class Kernel(Configurable):
             {u'execution_state':u'idle'},
             parent=parent
         )
-        self.pub_socket.send_json(status_msg)
+        self.session.send(self.pub_socket, status_msg)
 
     def complete_request(self, ident, parent):
-        txt, matches = self._complete(parent)
+        text, line, cpos = self._complete_args(parent)
+        def complete(call):
+            return self.shell.complete(text, line, cpos, call.results,
+                                       call.cancelled)
+        call = self._run_budgeted(ident, parent, complete)
+        if call is None:
+            return
+        if call.finished.is_set():
+            txt, matches = self._budgeted_value(call, (text, []))
+            timed_out = False
+        else:
+            # The matchers that returned in time have filled call.results.
+            txt = text
+            matches = limit_matches(sorted(set(call.results)),
+                                    self.shell.Completer.limit)
+            timed_out = True
         matches = {'matches' : matches,
                    'matched_text' : txt,
+                   'timed_out' : timed_out,
                    'status' : 'ok'}
         completion_msg = self.session.send(self.reply_socket, 'complete_reply',
                                            matches, parent, ident)
-        io.raw_print(completion_msg)
+        if tracer.enabled:
+            tracer.trace('send', completion_msg)
 
     def object_info_request(self, ident, parent):
-        object_info = self.shell.object_inspect(parent['content']['oname'])
+        oname = parent['content']['oname']
+        call = self._run_budgeted(ident, parent,
+                                  lambda call: self.shell.object_inspect(oname))
+        if call is None:
+            return
+        not_found = oinspect.object_info(name=oname, found=False)
+        if call.finished.is_set():
+            object_info = self._budgeted_value(call, not_found)
+            object_info['timed_out'] = False
+        else:
+            object_info = not_found
+            object_info['timed_out'] = True
         # Before we send this object over, we scrub it for JSON usage
         oinfo = json_clean(object_info)
         msg = self.session.send(self.reply_socket, 'object_info_reply',
                                 oinfo, parent, ident)
-        io.raw_print(msg)
+        if tracer.enabled:
+            tracer.trace('send', msg)
 
     def history_request(self, ident, parent):
         output = parent['content']['output']
         index = parent['content']['index']
         raw = parent['content']['raw']
-        hist = self.shell.get_history(index=index, raw=raw, output=output)
+        session = parent['content'].get('session')
+        # Ranges arrive as lists once serialized.
+        if isinstance(index, list):
+            index = tuple(index)
+        hist = self.shell.get_history(index=index, raw=raw, output=output,
+                                      session=session)
         content = {'history' : hist}
         msg = self.session.send(self.reply_socket, 'history_reply',
                                 content, parent, ident)
-        io.raw_print(msg)
+        if tracer.enabled:
+            tracer.trace('send', msg)
 
     def connect_request(self, ident, parent):
         if self._recorded_ports is not None:
@@ -322,39 +372,178 @@ class Kernel(Configurable):
             content = {}
         msg = self.session.send(self.reply_socket, 'connect_reply',
                                 content, parent, ident)
-        io.raw_print(msg)
+        if tracer.enabled:
+            tracer.trace('send', msg)
 
     def shutdown_request(self, ident, parent):
         self.shell.exit_now = True
         self._shutdown_message = self.session.msg(u'shutdown_reply', parent['content'], parent)
+        self._shutdown_ident = ident
         sys.exit(0)
 
     #---------------------------------------------------------------------------
     # Protected interface
     #---------------------------------------------------------------------------
 
+    def _handle_one_request(self):
+        """Receive and dispatch a single request, if one is waiting.
+
+        Requests already received while waiting on a budgeted request are
+        handled first.  Returns True if a request was handled, False if
+        nothing was queued.
+        """
+        if self._queued:
+            ident, msg = self._queued.popleft()
+        else:
+            ident, msg = self.session.recv_multipart(self.reply_socket)
+        if msg is None:
+            return False
+
+        # The tracer reports each message, and the time it took to handle it,
+        # when enabled.  Each handler reports its reply.
+        trace = tracer.enabled
+        if trace:
+            tracer.trace('recv', msg)
+            start = time.time()
+
+        # Find and call actual handler for message
+        handler = self.handlers.get(msg['msg_type'], None)
+        if handler is None:
+            io.raw_print_err("UNKNOWN MESSAGE TYPE:", msg)
+        else:
+            # Budgeted requests wait for the abandoned call within their
+            # budget, the others until it is done.
+            if msg['msg_type'] not in self.budgeted_types:
+                self._wait_abandoned()
+            handler(ident, msg)
+        if trace:
+            tracer.trace('handled', msg, time.time()-start)
+            
+        # Check whether we should exit, in case the incoming message set the
+        # exit flag on
+        if self.shell.exit_now:
+            io.raw_print('\nExiting IPython kernel...')
+            # We do a normal, clean exit, which allows any actions registered
+            # via atexit (such as history saving) to take place.
+            sys.exit(0)
+        return True
+
     def _abort_queue(self):
+        while self._queued:
+            self._abort_request(*self._queued.popleft())
         while True:
-            try:
-                ident = self.reply_socket.recv(zmq.NOBLOCK)
-            except zmq.ZMQError, e:
-                if e.errno == zmq.EAGAIN:
-                    break
-            else:
-                assert self.reply_socket.rcvmore(), \
-                       "Unexpected missing message part."
-                msg = self.reply_socket.recv_json()
-            io.raw_print("Aborting:\n", Message(msg))
-            msg_type = msg['msg_type']
-            reply_type = msg_type.split('_')[0] + '_reply'
-            reply_msg = self.session.msg(reply_type, {'status' : 'aborted'}, msg)
-            io.raw_print(reply_msg)
-            self.reply_socket.send(ident,zmq.SNDMORE)
-            self.reply_socket.send_json(reply_msg)
+            ident, msg = self.session.recv_multipart(self.reply_socket)
+            if msg is None:
+                break
+            self._abort_request(ident, msg)
             # We need to wait a bit for requests to come in. This can probably
             # be set shorter for true asynchronous clients.
             time.sleep(0.1)
 
+    def _abort_request(self, ident, msg):
+        """Reply to a request without handling it."""
+        if tracer.enabled:
+            tracer.trace('abort', msg)
+        msg_type = msg['msg_type']
+        reply_type = msg_type.rsplit('_', 1)[0] + '_reply'
+        reply_msg = self.session.msg(reply_type, {'status' : 'aborted'}, msg)
+        if tracer.enabled:
+            tracer.trace('send', reply_msg)
+        self.session.send(self.reply_socket, reply_msg, ident=ident)
+
+    def _supersede_key(self, msg):
+        """Return what identifies the requests superseding each other, or
+        None for the requests that are all handled."""
+        if msg['msg_type'] not in self.budgeted_types:
+            return None
+        return msg['msg_type'], msg['header'].get('session')
+
+    def _receive_queued(self, key):
+        """Queue the requests waiting on the reply socket.
+
+        Queued requests superseded by a newer one are aborted.  Returns True
+        if a request with the given supersede key is queued.
+        """
+        while True:
+            ident, msg = self.session.recv_multipart(self.reply_socket)
+            if msg is None:
+                break
+            new_key = self._supersede_key(msg)
+            if new_key is not None:
+                for i, (old_ident, old_msg) in enumerate(self._queued):
+                    if self._supersede_key(old_msg) == new_key:
+                        del self._queued[i]
+                        self._abort_request(old_ident, old_msg)
+                        break
+            self._queued.append((ident, msg))
+        return any(self._supersede_key(msg) == key
+                   for ident, msg in self._queued)
+
+    def _run_budgeted(self, ident, parent, func):
+        """Run func in a BudgetedCall, waiting at most the request's budget.
+
+        Requests arriving meanwhile are queued.  If a newer request of the
+        same type comes from the same session, the call is cancelled, the
+        request is aborted and None is returned.  Otherwise the call is
+        returned, finished or not.
+
+        The shell isn't thread safe, so the call only starts once the one left
+        running by an earlier request has finished; if that takes the whole
+        budget, the call returned was never started.
+        """
+        key = self._supersede_key(parent)
+        if self._receive_queued(key):
+            self._abort_request(ident, parent)
+            return None
+        budget = parent['content'].get('timeout')
+        if budget is None:
+            budget = self._request_budget
+        deadline = time.time() + budget
+        call = BudgetedCall(func)
+        started = False
+        # Check the socket every few milliseconds while waiting.
+        while True:
+            step = min(max(deadline - time.time(), 0), 0.01)
+            if not started:
+                if self._abandoned is None or self._abandoned.wait(step):
+                    self._abandoned = None
+                    call.start()
+                    started = True
+                    continue
+            elif call.wait(step):
+                break
+            if self._receive_queued(key):
+                self._abandon(call, started)
+                self._abort_request(ident, parent)
+                return None
+            if time.time() >= deadline:
+                break
+        self._abandon(call, started)
+        return call
+
+    def _abandon(self, call, started):
+        """Cancel a BudgetedCall nobody waits for anymore, remembering it
+        while it still runs."""
+        call.cancel()
+        if started and not call.finished.is_set():
+            self._abandoned = call
+
+    def _wait_abandoned(self):
+        """Wait for the BudgetedCall left running by a timed out request, so
+        that it doesn't use the shell at the same time as the next request."""
+        if self._abandoned is not None:
+            self._abandoned.wait()
+            self._abandoned = None
+
+    def _budgeted_value(self, call, default):
+        """Return the value of a finished BudgetedCall, or default after
+        reporting the error it raised."""
+        if call.error is None:
+            return call.value
+        etype, evalue, tb = call.error
+        io.raw_print_err(''.join(traceback.format_exception(etype, evalue, tb)))
+        return default
+
     def _raw_input(self, prompt, ident, parent):
         # Flush output before making the request.
         sys.stderr.flush()
@@ -363,10 +552,10 @@ class Kernel(Configurable):
         # Send the input request.
         content = dict(prompt=prompt)
         msg = self.session.msg(u'input_request', content, parent)
-        self.req_socket.send_json(msg)
+        self.session.send(self.req_socket, msg)
 
         # Await a response.
-        reply = self.req_socket.recv_json()
+        reply = self.session.recv(self.req_socket, 0)
         try:
             value = reply['content']['value']
         except:
@@ -375,7 +564,9 @@ class Kernel(Configurable):
             value = ''
         return value
     
-    def _complete(self, msg):
+    def _complete_args(self, msg):
+        """Return the text, line and cursor position to complete for a
+        completion request."""
         c = msg['content']
         try:
             cpos = int(c['cursor_pos'])
@@ -386,7 +577,15 @@ class Kernel(Configurable):
             cpos = len(c['text'])
             if cpos==0:
                 cpos = len(c['line'])
-        return self.shell.complete(c['text'], c['line'], cpos)
+        text = c['text']
+        if not text:
+            # Split the line here, so that the reply has the text even if the
+            # completion doesn't finish in time.
+            text = self.shell.Completer.splitter.split_line(c['line'], cpos)
+        return text, c['line'], cpos
+
+    def _complete(self, msg):
+        return self.shell.complete(*self._complete_args(msg))
 
     def _object_info(self, context):
         symbol, leftover = self._symbol_from_context(context)
@@ -423,9 +622,11 @@ class Kernel(Configurable):
         """
         # io.rprint("Kernel at_shutdown") # dbg
         if self._shutdown_message is not None:
-            self.reply_socket.send_json(self._shutdown_message)
-            self.pub_socket.send_json(self._shutdown_message)
-            io.raw_print(self._shutdown_message)
+            self.session.send(self.reply_socket, self._shutdown_message,
+                              ident=self._shutdown_ident)
+            self.session.send(self.pub_socket, self._shutdown_message)
+            if tracer.enabled:
+                tracer.trace('send', self._shutdown_message)
             # A very short sleep to give zmq time to flush its message buffers
             # before Python truly shuts down.
             time.sleep(0.01)
@@ -535,7 +736,8 @@ class GTKKernel(Kernel):
 #-----------------------------------------------------------------------------
 
 def launch_kernel(ip=None, xrep_port=0, pub_port=0, req_port=0, hb_port=0,
-                  independent=False, pylab=False, colors=None):
+                  independent=False, pylab=False, colors=None,
+                  packer='json'):
     """Launches a localhost kernel, binding to the specified ports.
 
     Parameters
@@ -569,6 +771,10 @@ def launch_kernel(ip=None, xrep_port=0, pub_port=0, req_port=0, hb_port=0,
     colors : None or string, optional (default None)
         If not None, specify the color scheme. One of (NoColor, LightBG, Linux)
 
+    packer : str, optional (default 'json')
+        The message serialization the kernel's Session will use. Must match
+        the one of the client's Session.
+
     Returns
     -------
     A tuple of form:
@@ -587,6 +793,8 @@ def launch_kernel(ip=None, xrep_port=0, pub_port=0, req_port=0, hb_port=0,
     if colors is not None:
         extra_arguments.append('--colors')
         extra_arguments.append(colors)
+    if packer != 'json':
+        extra_arguments.extend(['--packer', packer])
     return base_launch_kernel('from IPython.zmq.ipkernel import main; main()',
                               xrep_port, pub_port, req_port, hb_port, 
                               independent, extra_arguments)
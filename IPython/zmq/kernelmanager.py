@@ -239,7 +239,7 @@ class XReqSocketChannel(ZmqSocketChannel):
         self._queue_request(msg)
         return msg['header']['msg_id']
 
-    def complete(self, text, line, cursor_pos, block=None):
+    def complete(self, text, line, cursor_pos, block=None, timeout=None):
         """Tab complete text in the kernel's namespace.
 
         Parameters
@@ -254,34 +254,42 @@ class XReqSocketChannel(ZmqSocketChannel):
             requested.
         block : str, optional
             The full block of code in which the completion is being requested.
+        timeout : float, optional
+            The time budget of the kernel for the completion, in seconds.
+            When it expires the kernel replies with the matches found so far.
+            If not given, the kernel uses its own default.
 
         Returns
         -------
         The msg_id of the message sent.
         """
-        content = dict(text=text, line=line, block=block, cursor_pos=cursor_pos)
+        content = dict(text=text, line=line, block=block, cursor_pos=cursor_pos,
+                       timeout=timeout)
         msg = self.session.msg('complete_request', content)
         self._queue_request(msg)
         return msg['header']['msg_id']
 
-    def object_info(self, oname):
+    def object_info(self, oname, timeout=None):
         """Get metadata information about an object.
 
         Parameters
         ----------
         oname : str
             A string specifying the object name.
+        timeout : float, optional
+            The time budget of the kernel for the lookup, in seconds.  If it
+            expires, the object is reported as not found.
         
         Returns
         -------
         The msg_id of the message sent.
         """
-        content = dict(oname=oname)
+        content = dict(oname=oname, timeout=timeout)
         msg = self.session.msg('object_info_request', content)
         self._queue_request(msg)
         return msg['header']['msg_id']
 
-    def history(self, index=None, raw=False, output=True):
+    def history(self, index=None, raw=False, output=True, session=None):
         """Get the history list.
 
         Parameters
@@ -294,12 +302,15 @@ class XReqSocketChannel(ZmqSocketChannel):
             If True, return the raw input.
         output : bool
             If True, then return the output as well.
+        session : int, optional
+            Get the history of this session instead of the current one; -1 is
+            the previous session, -2 the one before, etc.
 
         Returns
         -------
         The msg_id of the message sent.
         """
-        content = dict(index=index, raw=raw, output=output)
+        content = dict(index=index, raw=raw, output=output, session=session)
         msg = self.session.msg('history_request', content)
         self._queue_request(msg)
         return msg['header']['msg_id']
@@ -330,7 +341,7 @@ class XReqSocketChannel(ZmqSocketChannel):
             self._handle_recv()
 
     def _handle_recv(self):
-        msg = self.socket.recv_json()
+        ident, msg = self.session.recv_multipart(self.socket, 0)
         self.call_handlers(msg)
 
     def _handle_send(self):
@@ -339,7 +350,7 @@ class XReqSocketChannel(ZmqSocketChannel):
         except Empty:
             pass
         else:
-            self.socket.send_json(msg)
+            self.session.send(self.socket, msg)
         if self.command_queue.empty():
             self.drop_io_state(POLLOUT)
 
@@ -423,14 +434,10 @@ class SubSocketChannel(ZmqSocketChannel):
     def _handle_recv(self):
         # Get all of the messages we can
         while True:
-            try:
-                msg = self.socket.recv_json(zmq.NOBLOCK)
-            except zmq.ZMQError:
-                # Check the errno?
-                # Will this trigger POLLERR?
+            ident, msg = self.session.recv_multipart(self.socket)
+            if msg is None:
                 break
-            else:
-                self.call_handlers(msg)
+            self.call_handlers(msg)
 
     def _flush(self):
         """Callback for :method:`self.flush`."""
@@ -486,7 +493,7 @@ class RepSocketChannel(ZmqSocketChannel):
             self._handle_recv()
 
     def _handle_recv(self):
-        msg = self.socket.recv_json()
+        ident, msg = self.session.recv_multipart(self.socket, 0)
         self.call_handlers(msg)
 
     def _handle_send(self):
@@ -495,7 +502,7 @@ class RepSocketChannel(ZmqSocketChannel):
         except Empty:
             pass
         else:
-            self.socket.send_json(msg)
+            self.session.send(self.socket, msg)
         if self.msg_queue.empty():
             self.drop_io_state(POLLOUT)
 
@@ -731,6 +738,8 @@ class KernelManager(HasTraits):
                                "Currently valid addresses are: %s"%LOCAL_IPS
                                )
                     
+        # The kernel must serialize messages the same way our session does.
+        kw.setdefault('packer', self.session.packer)
         self._launch_args = kw.copy()
         if kw.pop('ipython', True):
             from ipkernel import launch_kernel
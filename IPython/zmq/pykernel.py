@@ -69,9 +69,7 @@ class Kernel(HasTraits):
         """ Start the kernel main loop.
         """
         while True:
-            ident = self.reply_socket.recv()
-            assert self.reply_socket.rcvmore(), "Missing message part."
-            msg = self.reply_socket.recv_json()
+            ident, msg = self.session.recv_multipart(self.reply_socket, 0)
             omsg = Message(msg)
             print>>sys.__stdout__
             print>>sys.__stdout__, omsg
@@ -106,7 +104,7 @@ class Kernel(HasTraits):
             print>>sys.__stderr__, Message(parent)
             return
         pyin_msg = self.session.msg(u'pyin',{u'code':code}, parent=parent)
-        self.pub_socket.send_json(pyin_msg)
+        self.session.send(self.pub_socket, pyin_msg)
 
         try:
             comp_code = self.compiler(code, '<zmq-kernel>')
@@ -132,7 +130,7 @@ class Kernel(HasTraits):
                 u'evalue' : unicode(evalue)
             }
             exc_msg = self.session.msg(u'pyerr', exc_content, parent)
-            self.pub_socket.send_json(exc_msg)
+            self.session.send(self.pub_socket, exc_msg)
             reply_content = exc_content
         else:
             reply_content = { 'status' : 'ok', 'payload' : {} }
@@ -144,8 +142,7 @@ class Kernel(HasTraits):
         # Send the reply.
         reply_msg = self.session.msg(u'execute_reply', reply_content, parent)
         print>>sys.__stdout__, Message(reply_msg)
-        self.reply_socket.send(ident, zmq.SNDMORE)
-        self.reply_socket.send_json(reply_msg)
+        self.session.send(self.reply_socket, reply_msg, ident=ident)
         if reply_msg['content']['status'] == u'error':
             self._abort_queue()
 
@@ -179,22 +176,16 @@ class Kernel(HasTraits):
 
     def _abort_queue(self):
         while True:
-            try:
-                ident = self.reply_socket.recv(zmq.NOBLOCK)
-            except zmq.ZMQError, e:
-                if e.errno == zmq.EAGAIN:
-                    break
-            else:
-                assert self.reply_socket.rcvmore(), "Missing message part."
-                msg = self.reply_socket.recv_json()
+            ident, msg = self.session.recv_multipart(self.reply_socket)
+            if msg is None:
+                break
             print>>sys.__stdout__, "Aborting:"
             print>>sys.__stdout__, Message(msg)
             msg_type = msg['msg_type']
             reply_type = msg_type.split('_')[0] + '_reply'
             reply_msg = self.session.msg(reply_type, {'status':'aborted'}, msg)
             print>>sys.__stdout__, Message(reply_msg)
-            self.reply_socket.send(ident,zmq.SNDMORE)
-            self.reply_socket.send_json(reply_msg)
+            self.session.send(self.reply_socket, reply_msg, ident=ident)
             # We need to wait a bit for requests to come in. This can probably
             # be set shorter for true asynchronous clients.
             time.sleep(0.1)
@@ -207,10 +198,10 @@ class Kernel(HasTraits):
         # Send the input request.
         content = dict(prompt=prompt)
         msg = self.session.msg(u'input_request', content, parent)
-        self.req_socket.send_json(msg)
+        self.session.send(self.req_socket, msg)
 
         # Await a response.
-        reply = self.req_socket.recv_json()
+        reply = self.session.recv(self.req_socket, 0)
         try:
             value = reply['content']['value']
         except:
@@ -257,7 +248,7 @@ class Kernel(HasTraits):
 #-----------------------------------------------------------------------------
 
 def launch_kernel(ip=None, xrep_port=0, pub_port=0, req_port=0, hb_port=0,
-                  independent=False):
+                  independent=False, packer='json'):
     """ Launches a localhost kernel, binding to the specified ports.
 
     Parameters
@@ -283,6 +274,10 @@ def launch_kernel(ip=None, xrep_port=0, pub_port=0, req_port=0, hb_port=0,
         when this process dies. Note that in this case it is still good practice
         to kill kernels manually before exiting.
 
+    packer : str, optional (default 'json')
+        The message serialization the kernel's Session will use. Must match
+        the one of the client's Session.
+
     Returns
     -------
     A tuple of form:
@@ -294,6 +289,8 @@ def launch_kernel(ip=None, xrep_port=0, pub_port=0, req_port=0, hb_port=0,
         extra_arguments.append('--ip')
         if isinstance(ip, basestring):
             extra_arguments.append(ip)
+    if packer != 'json':
+        extra_arguments.extend(['--packer', packer])
     
     return base_launch_kernel('from IPython.zmq.pykernel import main; main()',
                               xrep_port, pub_port, req_port, hb_port,
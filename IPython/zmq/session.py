@@ -1,37 +1,108 @@
 import os
 import uuid
 import pprint
+import cPickle as pickle
+import threading
 
 import zmq
+from zmq.utils import jsonapi
+
+try:
+    import msgpack
+except ImportError:
+    msgpack = None
+
+#-----------------------------------------------------------------------------
+# Wire serialization
+#-----------------------------------------------------------------------------
+
+# Messages travel as multipart zmq messages of the form:
+#
+#   [ident, ..., DELIM, msg_type, header, parent_header, content, buffer, ...]
+#
+# The routing identities (if any) come before the delimiter, msg_type is sent
+# as raw bytes so that it can be inspected without unpacking anything, the
+# three dicts are packed separately with the session's packer, and any extra
+# binary buffers (numpy arrays, images...) ride along as additional frames
+# without being encoded.
+DELIM = "<IDS|MSG>"
+
+def json_packer(obj):
+    return jsonapi.dumps(obj)
+
+def json_unpacker(s):
+    return jsonapi.loads(s)
+
+def pickle_packer(obj):
+    return pickle.dumps(obj, -1)
+
+pickle_unpacker = pickle.loads
+
+# The available packer/unpacker pairs, keyed by the name used to select them.
+packers = {
+    'json' : (json_packer, json_unpacker),
+    'pickle' : (pickle_packer, pickle_unpacker),
+}
+
+if msgpack is not None:
+    packers['msgpack'] = (msgpack.packb, msgpack.unpackb)
+
 
 class Message(object):
     """A simple message object that maps dict keys to attributes.
 
     A Message can be created from a dict and a dict from a Message instance
-    simply by calling dict(msg_obj)."""
-    
+    simply by calling dict(msg_obj).
+
+    The Message wraps the original dict rather than copying it: nested dicts
+    are only turned into Message views when they are accessed, and those
+    views are then cached.  Building a Message is therefore O(1) regardless of
+    the size of the payload, and views reflect later changes to the dict."""
+
+    __slots__ = ('_dict', '_views')
+
     def __init__(self, msg_dict):
-        dct = self.__dict__
-        for k, v in msg_dict.iteritems():
-            if isinstance(v, dict):
-                v = Message(v)
-            dct[k] = v
+        if isinstance(msg_dict, Message):
+            msg_dict = msg_dict._dict
+        self._dict = msg_dict
+        self._views = None
+
+    def _view(self, k, v):
+        if not isinstance(v, dict):
+            return v
+        views = self._views
+        if views is None:
+            views = self._views = {}
+        view = views.get(k)
+        if view is None or view._dict is not v:
+            view = views[k] = Message(v)
+        return view
+
+    def __getattr__(self, k):
+        if k in Message.__slots__:
+            # Not initialized yet, e.g. while being copied.
+            raise AttributeError(k)
+        try:
+            v = self._dict[k]
+        except KeyError:
+            raise AttributeError(k)
+        return self._view(k, v)
 
     # Having this iterator lets dict(msg_obj) work out of the box.
     def __iter__(self):
-        return iter(self.__dict__.iteritems())
+        return self._dict.iteritems()
     
     def __repr__(self):
-        return repr(self.__dict__)
+        return repr(self._dict)
 
     def __str__(self):
-        return pprint.pformat(self.__dict__)
+        return pprint.pformat(self._dict)
 
     def __contains__(self, k):
-        return k in self.__dict__
+        return k in self._dict
 
     def __getitem__(self, k):
-        return self.__dict__[k]
+        return self._view(k, self._dict[k])
 
 
 def msg_header(msg_id, username, session):
@@ -63,18 +134,45 @@ def extract_header(msg_or_header):
 
 
 class Session(object):
+    """Build, serialize and transmit messages for a single session.
+
+    Parameters
+    ----------
+    username : str, optional
+        The user name recorded in the message headers.
+
+    session : str, optional
+        The session id; a new uuid is generated if not given.
+
+    packer : str, optional (default 'json')
+        The name of the serialization backend used for the header,
+        parent_header and content frames, one of the keys of
+        :data:`packers`.  Both ends of a connection must use the same one.
+    """
 
-    def __init__(self, username=os.environ.get('USER','username'), session=None):
+    def __init__(self, username=os.environ.get('USER','username'), session=None,
+                 packer='json'):
         self.username = username
         if session is None:
             self.session = str(uuid.uuid4())
         else:
             self.session = session
         self.msg_id = 0
+        try:
+            self.pack, self.unpack = packers[packer]
+        except KeyError:
+            raise ValueError('Unknown packer %r, valid packers are: %s' %
+                             (packer, packers.keys()))
+        self.packer = packer
+        # zmq sockets must not be used from several threads at once, and the
+        # kernel publishes output from a background thread, so all sends (and
+        # message ids) go through this lock.
+        self._lock = threading.RLock()
 
     def msg_header(self):
-        h = msg_header(self.msg_id, self.username, self.session)
-        self.msg_id += 1
+        with self._lock:
+            h = msg_header(self.msg_id, self.username, self.session)
+            self.msg_id += 1
         return h
 
     def msg(self, msg_type, content=None, parent=None):
@@ -85,24 +183,114 @@ class Session(object):
         msg['content'] = {} if content is None else content
         return msg
 
-    def send(self, socket, msg_type, content=None, parent=None, ident=None):
-        msg = self.msg(msg_type, content, parent)
+    def serialize(self, msg, ident=None):
+        """Return the list of frames that make up a message on the wire.
+
+        The buffers of the message (if any) are not included, since they are
+        sent as they are; see :meth:`send`.
+        """
+        frames = []
         if ident is not None:
-            socket.send(ident, zmq.SNDMORE)
-        socket.send_json(msg)
+            if isinstance(ident, list):
+                frames.extend(ident)
+            else:
+                frames.append(ident)
+        frames.append(DELIM)
+        frames.append(str(msg['msg_type']))
+        frames.append(self.pack(msg['header']))
+        frames.append(self.pack(msg['parent_header']))
+        frames.append(self.pack(msg['content']))
+        return frames
+
+    def unserialize(self, frames):
+        """Split a list of frames into its idents and the message dict.
+
+        Frames may be strings or zmq.Message objects, the latter being left as
+        they are when they hold extra buffers.
+        """
+        frames = list(frames)
+        parts = [ getattr(f, 'bytes', f) for f in frames ]
+        try:
+            i = parts.index(DELIM)
+        except ValueError:
+            raise ValueError('Invalid message, missing delimiter: %r' % parts)
+        idents = parts[:i]
+        if len(frames) < i+5:
+            raise ValueError('Invalid message, missing parts: %r' % parts)
+        msg = {}
+        msg['msg_type'] = parts[i+1]
+        msg['header'] = self.unpack(parts[i+2])
+        msg['parent_header'] = self.unpack(parts[i+3])
+        msg['content'] = self.unpack(parts[i+4])
+        msg['buffers'] = frames[i+5:]
+        return idents, msg
+
+    def send(self, socket, msg_or_type, content=None, parent=None, ident=None,
+             buffers=None):
+        """Build and send a message on a socket.
+
+        Parameters
+        ----------
+        socket : zmq.Socket
+            The socket to send the message on.
+
+        msg_or_type : str or dict
+            Either the type of a new message to build with :meth:`msg`, or an
+            already built message dict, in which case content and parent are
+            ignored.
+
+        ident : str or list of str, optional
+            The routing identities to prepend, for XREP sockets.
+
+        buffers : list, optional
+            Objects supporting the buffer interface (str, buffer, numpy
+            arrays...) to send after the content without any copy or encoding.
+            If not given, the 'buffers' key of a message dict is used.
+
+        Returns
+        -------
+        The sent message, as a :class:`Message`.
+        """
+        if isinstance(msg_or_type, dict):
+            msg = msg_or_type
+        else:
+            msg = self.msg(msg_or_type, content, parent)
+        if buffers is None:
+            buffers = msg.get('buffers', [])
+        frames = self.serialize(msg, ident)
+        with self._lock:
+            if buffers:
+                for frame in frames:
+                    socket.send(frame, zmq.SNDMORE)
+                for buf in buffers[:-1]:
+                    socket.send(buf, zmq.SNDMORE, copy=False)
+                socket.send(buffers[-1], copy=False)
+            else:
+                socket.send_multipart(frames)
         omsg = Message(msg)
         return omsg
 
-    def recv(self, socket, mode=zmq.NOBLOCK):
+    def recv_multipart(self, socket, mode=zmq.NOBLOCK, copy=True):
+        """Receive a message, returning the idents and the message dict.
+
+        Returns (None, None) if mode is NOBLOCK and no message is waiting.
+        With copy=False, extra buffers are returned as zmq.Message objects
+        giving access to the received data without copying it.
+        """
         try:
-            msg = socket.recv_json(mode)
+            frames = socket.recv_multipart(mode, copy=copy)
         except zmq.ZMQError, e:
             if e.errno == zmq.EAGAIN:
-                # We can convert EAGAIN to None as we know in this case
-                # recv_json won't return None.
-                return None
+                return None, None
             else:
                 raise
+        return self.unserialize(frames)
+
+    def recv(self, socket, mode=zmq.NOBLOCK):
+        """Receive a message, returning a :class:`Message` or None."""
+        idents, msg = self.recv_multipart(socket, mode)
+        if msg is None:
+            return None
         return Message(msg)
 
 def test_msg2obj():
@@ -0,0 +1,116 @@
+"""Tests for the output streams of the zmq kernel.
+"""
+#-----------------------------------------------------------------------------
+#  Copyright (C) 2010  The IPython Development Team
+#
+#  Distributed under the terms of the BSD License.  The full license is in
+#  the file COPYING.txt, distributed as part of this software.
+#-----------------------------------------------------------------------------
+
+import time
+
+import nose.tools as nt
+
+from IPython.zmq.iostream import OutStream
+from IPython.zmq.session import Session
+
+class FakeSocket(object):
+    """Collect the frames of the messages sent on it."""
+
+    def __init__(self):
+        self.sent = []
+
+    def send_multipart(self, frames):
+        self.sent.append(frames)
+
+
+def make_stream(**kw):
+    session = Session()
+    socket = FakeSocket()
+    stream = OutStream(session, socket, u'stdout')
+    for k, v in kw.iteritems():
+        setattr(stream, k, v)
+    def data():
+        return [session.unserialize(f)[1]['content']['data']
+                for f in socket.sent]
+    return stream, data
+
+
+def test_coalesce():
+    stream, data = make_stream(flush_interval=10)
+    for i in range(100):
+        stream.write('x')
+    nt.assert_equals(data(), [])
+    stream.flush()
+    nt.assert_equals(data(), ['x'*100])
+    stream.close()
+
+
+def test_flush_size():
+    stream, data = make_stream(flush_interval=10, flush_size=10)
+    stream.write('x'*5)
+    nt.assert_equals(data(), [])
+    stream.write('y'*5)
+    nt.assert_equals(data(), ['xxxxxyyyyy'])
+    stream.close()
+
+
+def test_background_flush():
+    stream, data = make_stream(flush_interval=0.01)
+    stream.write('x')
+    for i in range(100):
+        if data():
+            break
+        time.sleep(0.01)
+    nt.assert_equals(data(), ['x'])
+    stream.close()
+
+
+def test_rate_limit():
+    stream, data = make_stream(flush_interval=10, rate_limit=100,
+                               _allowance=100)
+    stream.write('x'*60)
+    stream.write('y'*60)
+    stream.flush()
+    out = data()[0]
+    nt.assert_true(out.startswith('x'*60+'\n'))
+    nt.assert_true('60 bytes of output dropped' in out)
+    stream.close()
+
+
+def test_rate_limit_large_write():
+    stream, data = make_stream(flush_interval=10, rate_limit=100)
+    # A single large write goes through on a quiet stream...
+    stream.write('x'*500)
+    # ...but the writes that follow it right away are dropped.
+    stream.write('y')
+    stream.flush()
+    out = data()[0]
+    nt.assert_true(out.startswith('x'*500+'\n'))
+    nt.assert_true('1 bytes of output dropped' in out)
+    stream.close()
+
+
+def test_no_rate_limit():
+    stream, data = make_stream(flush_interval=10)
+    nt.assert_equals(stream.rate_limit, None)
+    stream.write('x'*(1 << 21))
+    stream.flush()
+    nt.assert_equals(''.join(data()), 'x'*(1 << 21))
+    stream.close()
+
+
+def test_close_flushes():
+    stream, data = make_stream(flush_interval=10)
+    stream.write('x')
+    stream.close()
+    nt.assert_equals(data(), ['x'])
+    stream.close()
+    nt.assert_equals(data(), ['x'])
+
+
+def test_closed():
+    stream, data = make_stream()
+    stream.close()
+    nt.assert_raises(ValueError, stream.write, 'x')
+    nt.assert_raises(ValueError, stream.flush)
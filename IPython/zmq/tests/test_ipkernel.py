@@ -0,0 +1,109 @@
+"""Tests for the request handling of the zmq kernel.
+"""
+#-----------------------------------------------------------------------------
+#  Copyright (C) 2010  The IPython Development Team
+#
+#  Distributed under the terms of the BSD License.  The full license is in
+#  the file COPYING.txt, distributed as part of this software.
+#-----------------------------------------------------------------------------
+
+import time
+
+import nose.tools as nt
+import zmq
+
+from IPython.utils.localinterfaces import LOCALHOST
+from IPython.zmq.ipkernel import launch_kernel
+from IPython.zmq.session import Session
+
+def setup():
+    global KERNEL, CONTEXT, SOCKET, SESSION
+    KERNEL, xrep_port, pub_port, req_port, hb_port = launch_kernel()
+    CONTEXT = zmq.Context()
+    SOCKET = CONTEXT.socket(zmq.XREQ)
+    SOCKET.setsockopt(zmq.LINGER, 0)
+    SOCKET.connect('tcp://%s:%i' % (LOCALHOST, xrep_port))
+    SESSION = Session()
+
+def teardown():
+    SOCKET.close()
+    CONTEXT.term()
+    KERNEL.kill()
+    KERNEL.wait()
+
+
+def request(msg_type, **content):
+    """Send a request to the kernel and return its reply."""
+    SESSION.send(SOCKET, msg_type, content)
+    poller = zmq.Poller()
+    poller.register(SOCKET, zmq.POLLIN)
+    # The kernel may take a while to start up.
+    nt.assert_true(poller.poll(10000), 'no reply to %s' % msg_type)
+    ident, reply = SESSION.recv_multipart(SOCKET)
+    nt.assert_equal(reply['msg_type'], msg_type.replace('request', 'reply'))
+    return reply['content']
+
+def execute(code, **expressions):
+    return request('execute_request', code=code, silent=False,
+                   user_variables=[], user_expressions=expressions)
+
+
+def test_complete_timed_out():
+    """A timed out completion holds off the next execution until it is done."""
+    execute('import time\n'
+            'class Slow(object):\n'
+            '    done = False\n'
+            '    def __dir__(self):\n'
+            '        time.sleep(1)\n'
+            '        Slow.done = True\n'
+            '        return []\n'
+            'slow = Slow()\n')
+    start = time.time()
+    reply = request('complete_request', text='slow.', line='slow.',
+                    cursor_pos=5, block=None, timeout=0.1)
+    nt.assert_true(reply['timed_out'])
+    nt.assert_true(time.time() - start < 1)
+    reply = execute('', done='Slow.done')
+    nt.assert_equal(reply['user_expressions']['done'], 'True')
+
+def test_object_info_timed_out():
+    """A request arriving while a timed out one still runs waits for it
+    within its own budget."""
+    execute('import time\n'
+            'class Sleepy(object):\n'
+            '    @property\n'
+            '    def __doc__(self):\n'
+            '        time.sleep(1)\n'
+            '        return "sleepy"\n'
+            'sleepy = Sleepy()\n')
+    reply = request('object_info_request', oname='sleepy', timeout=0.1)
+    nt.assert_true(reply['timed_out'])
+    nt.assert_false(reply['found'])
+    # The abandoned lookup still holds the shell.
+    reply = request('object_info_request', oname='sleepy', timeout=0.1)
+    nt.assert_true(reply['timed_out'])
+    reply = request('complete_request', text='sle', line='sle',
+                    cursor_pos=3, block=None, timeout=5)
+    nt.assert_false(reply['timed_out'])
+    nt.assert_equal(reply['matches'], ['sleepy'])
+
+def test_complete_timed_out_limit():
+    """The matches of a timed out completion are limited too."""
+    execute('import time\n'
+            'for i in range(10):\n'
+            '    globals()["zz%i" % i] = i\n'
+            'def slow_matcher(text):\n'
+            '    time.sleep(1)\n'
+            '    return []\n'
+            'completer = get_ipython().Completer\n'
+            'limit = completer.limit\n'
+            'completer.limit = 3\n'
+            'completer.matchers.append(slow_matcher)\n')
+    try:
+        reply = request('complete_request', text='zz', line='zz',
+                        cursor_pos=2, block=None, timeout=0.2)
+        nt.assert_true(reply['timed_out'])
+        nt.assert_equal(reply['matches'], ['zz0', 'zz1', 'zz9'])
+    finally:
+        execute('completer.limit = limit\n'
+                'completer.matchers.remove(slow_matcher)\n')
@@ -0,0 +1,62 @@
+"""Tests for the message serialization of zmq sessions.
+"""
+#-----------------------------------------------------------------------------
+#  Copyright (C) 2010  The IPython Development Team
+#
+#  Distributed under the terms of the BSD License.  The full license is in
+#  the file COPYING.txt, distributed as part of this software.
+#-----------------------------------------------------------------------------
+
+import nose.tools as nt
+
+from IPython.zmq import session as ss
+
+def _check_roundtrip(packer):
+    s = ss.Session(packer=packer)
+    parent = s.msg('execute_request', dict(code='x=1'))
+    msg = s.msg('execute_reply', dict(status='ok', payload=[]), parent)
+    frames = s.serialize(msg, ident='abc')
+    idents, new = s.unserialize(frames + ['buf'])
+    nt.assert_equals(idents, ['abc'])
+    nt.assert_equals(new['msg_type'], 'execute_reply')
+    nt.assert_equals(new['header'], msg['header'])
+    nt.assert_equals(new['parent_header'], parent['header'])
+    nt.assert_equals(new['content'], msg['content'])
+    nt.assert_equals(new['buffers'], ['buf'])
+
+
+def test_roundtrip():
+    for packer in ss.packers:
+        yield _check_roundtrip, packer
+
+
+def test_no_idents():
+    s = ss.Session()
+    msg = s.msg('stream', dict(name='stdout', data='hi'))
+    idents, new = s.unserialize(s.serialize(msg))
+    nt.assert_equals(idents, [])
+    nt.assert_equals(new['buffers'], [])
+
+
+def test_bad_packer():
+    nt.assert_raises(ValueError, ss.Session, packer='nonexistent')
+
+
+def test_missing_delimiter():
+    s = ss.Session()
+    nt.assert_raises(ValueError, s.unserialize, ['a', 'b'])
+
+
+def test_message_lazy_views():
+    d = dict(content=dict(payload=[dict(x=1)], data='a'), msg_type='t')
+    m = ss.Message(d)
+    nt.assert_equals(m.msg_type, 't')
+    # Nested views wrap the original dicts and are cached.
+    nt.assert_true(m.content is m['content'])
+    nt.assert_equals(m.content.payload, [dict(x=1)])
+    d['content']['data'] = 'b'
+    nt.assert_equals(m.content.data, 'b')
+    nt.assert_raises(AttributeError, getattr, m, 'nonexistent')
+    nt.assert_equals(dict(m), d)
+    nt.assert_true('msg_type' in m)
+    nt.assert_true(ss.Message(m)._dict is d)
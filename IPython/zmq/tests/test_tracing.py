@@ -0,0 +1,69 @@
+"""Tests for the kernel message tracer.
+"""
+#-----------------------------------------------------------------------------
+#  Copyright (C) 2010  The IPython Development Team
+#
+#  Distributed under the terms of the BSD License.  The full license is in
+#  the file COPYING.txt, distributed as part of this software.
+#-----------------------------------------------------------------------------
+
+from StringIO import StringIO
+
+import nose.tools as nt
+
+from IPython.zmq.session import Session
+from IPython.zmq.tracing import MessageTracer
+
+def test_disabled_by_default():
+    t = MessageTracer('IPython.zmq.test')
+    nt.assert_false(t.enabled)
+    nt.assert_equals(t.recent(), [])
+
+
+def test_levels():
+    msg = Session().msg('complete_request', dict(text='abc'))
+    for level, full in [('info', False), ('debug', True)]:
+        t = MessageTracer('IPython.zmq.test')
+        out = StringIO()
+        t.configure(level, stream=out)
+        nt.assert_true(t.enabled)
+        t.trace('handled', msg, 0.001)
+        log = out.getvalue()
+        nt.assert_true('handled complete_request in 1.000 ms' in log)
+        nt.assert_equals("'text': 'abc'" in log, full)
+    t.configure()
+    nt.assert_false(t.enabled)
+
+
+def test_slow():
+    msg = Session().msg('execute_request')
+    t = MessageTracer('IPython.zmq.test')
+    out = StringIO()
+    t.configure('warning', stream=out)
+    t.trace('recv', msg)
+    t.trace('handled', msg, 0.001)
+    nt.assert_equals(out.getvalue(), '')
+    t.trace('handled', msg, 2.0)
+    nt.assert_equals(out.getvalue(), '[IPython.zmq.test] handled '
+                     'execute_request in 2000.000 ms (slow)\n')
+    t.configure()
+
+
+def test_history():
+    t = MessageTracer('IPython.zmq.test')
+    t.configure(history=3)
+    nt.assert_true(t.enabled)
+    session = Session()
+    msgs = [session.msg('stream') for i in range(5)]
+    for msg in msgs:
+        t.trace('send', msg)
+    nt.assert_equals([m for (_, _, m, _) in t.recent()], msgs[-3:])
+    nt.assert_equals(len(t.recent(1)), 1)
+    nt.assert_equals(t.recent(0), [])
+
+
+def test_sample():
+    t = MessageTracer('IPython.zmq.test')
+    t.configure(history=10, sample=0.0)
+    t.trace('send', Session().msg('stream'))
+    nt.assert_equals(t.recent(), [])
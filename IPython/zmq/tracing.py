@@ -0,0 +1,151 @@
+"""Tracing of the messages going through the zmq kernel.
+
+The kernel and its output streams report every message they receive and send
+to the module-level :data:`tracer`.  Tracing is off by default, and callers
+check ``tracer.enabled`` before calling :meth:`MessageTracer.trace`, so that
+the request loop pays a single attribute lookup when it is disabled.
+"""
+#-----------------------------------------------------------------------------
+#  Copyright (C) 2010  The IPython Development Team
+#
+#  Distributed under the terms of the BSD License.  The full license is in
+#  the file COPYING.txt, distributed as part of this software.
+#-----------------------------------------------------------------------------
+
+#-----------------------------------------------------------------------------
+# Imports
+#-----------------------------------------------------------------------------
+
+# Standard library imports.
+import logging
+import pprint
+import random
+import sys
+import time
+from collections import deque
+
+#-----------------------------------------------------------------------------
+# Classes and functions
+#-----------------------------------------------------------------------------
+
+# The names accepted for the tracing level, e.g. on the kernel command line.
+levels = {
+    'debug' : logging.DEBUG,
+    'info' : logging.INFO,
+    'warning' : logging.WARNING,
+}
+
+
+class _FormattedMessage(object):
+    """Defer the pretty-printing of a message until it is actually logged."""
+
+    def __init__(self, msg):
+        self.msg = msg
+
+    def __str__(self):
+        return pprint.pformat(dict(self.msg))
+
+
+class MessageTracer(object):
+    """Log messages and keep a ring buffer of the most recent ones.
+
+    At the 'warning' level only the requests taking longer than slow seconds
+    to handle are logged.  At the 'info' level one line is logged per
+    message, with the time it took to handle incoming requests.  At the
+    'debug' level full messages are pretty-printed as well.  With a sample
+    rate below 1, only that fraction of the messages is traced.
+    """
+
+    def __init__(self, name='IPython.zmq'):
+        self.log = logging.getLogger(name)
+        self.enabled = False
+        self.sample = 1.0
+        # The handling time above which requests are logged as slow, in
+        # seconds.
+        self.slow = 1.0
+        self.history = None
+        self._handler = None
+
+    def configure(self, level=None, sample=1.0, history=0, stream=None):
+        """Set up tracing.
+
+        Parameters
+        ----------
+        level : str or int, optional
+            The logging level, either a key of :data:`levels` or a logging
+            module constant.  If None, nothing is logged.
+
+        sample : float, optional (default 1.0)
+            The fraction of the messages to trace.
+
+        history : int, optional (default 0)
+            The number of recent messages to keep in memory, see
+            :meth:`recent`.  If 0, no messages are kept.
+
+        stream : file, optional
+            Where log records are written, sys.__stdout__ by default.  The
+            kernel redirects sys.stdout and sys.stderr to the frontends, so
+            those must not be used here.
+        """
+        if self._handler is not None:
+            self.log.removeHandler(self._handler)
+            self._handler = None
+        if level is not None:
+            level = levels.get(level, level)
+            self._handler = logging.StreamHandler(stream or sys.__stdout__)
+            self._handler.setFormatter(logging.Formatter('[%(name)s] %(message)s'))
+            self.log.addHandler(self._handler)
+            self.log.setLevel(level)
+            self.log.propagate = False
+        self.sample = sample
+        self.history = deque(maxlen=history) if history else None
+        self.enabled = level is not None or self.history is not None
+
+    def trace(self, event, msg, elapsed=None):
+        """Record a message.
+
+        Parameters
+        ----------
+        event : str
+            What happened to the message, e.g. 'recv', 'send' or 'handled'.
+
+        msg : dict or Message
+            The message itself.
+
+        elapsed : float, optional
+            The time spent on the message, in seconds.
+        """
+        if self.sample < 1.0 and random.random() >= self.sample:
+            return
+        if self.history is not None:
+            self.history.append((time.time(), event, msg, elapsed))
+        if self._handler is None:
+            # Only keeping the history.
+            return
+        log = self.log
+        if elapsed is not None and elapsed >= self.slow:
+            log.warning('%s %s in %.3f ms (slow)', event, msg['msg_type'],
+                        1000*elapsed)
+        elif log.isEnabledFor(logging.INFO):
+            if elapsed is None:
+                log.info('%s %s', event, msg['msg_type'])
+            else:
+                log.info('%s %s in %.3f ms', event, msg['msg_type'],
+                         1000*elapsed)
+        if log.isEnabledFor(logging.DEBUG):
+            log.debug('%s', _FormattedMessage(msg))
+
+    def recent(self, n=None):
+        """Return the last n traced (time, event, msg, elapsed) tuples, or
+        all of the ones kept if n is None."""
+        if self.history is None:
+            return []
+        history = list(self.history)
+        if n is not None:
+            # history[-0:] would be the whole list.
+            history = history[-n:] if n > 0 else []
+        return history
+
+
+# The tracer used by the kernel.
+tracer = MessageTracer()
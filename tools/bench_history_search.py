@@ -0,0 +1,76 @@
+#!/usr/bin/env python
+"""Time searches of a large shadow history.
+
+Fills a temporary history database with n distinct inputs and compares
+ShadowHist.search, which uses the full text index when SQLite provides one,
+with the former linear fnmatch over ShadowHist.all().
+
+Usage: bench_history_search.py [n_entries]
+"""
+
+import fnmatch
+import os
+import random
+import shutil
+import sqlite3
+import sys
+import tempfile
+import time
+
+from IPython.core.history import ShadowHist
+
+WORDS = ('import', 'numpy', 'print', 'def', 'return', 'x', 'y', 'data',
+         'plot', 'for', 'in', 'range', 'len', 'os.path.join', 'frame')
+
+
+def fill(db, n):
+    rnd = random.Random(0)
+    entries = ('%s = %s(%d)' % (rnd.choice(WORDS), rnd.choice(WORDS), i)
+               for i in xrange(n))
+    db.executemany("INSERT INTO shadow_history (source) VALUES (?)",
+                   ((e,) for e in entries))
+    db.execute("INSERT INTO shadow_history (source) VALUES (?)",
+               ('needle_in_haystack(1)',))
+    db.commit()
+
+
+def timed(f):
+    t0 = time.time()
+    result = f()
+    return time.time()-t0, result
+
+
+def main():
+    n = int(sys.argv[1]) if len(sys.argv) > 1 else 1000000
+    tmpdir = tempfile.mkdtemp()
+    try:
+        db = sqlite3.connect(os.path.join(tmpdir, 'history.sqlite'))
+        # Create the tables, fill them, then index everything in one go.
+        ShadowHist(db, None)
+        db.execute("DROP TABLE IF EXISTS shadow_history_fts")
+        fill(db, n)
+        t, sh = timed(lambda: ShadowHist(db, None))
+        print 'entries: %d, search table: %s, indexing: %.1f s' % (
+            n+1, sh._search_table, t)
+
+        queries = [('*needle*', 'glob', None),
+                   ('frame(12345)', 'substring', None),
+                   (r'needle_\w+\(\d\)', 'regex', None),
+                   ('print*', 'glob', 20)]
+        for pattern, kind, limit in queries:
+            t, found = timed(lambda: list(sh.search(pattern, kind, limit)))
+            print '%-10s %-20r limit=%-5s %4d found in %8.2f ms' % (
+                kind, pattern, limit, len(found), 1000*t)
+
+        def linear():
+            return [(idx, s) for idx, s in sh.all()
+                    if fnmatch.fnmatch(s, '*needle*')]
+        t, found = timed(linear)
+        print 'linear fnmatch over all(): %d found in %8.2f ms' % (
+            len(found), 1000*t)
+    finally:
+        shutil.rmtree(tmpdir)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,76 @@
+#!/usr/bin/env python
+"""Time feeding large pasted cells to the input splitters.
+
+Builds a script of about n lines and times:
+
+- line mode: pushing it one line at a time into an InputSplitter, calling
+  push_accepts_more() after each line, like a terminal does with a paste;
+- cell mode: pushing it whole into an IPythonInputSplitter, like the Qt
+  console does when a cell is executed.
+
+Usage: bench_inputsplitter.py [n_lines]
+"""
+
+import sys
+import time
+
+from IPython.core.inputsplitter import InputSplitter, IPythonInputSplitter
+
+CHUNK = '''\
+import os
+x = {'a': 1,
+     'b': [1, 2, 3],
+     'c': """a multi-line
+string with a # hash and ( paren"""}
+
+def f(a, b=2):
+    """Docstring."""
+    if a > b:
+        return a
+    for i in range(b):
+        a += i  # comment
+    return a
+
+class C(object):
+    def method(self):
+        return f(1,
+                 2)
+
+y = f(3) + \\
+    4
+'''
+
+
+def make_script(n):
+    nchunk = len(CHUNK.splitlines())
+    return CHUNK * max(1, n // nchunk)
+
+
+def bench_lines(script):
+    isp = InputSplitter()
+    t0 = time.time()
+    for line in script.splitlines():
+        isp.push(line)
+        isp.push_accepts_more()
+    return time.time()-t0
+
+
+def bench_cell(script):
+    isp = IPythonInputSplitter(input_mode='cell')
+    t0 = time.time()
+    isp.push(script)
+    isp.push_accepts_more()
+    return time.time()-t0
+
+
+def main():
+    n = int(sys.argv[1]) if len(sys.argv) > 1 else 5000
+    for size in (n//4, n//2, n):
+        script = make_script(size)
+        nlines = len(script.splitlines())
+        print '%6d lines: line mode %7.3f s, cell mode %7.3f s' % (
+            nlines, bench_lines(script), bench_cell(script))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,59 @@
+#!/usr/bin/env python
+"""Compare the cost of building zmq session Message objects.
+
+Times and counts the objects allocated when wrapping a large execute_reply
+in a Message, for the current lazy Message class and for the eager
+implementation that recursively converted every nested dict.
+
+Usage: bench_message.py [n_user_variables]
+"""
+
+import gc
+import sys
+import timeit
+
+from IPython.zmq.session import Message
+
+
+class EagerMessage(object):
+    """The former Message implementation, kept here for comparison."""
+
+    def __init__(self, msg_dict):
+        dct = self.__dict__
+        for k, v in msg_dict.iteritems():
+            if isinstance(v, dict):
+                v = EagerMessage(v)
+            dct[k] = v
+
+
+def make_reply(n):
+    user_variables = dict(('var%i' % i, dict(status='ok', data=repr(i)*10))
+                          for i in xrange(n))
+    payload = [dict(source='page', data='x'*100) for i in xrange(n/10)]
+    content = dict(status='ok', execution_count=1, payload=payload,
+                   user_variables=user_variables, user_expressions={})
+    return dict(header=dict(msg_id=1, username='kernel', session='s'),
+                parent_header=dict(msg_id=0, username='user', session='s'),
+                msg_type='execute_reply', content=content)
+
+
+def count_allocations(cls, msg):
+    gc.collect()
+    before = len(gc.get_objects())
+    obj = cls(msg)
+    obj.msg_type
+    after = len(gc.get_objects())
+    return after - before
+
+
+def main():
+    n = int(sys.argv[1]) if len(sys.argv) > 1 else 10000
+    msg = make_reply(n)
+    for cls in (EagerMessage, Message):
+        t = min(timeit.repeat(lambda: cls(msg).msg_type, number=10, repeat=3))
+        print '%-12s %10.3f ms/msg %8i tracked objects allocated' % (
+            cls.__name__, 100*t, count_allocations(cls, msg))
+
+
+if __name__ == '__main__':
+    main()